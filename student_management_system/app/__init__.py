@@ -1,31 +1,68 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
+from flask_migrate import Migrate
 from config.config import config_by_name
+from app.services.replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 bcrypt = Bcrypt()
+migrate = Migrate()
+
+def _include_in_migrations(name, type_, parent_names):
+    # 搜索索引表由搜索后端按数据库类型创建，不参与迁移的自动比较
+    from app.services.search import is_search_table
+    return not (type_ == 'table' and is_search_table(name))
 
 def create_app(config_name='development'):
     app = Flask(__name__)
     app.config.from_object(config_by_name[config_name])
 
+    # 连接池和连接初始化参数按数据库类型生成（见 app/services/database.py）
+    from app.services.database import engine_options, configure_engine
+    from app.services.replicas import init_replicas
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI'])
+
     # Initialize extensions
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(engine, app.config)
+    # 只读副本（REPLICA_DATABASE_URIS）
+    init_replicas(app)
     login_manager.init_app(app)
     bcrypt.init_app(app)
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'),
+                     render_as_batch=True, include_name=_include_in_migrations)
 
     # Configure login manager
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        from app.models.user import User
-        return User.query.get(int(user_id))
+    # 登录用户和学生记录的读穿透缓存
+    from app.services.identity import init_identity_cache, load_user
+    init_identity_cache(app)
+    login_manager.user_loader(load_user)
+
+    # 课程目录缓存
+    from app.services.catalog import init_catalog
+    init_catalog(app)
+
+    # 成绩单（学期 GPA）缓存
+    from app.services.transcript import init_transcript_cache
+    init_transcript_cache(app)
+
+    # 成绩分布分析缓存
+    from app.services.grade_analytics import init_grade_analytics
+    init_grade_analytics(app)
+
+    # 选课接口的限流和排队
+    from app.services.admission import init_admission
+    init_admission(app)
 
     # Register blueprints
     from app.views.auth import auth_bp
@@ -38,32 +75,10 @@ def create_app(config_name='development'):
     app.register_blueprint(student_bp, url_prefix='/student')
     app.register_blueprint(main_bp)
 
-    # Create tables
-    with app.app_context():
-        db.create_all()
-
-        # Create default admin if not exists
-        from app.models.user import User
-        from app.models.admin import Administrator
-
-        admin_user = User.query.filter_by(username='admin').first()
-        if not admin_user:
-            admin_user = User(
-                username='admin',
-                email='admin@example.com',
-                full_name='System Administrator',
-                role='admin'
-            )
-            admin_user.set_password('admin123')
-            db.session.add(admin_user)
-            db.session.commit()
-
-            admin = Administrator(
-                user_id=admin_user.id,
-                admin_code='ADMIN001',
-                department='System Administration'
-            )
-            db.session.add(admin)
-            db.session.commit()
+    # Register CLI commands, statistics, search index and enrollment term maintenance events
+    from app.commands import register_commands
+    from app.services import summary, search, terms
+    register_commands(app)
 
-    return app
\ No newline at end of file
+    # 表结构由 `flask db upgrade` 创建，默认管理员由 `flask seed-admin` 创建，启动时不访问数据库
+    return app
@@ -0,0 +1,88 @@
+import click
+
+
+def register_commands(app):
+    """注册 flask 命令行命令"""
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats():
+        """从 enrollments 全量重建统计汇总表"""
+        from app.services.summary import rebuild_statistics
+
+        result = rebuild_statistics()
+        click.echo(f"统计汇总表已重建：{result['students']} 个学生，{result['courses']} 门课程")
+
+    @app.cli.command('rebuild-search')
+    def rebuild_search():
+        """重建用户、学生、课程的全文搜索索引"""
+        from app.services.search import rebuild_search_index
+
+        counts = rebuild_search_index()
+        click.echo('搜索索引已重建：' + '，'.join(f'{name} {count} 条' for name, count in counts.items()))
+
+    @app.cli.command('rebuild-terms')
+    def rebuild_terms():
+        """按选课日期重新填写选课记录的学期"""
+        from app import db
+        from app.services.terms import rebuild_terms as run_rebuild
+
+        updated = run_rebuild()
+        db.session.commit()
+        click.echo(f'选课学期已回填：更新 {updated} 条选课记录')
+
+    @app.cli.command('import-data')
+    @click.argument('entity', type=click.Choice(['students', 'courses', 'enrollments']))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--dry-run', is_flag=True, help='只校验，不写入数据库')
+    @click.option('--batch-size', type=int, default=None, help='每批插入的行数')
+    def import_data(entity, path, dry_run, batch_size):
+        """从 CSV/XLSX 文件批量导入学生、课程或选课记录"""
+        from app.services.imports import import_file, ImportFileError
+
+        try:
+            with open(path, 'rb') as f:
+                result = import_file(entity, f, path, dry_run=dry_run, batch_size=batch_size)
+        except ImportFileError as e:
+            raise click.ClickException(str(e))
+
+        for error in result.errors[:50]:
+            click.echo(f"第 {error['row']} 行 [{error['field']}] {error['message']}", err=True)
+        if len(result.errors) > 50:
+            click.echo(f'... 共 {len(result.errors)} 个错误', err=True)
+        action = '校验' if dry_run else '导入'
+        click.echo(f'{action}完成：共 {result.total} 行，有效 {result.valid} 行，写入 {result.inserted} 行，'
+                   f'用时 {result.elapsed:.2f} 秒')
+
+    @app.cli.command('sync-student-data')
+    @click.option('--dry-run', is_flag=True, help='只列出差异，不写入数据库')
+    def sync_student_data(dry_run):
+        """把学生用户的邮箱、电话、姓名同步到学生记录"""
+        from app.services.sync import sync_student_data as run_sync
+
+        result = run_sync(dry_run=dry_run)
+        for change in result.changes[:50]:
+            fields = '，'.join(f"{field}: {values['old']} -> {values['new']}"
+                              for field, values in change['changes'].items())
+            click.echo(f"{change['student_number']} ({change['username']}) {fields}")
+        if len(result.changes) > 50:
+            click.echo(f'... 共 {len(result.changes)} 个学生有变化')
+        for user in result.unmatched[:50]:
+            click.echo(f"未找到学生记录：{user['username']} <{user['email']}>", err=True)
+        timings = '，'.join(f'{phase} {seconds:.3f}s' for phase, seconds in result.timings.items())
+        action = '预览' if dry_run else '同步'
+        click.echo(f'{action}完成：{result.users} 个学生用户，匹配 {result.matched} 个，'
+                   f'更新 {result.updated} 个，未匹配 {len(result.unmatched)} 个（{timings}）')
+
+    @app.cli.command('seed-admin')
+    @click.option('--username', default=None, help='管理员用户名，默认 admin')
+    @click.option('--email', default=None, help='管理员邮箱，默认 admin@example.com')
+    @click.option('--password', envvar='ADMIN_PASSWORD', default=None, help='管理员密码，默认 admin123')
+    def seed_admin(username, email, password):
+        """创建默认管理员账户（已存在时跳过），在 flask db upgrade 之后执行"""
+        from app.services.bootstrap import seed_admin as run_seed
+
+        user, created = run_seed(username=username, email=email, password=password)
+        if created:
+            click.echo(f'已创建管理员账户：{user.username}')
+        else:
+            click.echo(f'管理员账户已存在：{user.username}')
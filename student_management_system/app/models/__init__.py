@@ -3,6 +3,10 @@ from .user import User
 from .admin import Administrator
 from .student import Student
 from .course import Course
+from .term import Term
 from .enrollment import Enrollment
+from .statistics import StudentStatistics, CourseStatistics
+from .job import BackgroundJob
 
-__all__ = ['User', 'Administrator', 'Student', 'Course', 'Enrollment']
\ No newline at end of file
+__all__ = ['User', 'Administrator', 'Student', 'Course', 'Term', 'Enrollment',
+           'StudentStatistics', 'CourseStatistics', 'BackgroundJob']
\ No newline at end of file
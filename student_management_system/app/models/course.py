@@ -6,18 +6,38 @@ class Course(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     course_code = db.Column(db.String(20), unique=True, nullable=False)
-    course_name = db.Column(db.String(100), nullable=False)
+    course_name = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text)
     credits = db.Column(db.Integer, nullable=False, default=3)
     department = db.Column(db.String(100))
     instructor = db.Column(db.String(100))
+    # 容量：max_students 为空表示不限人数，waitlist_size 为候补名单长度（0 表示不设候补）
+    max_students = db.Column(db.Integer)
+    waitlist_size = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # 已占名额和候补人数：选课服务用条件 UPDATE 原子地增减，统计汇总刷新时按 enrollments 重算
+    seats_taken = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    waitlist_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     enrollments = db.relationship('Enrollment', backref='course', lazy='dynamic', cascade='all, delete-orphan')
 
-    def to_dict(self):
+    @property
+    def seats_available(self):
+        """剩余名额，不限人数时为 None"""
+        if self.max_students is None:
+            return None
+        return max(0, self.max_students - (self.seats_taken or 0))
+
+    @property
+    def is_full(self):
+        return self.seats_available == 0
+
+    def to_dict(self, enrollment_count=None):
+        # 序列化整个课程列表时由课程目录缓存（app/services/catalog.py）传入选课人数，避免逐门课程 COUNT
+        if enrollment_count is None:
+            enrollment_count = self.enrollments.count()
         return {
             'id': self.id,
             'course_code': self.course_code,
@@ -26,9 +46,14 @@ class Course(db.Model):
             'credits': self.credits,
             'department': self.department,
             'instructor': self.instructor,
+            'max_students': self.max_students,
+            'waitlist_size': self.waitlist_size,
+            'seats_taken': self.seats_taken,
+            'seats_available': self.seats_available,
+            'waitlist_count': self.waitlist_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'enrollment_count': self.enrollments.count()
+            'enrollment_count': enrollment_count
         }
 
     def __repr__(self):
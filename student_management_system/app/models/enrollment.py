@@ -1,6 +1,9 @@
 from app import db
 from datetime import datetime, date
 
+# 占用课程名额的状态；waitlisted 表示在候补名单中，dropped/withdrawn 不占名额
+SEAT_STATUSES = ('enrolled', 'completed')
+
 class Enrollment(db.Model):
     __tablename__ = 'enrollments'
 
@@ -8,27 +11,46 @@ class Enrollment(db.Model):
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
     enrollment_date = db.Column(db.Date, nullable=False, default=date.today)
-    status = db.Column(db.Enum('enrolled', 'completed', 'dropped', 'withdrawn', name='enrollment_status'),
+    # 选课日期所在学期，由 app/services/terms.py 在写入时根据 enrollment_date 填写
+    term_id = db.Column(db.Integer, db.ForeignKey('terms.id'))
+    status = db.Column(db.Enum('enrolled', 'completed', 'dropped', 'withdrawn', 'waitlisted',
+                               name='enrollment_status'),
                        default='enrolled')
     grade = db.Column(db.Numeric(5, 2))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 最近更新列表按 (updated_at, id) 做键集分页，不能为 NULL
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Unique constraint to prevent duplicate enrollments
-    __table_args__ = (db.UniqueConstraint('student_id', 'course_id', name='unique_enrollment'),)
+    # 唯一约束 (student_id, course_id) 同时是按学生查询的索引；其余索引对应列表页的筛选和排序：
+    # 选课列表按状态筛选、成绩列表按状态/课程筛选并按成绩排序、最近选课按时间倒序、
+    # 学生按学期筛选成绩、按学期统计成绩
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'course_id', name='unique_enrollment'),
+        db.Index('ix_enrollments_status', 'status'),
+        db.Index('ix_enrollments_status_grade', 'status', 'grade'),
+        db.Index('ix_enrollments_course_status_grade', 'course_id', 'status', 'grade'),
+        db.Index('ix_enrollments_grade', 'grade'),
+        db.Index('ix_enrollments_updated_at', 'updated_at'),
+        db.Index('ix_enrollments_created_at', 'created_at'),
+        db.Index('ix_enrollments_student_term', 'student_id', 'term_id'),
+        db.Index('ix_enrollments_term_status_grade', 'term_id', 'status', 'grade'),
+    )
 
-    def to_dict(self):
+    def to_dict(self, course_enrollment_count=None):
+        # 序列化选课列表时由调用方传入课程的选课人数（课程目录缓存），避免逐行 COUNT
         return {
             'id': self.id,
             'student_id': self.student_id,
             'course_id': self.course_id,
             'enrollment_date': self.enrollment_date.isoformat() if self.enrollment_date else None,
+            'term_id': self.term_id,
             'status': self.status,
             'grade': float(self.grade) if self.grade else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'student': self.student.to_dict() if self.student else None,
-            'course': self.course.to_dict() if self.course else None
+            'course': self.course.to_dict(course_enrollment_count) if self.course else None
         }
 
     def __repr__(self):
@@ -0,0 +1,54 @@
+from app import db
+from datetime import datetime
+
+# 统计汇总表：由选课写入事件增量维护，也可以通过 `flask rebuild-stats` 全量重建。
+# 这些表只是 enrollments 的派生数据，因此不声明外键，删除学生/课程时不会被约束阻塞。
+
+class StudentStatistics(db.Model):
+    __tablename__ = 'student_statistics'
+
+    student_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+    grade_sum = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    grade_min = db.Column(db.Numeric(5, 2))
+    grade_max = db.Column(db.Numeric(5, 2))
+    completed_graded_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_grade_sum = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    completed_credits = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def avg_grade(self):
+        return float(self.grade_sum) / self.graded_count if self.graded_count else 0
+
+    @property
+    def completed_avg_grade(self):
+        return float(self.completed_grade_sum) / self.completed_graded_count if self.completed_graded_count else 0
+
+    def __repr__(self):
+        return f'<StudentStatistics {self.student_id}>'
+
+
+class CourseStatistics(db.Model):
+    __tablename__ = 'course_statistics'
+
+    course_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+    grade_sum = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    grade_min = db.Column(db.Numeric(5, 2))
+    grade_max = db.Column(db.Numeric(5, 2))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def avg_grade(self):
+        return float(self.grade_sum) / self.graded_count if self.graded_count else 0
+
+    def __repr__(self):
+        return f'<CourseStatistics {self.course_id}>'
+
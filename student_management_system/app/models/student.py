@@ -15,6 +15,9 @@ class Student(db.Model):
     address = db.Column(db.Text)
     major = db.Column(db.String(100))
     enrollment_year = db.Column(db.Integer)
+    # 对应的登录账户；删除用户时置空
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL', name='fk_students_user_id_users'),
+                        unique=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -47,6 +50,7 @@ class Student(db.Model):
             'address': self.address,
             'major': self.major,
             'enrollment_year': self.enrollment_year,
+            'user_id': self.user_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
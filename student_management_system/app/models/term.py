@@ -0,0 +1,50 @@
+from app import db
+from datetime import date, datetime
+
+# 学期：1-6 月为春季学期，7-12 月为秋季学期。选课记录通过 enrollments.term_id 关联学期，
+# 按学期筛选、统计都走 term_id 索引，不再对 enrollment_date 做 year/month 运算。
+
+SEASON_LABELS = {'spring': '春季', 'fall': '秋季'}
+
+
+class Term(db.Model):
+    __tablename__ = 'terms'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(20), unique=True, nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    season = db.Column(db.Enum('spring', 'fall', name='term_season'), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('year', 'season', name='unique_term'),
+        db.Index('ix_terms_start_date', 'start_date'),
+    )
+
+    # Relationships
+    enrollments = db.relationship('Enrollment', backref='term', lazy='dynamic')
+
+    @staticmethod
+    def values_for(day):
+        """日期所在学期的列值 {name, year, season, start_date, end_date}"""
+        if day.month <= 6:
+            season, start_date, end_date = 'spring', date(day.year, 1, 1), date(day.year, 6, 30)
+        else:
+            season, start_date, end_date = 'fall', date(day.year, 7, 1), date(day.year, 12, 31)
+        return {'name': f'{day.year}{SEASON_LABELS[season]}', 'year': day.year, 'season': season,
+                'start_date': start_date, 'end_date': end_date}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'year': self.year,
+            'season': self.season,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None
+        }
+
+    def __repr__(self):
+        return f'<Term {self.name}>'
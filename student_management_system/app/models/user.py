@@ -12,13 +12,14 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     full_name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20))
-    role = db.Column(db.Enum('admin', 'student', name='user_role'), nullable=False, default='student')
-    is_active = db.Column(db.Boolean, default=True)
+    role = db.Column(db.Enum('admin', 'student', name='user_role'), nullable=False, default='student', index=True)
+    is_active = db.Column(db.Boolean, default=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     administrator = db.relationship('Administrator', backref='user', uselist=False, cascade='all, delete-orphan')
+    student = db.relationship('Student', backref='user', uselist=False)
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password).decode('utf-8')
@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from flask_bcrypt import generate_password_hash
+from app import db
+from app.models.user import User
+from app.models.student import Student
+from app.services.search import index_ids
+
+# 为学生批量开通登录账户：一次读出没有关联账户的学生和已有的用户名/邮箱放进集合，
+# 在内存中一遍生成不冲突的用户名；bcrypt 哈希是 CPU 密集操作，放到进程池并行计算；
+# 最后按批 executemany 插入并回写 students.user_id。作为后台任务运行，进度写入任务记录。
+
+DEFAULT_PASSWORD = '123456'
+INSERT_BATCH_SIZE = 1000
+USERNAME_LENGTH = User.username.type.length
+
+
+def _hash_password(password):
+    # 与 User.set_password 相同的算法和参数，在子进程中运行，不依赖应用上下文
+    return generate_password_hash(password).decode('utf-8')
+
+
+class UsernameAllocator:
+    """在内存中分配用户名，依次尝试：学号、邮箱前缀、姓名（冲突时加数字后缀）"""
+
+    def __init__(self, taken):
+        self.taken = set(taken)
+        self.next_suffix = {}
+
+    def _claim(self, username):
+        self.taken.add(username)
+        return username
+
+    def allocate(self, student_id, email, first_name, last_name):
+        for candidate in (student_id, (email or '').split('@')[0]):
+            candidate = (candidate or '')[:USERNAME_LENGTH]
+            if candidate and candidate not in self.taken:
+                return self._claim(candidate)
+
+        name_part = re.sub(r'\s+', '', f"{first_name or ''}{last_name or ''}".lower()) or 'student'
+        name_part = name_part[:USERNAME_LENGTH - 6]
+        if name_part not in self.taken:
+            return self._claim(name_part)
+        # 记住每个前缀用到的后缀，避免同名学生很多时反复从 1 开始尝试
+        counter = self.next_suffix.get(name_part, 1)
+        while f'{name_part}{counter}' in self.taken:
+            counter += 1
+        self.next_suffix[name_part] = counter + 1
+        return self._claim(f'{name_part}{counter}')
+
+
+def plan_accounts(students, usernames, emails):
+    """根据学生列表和已有用户名/邮箱集合，返回 (待创建账户列表, 跳过人数)。
+
+    邮箱已被其他用户占用的学生无法创建账户，计入跳过人数。
+    """
+    allocator = UsernameAllocator(usernames)
+    emails = set(emails)
+    accounts, skipped = [], 0
+    for student in students:
+        if student.email in emails:
+            skipped += 1
+            continue
+        emails.add(student.email)
+        accounts.append({
+            'student_pk': student.id,
+            'username': allocator.allocate(student.student_id, student.email,
+                                           student.first_name, student.last_name),
+            'email': student.email,
+            'full_name': f'{student.first_name} {student.last_name}',
+            'phone': student.phone or '',
+            'role': 'student',
+            'is_active': True,
+            # 默认密码为学号
+            'password': student.student_id or DEFAULT_PASSWORD,
+        })
+    return accounts, skipped
+
+
+def hash_passwords(passwords, workers=None, on_progress=None):
+    """并行计算密码哈希，结果顺序与输入一致；workers 为 0 或 1 时在当前进程计算"""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    hashes = []
+    if workers <= 1 or len(passwords) < 2:
+        results = map(_hash_password, passwords)
+        executor = None
+    else:
+        # 任务在多线程的 Web 进程中运行，fork 可能把其他线程持有的锁（日志、连接池）复制到子进程导致死锁，
+        # 因此用 spawn 启动全新的子进程；_hash_password 不依赖父进程的任何状态
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        chunksize = max(1, min(100, len(passwords) // (workers * 4)))
+        results = executor.map(_hash_password, passwords, chunksize=chunksize)
+    try:
+        for password_hash in results:
+            hashes.append(password_hash)
+            if on_progress:
+                on_progress(len(hashes))
+    finally:
+        if executor:
+            executor.shutdown()
+    return hashes
+
+
+def _link_students(links):
+    """links 为 [{'id': 学生主键, 'user_id': 用户主键}]，按主键批量更新"""
+    for start in range(0, len(links), INSERT_BATCH_SIZE):
+        db.session.execute(db.update(Student), links[start:start + INSERT_BATCH_SIZE])
+
+
+def provision_student_accounts(progress):
+    """后台任务：为所有没有关联账户的学生创建用户账户"""
+    progress.update(message='正在检查现有账户', force=True)
+    students = db.session.execute(db.select(
+        Student.id, Student.student_id, Student.email, Student.first_name, Student.last_name, Student.phone
+    ).where(Student.user_id.is_(None)).order_by(Student.id)).all()
+    existing = db.session.execute(db.select(
+        User.id, User.username, User.email, User.role, Student.id.label('student_pk')
+    ).outerjoin(Student, Student.user_id == User.id)).all()
+
+    # 邮箱相同、还没有关联学生的学生账户直接关联，不再新建
+    linkable = {row.email: row.id for row in existing if row.role == 'student' and row.student_pk is None}
+    links = [{'id': student.id, 'user_id': linkable[student.email]}
+             for student in students if student.email in linkable]
+    _link_students(links)
+    students = [student for student in students if student.email not in linkable]
+    accounts, skipped = plan_accounts(students, {row.username for row in existing}, {row.email for row in existing})
+
+    total = len(accounts)
+    progress.update(progress=0, total=total, message=f'正在为 {total} 个学生生成密码', force=True)
+    hashes = hash_passwords([account.pop('password') for account in accounts],
+                            workers=current_app.config.get('PASSWORD_HASH_WORKERS'),
+                            on_progress=lambda done: progress.update(progress=done))
+    for account, password_hash in zip(accounts, hashes):
+        account['password_hash'] = password_hash
+
+    progress.update(progress=total, message='正在写入账户', force=True)
+    student_pks = [account.pop('student_pk') for account in accounts]
+    for start in range(0, total, INSERT_BATCH_SIZE):
+        db.session.execute(db.insert(User), accounts[start:start + INSERT_BATCH_SIZE])
+
+    # 按用户名取回新用户的主键，回写到学生记录
+    usernames = [account['username'] for account in accounts]
+    user_ids = {}
+    for start in range(0, total, INSERT_BATCH_SIZE):
+        user_ids.update(db.session.execute(db.select(User.username, User.id).where(
+            User.username.in_(usernames[start:start + INSERT_BATCH_SIZE]))).all())
+    _link_students([{'id': student_pk, 'user_id': user_ids[username]}
+                    for student_pk, username in zip(student_pks, usernames)])
+    # 批量插入不触发 ORM 刷新事件，需要手动加入搜索索引
+    index_ids('user', user_ids.values())
+    db.session.commit()
+
+    message = f'成功为 {total} 个学生创建用户账户，关联 {len(links)} 个已有账户'
+    if skipped:
+        message += f'，{skipped} 个学生的邮箱已被其他用户使用，已跳过'
+    if total > 0:
+        message += '。默认密码为学号，首次登录后请修改密码。'
+    return {'message': message}
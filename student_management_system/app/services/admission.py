@@ -0,0 +1,204 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from importlib import import_module
+from flask import current_app, jsonify, render_template, request
+from flask_login import current_user
+from app.services.database import pool_size_for_worker
+
+# 选课接口的准入控制（选课开放时所有学生同时访问课程列表和选课接口）。
+# 1. 每个学生一个令牌桶：每秒补充 ADMISSION_RATE 个令牌，最多攒 ADMISSION_BURST 个，用完返回 429；
+# 2. 每个进程一个有界队列：同时处理的请求不超过 ADMISSION_MAX_ACTIVE（默认等于连接池大小），
+#    其余请求最多 ADMISSION_MAX_QUEUE 个排队等待 ADMISSION_QUEUE_TIMEOUT 秒；队列已满或等待超时立即返回 503。
+# 两种拒绝都带 Retry-After。过载时多出的请求在进入数据库之前就被拒绝，不会占满连接池后让所有请求一起超时。
+# 令牌桶默认存放在进程内（MemoryTokenBucketStore），多进程部署可以通过 ADMISSION_STORE_BACKEND 换成共享存储。
+
+
+class MemoryTokenBucketStore:
+    """进程内令牌桶存储；最多保留 ADMISSION_BUCKETS_SIZE 个桶，超出时丢弃最久未使用的（相当于桶已补满）"""
+
+    def __init__(self, app, clock=time.monotonic):
+        self.maxsize = app.config.get('ADMISSION_BUCKETS_SIZE', 100000)
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        """从 key 的桶中取 cost 个令牌；成功返回 0，令牌不足时返回还需等待的秒数"""
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+ADMISSION_STORE_BACKENDS = {
+    'memory': MemoryTokenBucketStore,
+}
+
+
+def _store_class(name):
+    """内置存储名，或 'package.module:ClassName' 形式的自定义存储（构造参数为 app，需提供 take 和 clear）"""
+    if name in ADMISSION_STORE_BACKENDS:
+        return ADMISSION_STORE_BACKENDS[name]
+    module_name, _, class_name = name.partition(':')
+    return getattr(import_module(module_name), class_name)
+
+
+class AdmissionQueue:
+    """进程内的并发上限和有界等待队列"""
+
+    def __init__(self, max_active, max_queue, timeout):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.queued = 0
+        self._cond = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        with self._cond:
+            self.admitted = 0
+            self.queue_full = 0
+            self.timed_out = 0
+            self.rate_limited = 0
+            self.peak_queued = 0
+            self.wait_max = 0.0
+
+    def acquire(self):
+        """取得处理名额返回 None；队列已满返回 'queue_full'，等待超时返回 'timeout'"""
+        started = time.perf_counter()
+        with self._cond:
+            if self.active < self.max_active and not self.queued:
+                self.active += 1
+                self.admitted += 1
+                return None
+            if self.queued >= self.max_queue:
+                self.queue_full += 1
+                return 'queue_full'
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            try:
+                admitted = self._cond.wait_for(lambda: self.active < self.max_active, self.timeout)
+            finally:
+                self.queued -= 1
+            waited = time.perf_counter() - started
+            self.wait_max = max(self.wait_max, waited)
+            if not admitted:
+                self.timed_out += 1
+                return 'timeout'
+            self.active += 1
+            self.admitted += 1
+            return None
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def record_rate_limited(self):
+        with self._cond:
+            self.rate_limited += 1
+
+    def to_dict(self):
+        with self._cond:
+            return {
+                'active': self.active,
+                'queued': self.queued,
+                'max_active': self.max_active,
+                'max_queue': self.max_queue,
+                'peak_queued': self.peak_queued,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.queue_full,
+                'rejected_timeout': self.timed_out,
+                'rate_limited': self.rate_limited,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+            }
+
+
+class Admission:
+    """准入控制的配置、令牌桶存储和等待队列，保存在 app.extensions['admission']"""
+
+    def __init__(self, app):
+        config = app.config
+        max_active = config.get('ADMISSION_MAX_ACTIVE') or pool_size_for_worker(config)[0]
+        self.queue = AdmissionQueue(max_active, config.get('ADMISSION_MAX_QUEUE', 50),
+                                    config.get('ADMISSION_QUEUE_TIMEOUT', 2))
+        self.store = _store_class(config.get('ADMISSION_STORE_BACKEND', 'memory'))(app)
+        self.rate = config.get('ADMISSION_RATE', 1)
+        self.burst = config.get('ADMISSION_BURST', 10)
+        # 补充速度为 0 时令牌用完后永远等不到，要关闭限制应设置 ADMISSION_CONTROL=false
+        if not self.rate > 0:
+            raise ValueError(f'ADMISSION_RATE 必须大于 0: {self.rate!r}')
+        if not self.burst >= 1:
+            raise ValueError(f'ADMISSION_BURST 不能小于 1: {self.burst!r}')
+        self.retry_after = config.get('ADMISSION_RETRY_AFTER', 2)
+
+    def status(self):
+        return dict(self.queue.to_dict(), rate=self.rate, burst=self.burst)
+
+
+def init_admission(app):
+    """ADMISSION_CONTROL 开启时创建准入控制；关闭时 @admission_control 不做任何限制"""
+    if app.config.get('ADMISSION_CONTROL'):
+        app.extensions['admission'] = Admission(app)
+
+
+def get_admission():
+    return current_app.extensions.get('admission')
+
+
+def _reject(status_code, code, message, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    if request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest' \
+            or request.path.startswith('/student/api/'):
+        response = jsonify({'success': False, 'code': code, 'message': message, 'retry_after': retry_after})
+    else:
+        response = current_app.make_response(
+            render_template('student/busy.html', message=message, retry_after=retry_after))
+    response.status_code = status_code
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def admission_control(f):
+    """视图装饰器：先按学生限速（429），再进入本进程的有界队列（503），放在 login_required 之后"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        admission = get_admission()
+        if admission is None:
+            return f(*args, **kwargs)
+
+        wait = admission.store.take(f'user:{current_user.get_id()}', admission.rate, admission.burst)
+        if wait:
+            admission.queue.record_rate_limited()
+            return _reject(429, 'rate_limited', '操作过于频繁，请稍后再试', wait)
+
+        rejected = admission.queue.acquire()
+        if rejected:
+            current_app.logger.warning('选课请求过载（%s）：%s', rejected, admission.queue.to_dict())
+            return _reject(503, 'overloaded', '当前选课人数较多，请稍后重试', admission.retry_after)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            admission.queue.release()
+    return decorated_function
@@ -0,0 +1,52 @@
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.user import User
+from app.models.admin import Administrator
+
+# 数据库初始化：表结构由迁移创建（flask db upgrade），默认管理员由 flask seed-admin 创建。
+# create_app 本身不读写数据库，Web 进程启动时不做表结构检查，多个进程同时启动也不会重复插入管理员。
+
+DEFAULT_ADMIN = {
+    'username': 'admin',
+    'email': 'admin@example.com',
+    'password': 'admin123',
+    'full_name': 'System Administrator',
+    'admin_code': 'ADMIN001',
+    'department': 'System Administration',
+}
+
+
+def seed_admin(username=None, email=None, password=None):
+    """创建默认管理员账户（用户及管理员记录在同一事务中写入），返回 (用户, 是否新建)。
+
+    用户名已存在时不做修改；并发执行时由唯一约束保证只插入一次。
+    """
+    username = username or DEFAULT_ADMIN['username']
+    user = User.query.filter_by(username=username).first()
+    if user:
+        return user, False
+
+    user = User(
+        username=username,
+        email=email or DEFAULT_ADMIN['email'],
+        full_name=DEFAULT_ADMIN['full_name'],
+        role='admin'
+    )
+    user.set_password(password or DEFAULT_ADMIN['password'])
+    db.session.add(user)
+    try:
+        db.session.flush()
+        db.session.add(Administrator(
+            user_id=user.id,
+            admin_code=DEFAULT_ADMIN['admin_code'],
+            department=DEFAULT_ADMIN['department']
+        ))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        existing = User.query.filter_by(username=username).first()
+        if existing is None:
+            # 不是用户名冲突（例如邮箱或管理员编号已被占用），交给调用方报告
+            raise
+        return existing, False
+    return user, True
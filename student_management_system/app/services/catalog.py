@@ -0,0 +1,134 @@
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy.orm import Session
+from app import db
+from app.models.course import Course
+
+# 课程目录缓存。课程列表一学期只改几次，却被选课/成绩录入表单反复整表读取。
+# 缓存内容只有课程的描述性列（代码、名称、学分、容量设置等），不含名额和选课人数：
+# 这些数字每次选课都会变化，放进缓存会让选课高峰期缓存不断失效；需要时从 courses 行或课程汇总表读取。
+# 缓存带版本号：课程通过 ORM 修改、或批量导入课程后版本号加一，下次读取时重新加载；
+# 与身份缓存相同，提交后再加一次，避免其他请求在提交前读到旧数据又缓存为新版本。
+# 版本号只在本进程内有效，多进程部署时其他进程最多滞后 COURSE_CATALOG_TTL 秒。
+
+# 选课服务用条件 UPDATE 维护的计数列，变化时不需要重新加载目录
+COUNTER_COLUMNS = ('seats_taken', 'waitlist_count')
+
+
+class CatalogCourse:
+    """目录中的一门课程：courses 表除计数列以外的各列。只读，不属于任何会话，模板中可以像 Course 一样读取这些列"""
+
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+    def __repr__(self):
+        return f'<CatalogCourse {self.course_code}>'
+
+
+class CourseCatalog:
+    """某个版本的课程目录快照，课程按 id 排序"""
+
+    def __init__(self, version, courses):
+        self.version = version
+        self.courses = courses
+        self.loaded_at = time.monotonic()
+        self._by_id = {course.id: course for course in courses}
+
+    def get(self, course_id):
+        return self._by_id.get(course_id)
+
+    def __len__(self):
+        return len(self.courses)
+
+
+def load_catalog(version=0):
+    """一条查询读出完整目录"""
+    columns = [column for column in Course.__table__.columns if column.key not in COUNTER_COLUMNS]
+    rows = db.session.execute(db.select(*columns).order_by(Course.id)).mappings().all()
+    return CourseCatalog(version, [CatalogCourse(row) for row in rows])
+
+
+class CatalogCache:
+    """进程内的目录缓存：版本号 + 当前快照"""
+
+    def __init__(self, app):
+        self.ttl = app.config.get('COURSE_CATALOG_TTL', 30)
+        self.version = 0
+        self.snapshot = None
+        self.loads = 0
+        self._lock = threading.Lock()
+
+    def _fresh(self, snapshot):
+        return (snapshot is not None and snapshot.version == self.version
+                and time.monotonic() - snapshot.loaded_at < self.ttl)
+
+    def get(self):
+        if not self.ttl:
+            self.loads += 1
+            return load_catalog(self.version)
+        snapshot = self.snapshot
+        if self._fresh(snapshot):
+            return snapshot
+        # 同一时间只有一个请求重新加载，其余请求等它加载完直接使用
+        with self._lock:
+            if self._fresh(self.snapshot):
+                return self.snapshot
+            snapshot = load_catalog(self.version)
+            self.loads += 1
+            self.snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self.snapshot = None
+
+
+def init_catalog(app):
+    app.extensions['course_catalog'] = CatalogCache(app)
+
+
+def get_catalog():
+    """当前的课程目录快照"""
+    return current_app.extensions['course_catalog'].get()
+
+
+def _bump():
+    if has_app_context() and 'course_catalog' in current_app.extensions:
+        current_app.extensions['course_catalog'].invalidate()
+
+
+def invalidate_catalog(session=None):
+    """课程已变化（批量写入时显式调用）：立即使缓存失效，并在当前事务提交后再失效一次"""
+    _bump()
+    (session or db.session).info['course_catalog_dirty'] = True
+
+
+def _catalog_changed(session):
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Course):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, Course):
+            state = db.inspect(obj)
+            if any(attr.history.has_changes() for attr in state.attrs if attr.key not in COUNTER_COLUMNS):
+                return True
+    return False
+
+
+@db.event.listens_for(Session, 'after_flush')
+def _invalidate_after_flush(session, flush_context):
+    if _catalog_changed(session):
+        invalidate_catalog(session)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('course_catalog_dirty', False):
+        _bump()
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('course_catalog_dirty', None)
@@ -0,0 +1,243 @@
+import hashlib
+import math
+from flask import current_app, request, session
+from app import db
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.models.statistics import CourseStatistics
+from app.services.enrollments import REENROLL_STATUSES
+from app.services.search import apply_search, search_filter
+
+# 学生课程浏览：课程表 LEFT JOIN 当前学生的选课记录（只连接该学生、未退课的记录），
+# 一条查询同时得到已选课程（连接到记录）和可选课程（反连接：连接不到记录），
+# 选课人数取自课程汇总表，总数用窗口函数 COUNT(*) OVER () 随同一条查询返回。
+# 院系、学分分面另用一条 GROUP BY 查询。HTML 页面和 JSON API 共用，响应带按内容计算的 ETag。
+
+SCOPES = ('all', 'available', 'enrolled')
+
+
+class CourseFilters:
+    """课程浏览的筛选条件，来自查询参数"""
+
+    def __init__(self, search=None, department=None, credits=None, scope='all'):
+        self.search = (search or '').strip()
+        self.department = department or None
+        self.credits = credits
+        self.scope = scope if scope in SCOPES else 'all'
+
+    @classmethod
+    def from_args(cls, args, scope='all'):
+        return cls(args.get('search'), args.get('department'), args.get('credits', type=int),
+                   args.get('scope', scope))
+
+    def to_dict(self):
+        return {'search': self.search, 'department': self.department, 'credits': self.credits, 'scope': self.scope}
+
+
+def _base_statement(student_id, filters, *columns):
+    """课程 LEFT JOIN 该学生的有效选课记录，按 scope 只保留可选（反连接）或已选的课程"""
+    statement = db.select(*columns).select_from(Course).outerjoin(Enrollment, db.and_(
+        Enrollment.course_id == Course.id,
+        Enrollment.student_id == student_id,
+        Enrollment.status.notin_(REENROLL_STATUSES)))
+    if filters.scope == 'available':
+        statement = statement.where(Enrollment.id.is_(None))
+    elif filters.scope == 'enrolled':
+        statement = statement.where(Enrollment.id.isnot(None))
+    return statement
+
+
+def _facet_conditions(filters):
+    conditions = []
+    if filters.department:
+        conditions.append(Course.department == filters.department)
+    if filters.credits is not None:
+        conditions.append(Course.credits == filters.credits)
+    return conditions
+
+
+def _courses_statement(student_id, filters):
+    statement = _base_statement(
+        student_id, filters,
+        *Course.__table__.columns,
+        Enrollment.status.label('enrollment_status'),
+        db.func.coalesce(CourseStatistics.total_count, 0).label('enrollment_count'),
+        db.func.count().over().label('total'),
+    ).outerjoin(CourseStatistics, CourseStatistics.course_id == Course.id).where(*_facet_conditions(filters))
+    # 已选课程排在前面
+    statement = statement.order_by(db.case((Enrollment.id.is_(None), 1), else_=0))
+    if filters.search:
+        return apply_search(statement, 'course', filters.search)
+    return statement.order_by(Course.course_code, Course.id)
+
+
+class BrowsedCourse:
+    """课程浏览中的一门课程：courses 表各列 + 选课人数 + 当前学生的选课状态。只读，模板中可以像 Course 一样使用"""
+
+    seats_available = Course.seats_available
+    is_full = Course.is_full
+
+    def __init__(self, values, enrollment_count, enrollment_status):
+        self.__dict__.update(values)
+        self.enrollment_count = enrollment_count
+        self.enrollment_status = enrollment_status
+
+    def to_dict(self):
+        return Course.to_dict(self, self.enrollment_count)
+
+    def __repr__(self):
+        return f'<BrowsedCourse {self.course_code}>'
+
+
+def _course(row):
+    values = row._asdict()
+    enrollment_count = values.pop('enrollment_count')
+    enrollment_status = values.pop('enrollment_status')
+    values.pop('total')
+    return BrowsedCourse(values, enrollment_count, enrollment_status)
+
+
+def course_dict(course):
+    return dict(course.to_dict(), enrollment_status=course.enrollment_status)
+
+
+def course_facets(student_id, filters):
+    """院系、学分分面：一条 GROUP BY 查询，每个分面只应用另一个分面的筛选条件"""
+    statement = _base_statement(student_id, filters, Course.department, Course.credits, db.func.count()) \
+        .group_by(Course.department, Course.credits)
+    if filters.search:
+        statement = statement.where(search_filter('course', filters.search, Course.id))
+    departments, credits = {}, {}
+    for department, course_credits, count in db.session.execute(statement):
+        if filters.credits is None or course_credits == filters.credits:
+            departments[department] = departments.get(department, 0) + count
+        if filters.department is None or department == filters.department:
+            credits[course_credits] = credits.get(course_credits, 0) + count
+    return {
+        'department': [{'value': value, 'count': count}
+                       for value, count in sorted(departments.items(), key=lambda item: (item[0] is None, item[0] or ''))],
+        'credits': [{'value': value, 'count': count} for value, count in sorted(credits.items())],
+    }
+
+
+def _etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+class CoursePage:
+    """一页课程浏览结果：items 为 BrowsedCourse，另附分面和 ETag。
+    分页属性与 Flask-SQLAlchemy 的 Pagination 命名一致，模板可以同样使用"""
+
+    def __init__(self, student_id, filters, rows, page, per_page, total, facets):
+        self.student_id = student_id
+        self.filters = filters
+        self.rows = rows
+        self.items = [_course(row) for row in rows]
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.facets = facets
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def pages(self):
+        return math.ceil(self.total / self.per_page) if self.total else 0
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    def iter_pages(self, left_edge=2, left_current=2, right_current=4, right_edge=2):
+        """分页控件的页码：首尾各 left_edge/right_edge 页和当前页附近的页，省略的部分为 None"""
+        last = 0
+        for num in range(1, self.pages + 1):
+            if num <= left_edge or self.page - left_current <= num <= self.page + right_current \
+                    or num > self.pages - right_edge:
+                if last + 1 != num:
+                    yield None
+                yield num
+                last = num
+
+    @property
+    def enrolled(self):
+        return [course for course in self.items if course.enrollment_status]
+
+    @property
+    def available(self):
+        return [course for course in self.items if not course.enrollment_status]
+
+    @property
+    def etag(self):
+        return _etag(self.student_id, self.page, self.per_page, self.total,
+                     [tuple(row) for row in self.rows], self.facets)
+
+    def to_dict(self):
+        return {
+            'items': [course_dict(course) for course in self.items],
+            'page': self.page,
+            'per_page': self.per_page,
+            'pages': self.pages,
+            'total': self.total,
+            'filters': self.filters.to_dict(),
+            'facets': self.facets,
+        }
+
+
+def _count_courses(student_id, filters):
+    statement = _base_statement(student_id, filters, db.func.count()).where(*_facet_conditions(filters))
+    if filters.search:
+        statement = statement.where(search_filter('course', filters.search, Course.id))
+    return db.session.execute(statement).scalar()
+
+
+def browse_courses(student_id, filters, page=1, per_page=None):
+    """一页课程浏览结果（含分面）；页码、每页条数不合法时使用第 1 页和默认条数"""
+    default_per_page = current_app.config.get('ITEMS_PER_PAGE', 20)
+    page = page if page and page > 0 else 1
+    per_page = per_page if per_page and per_page > 0 else default_per_page
+    per_page = min(per_page, current_app.config.get('API_MAX_PAGE_SIZE', 500))
+
+    rows = db.session.execute(
+        _courses_statement(student_id, filters).limit(per_page).offset((page - 1) * per_page)).all()
+    if rows:
+        total = rows[0].total
+    else:
+        # 页码超出范围时单独计数
+        total = _count_courses(student_id, filters) if page > 1 else 0
+    return CoursePage(student_id, filters, rows, page, per_page, total, course_facets(student_id, filters))
+
+
+def list_courses(student_id, filters):
+    """不分页的课程列表（可选课程 API），返回 (课程列表, ETag)"""
+    rows = db.session.execute(_courses_statement(student_id, filters)).all()
+    return [_course(row) for row in rows], _etag(student_id, [tuple(row) for row in rows])
+
+
+def etag_response(etag, build):
+    """带 ETag 的响应；请求的 If-None-Match 与之相符时返回 304，不再渲染。
+    build() 返回响应（或可以转换为响应的值）"""
+    # 有待显示的提示消息时页面内容不同
+    etag = _etag(etag, session.get('_flashes'))
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(build())
+    response.set_etag(etag, weak=True)
+    # 结果因学生而异：只允许浏览器缓存，每次使用前用 If-None-Match 验证
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
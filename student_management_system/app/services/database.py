@@ -0,0 +1,178 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# 数据库引擎参数与连接池监控。
+# MySQL 等服务端数据库：连接池大小、溢出、等待超时、回收时间、pre-ping 都由配置（环境变量）决定，
+# 回收 + pre-ping 用来避免 "MySQL server has gone away"；新建连接时设置语句超时。
+# SQLite：新建连接时执行 SQLITE_PRAGMAS（默认 WAL、synchronous=NORMAL、busy_timeout）。
+# 连接池使用 InstrumentedQueuePool，记录取连接的等待时间和超时次数，由 /admin/api/metrics/pool 输出。
+
+
+class PoolMetrics:
+    """连接池取连接的累计统计（进程内）"""
+
+    def __init__(self, slow_wait=0.1):
+        self.slow_wait = slow_wait
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.slow_checkouts = 0
+            self.invalidated = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            if seconds >= self.slow_wait:
+                self.slow_checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_invalidated(self):
+        with self._lock:
+            self.invalidated += 1
+
+    def to_dict(self):
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'slow_checkouts': self.slow_checkouts,
+                'invalidated': self.invalidated,
+                'wait_avg_ms': round(self.wait_total / attempts * 1000, 3) if attempts else 0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """记录每次取连接等待时间的 QueuePool（包含池满时排队和新建连接的时间）"""
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        # engine.dispose() 会重建连接池，统计数据沿用
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def _is_memory_sqlite(url):
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+
+def pool_size_for_worker(config):
+    """(pool_size, max_overflow)：显式设置 DB_POOL_SIZE 时直接使用；
+    否则按 DB_MAX_CONNECTIONS / WEB_CONCURRENCY 算出每个进程可用的连接数，池大小 + 溢出不超过该值"""
+    max_overflow = config.get('DB_MAX_OVERFLOW', 10)
+    if config.get('DB_POOL_SIZE'):
+        return config['DB_POOL_SIZE'], max_overflow
+    budget = config.get('DB_MAX_CONNECTIONS')
+    if not budget:
+        return 5, max_overflow
+    per_worker = max(1, budget // max(1, config.get('WEB_CONCURRENCY') or 1))
+    pool_size = max(1, per_worker - max_overflow)
+    return pool_size, min(max_overflow, per_worker - pool_size)
+
+
+def engine_options(config, uri):
+    """按数据库类型生成 create_engine 参数；SQLALCHEMY_ENGINE_OPTIONS 中显式给出的参数优先"""
+    url = make_url(uri)
+    options = {}
+    if url.get_backend_name() == 'sqlite':
+        # 内存数据库由 Flask-SQLAlchemy 使用 StaticPool；文件数据库只需要监控，不需要回收和 pre-ping
+        if not _is_memory_sqlite(url):
+            options['poolclass'] = InstrumentedQueuePool
+    else:
+        pool_size, max_overflow = pool_size_for_worker(config)
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=config.get('DB_POOL_TIMEOUT', 10),
+            pool_recycle=config.get('DB_POOL_RECYCLE', 1800),
+            pool_pre_ping=config.get('DB_POOL_PRE_PING', True),
+        )
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def _session_settings(dialect_name, config):
+    """新建连接时执行的 SQL"""
+    if dialect_name == 'sqlite':
+        return [f'PRAGMA {name}={value}' for name, value in (config.get('SQLITE_PRAGMAS') or {}).items()]
+    timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+    if not timeout:
+        return []
+    if dialect_name == 'mysql':
+        # MySQL 5.7.8+ 只限制 SELECT；MariaDB 使用 max_statement_time（秒）
+        return [f'SET SESSION max_execution_time = {int(timeout)}']
+    if dialect_name == 'mariadb':
+        return [f'SET SESSION max_statement_time = {timeout / 1000:.3f}']
+    if dialect_name == 'postgresql':
+        return [f'SET statement_timeout = {int(timeout)}']
+    return []
+
+
+def configure_engine(engine, config):
+    """给引擎注册连接初始化和连接失效的事件监听，不会建立连接"""
+    statements = _session_settings(engine.dialect.name, config)
+    if statements:
+        @event.listens_for(engine, 'connect')
+        def _apply_session_settings(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for statement in statements:
+                    cursor.execute(statement)
+            finally:
+                cursor.close()
+
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics.slow_wait = config.get('DB_POOL_SLOW_WAIT_MS', 100) / 1000
+        metrics = engine.pool.metrics
+
+        @event.listens_for(engine, 'invalidate')
+        def _count_invalidated(dbapi_connection, connection_record, exception):
+            metrics.record_invalidated()
+
+
+def pool_status(engine):
+    """连接池当前状态和累计统计"""
+    pool = engine.pool
+    status = {'pool': type(pool).__name__, 'dialect': engine.dialect.name}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    metrics = getattr(pool, 'metrics', None)
+    if metrics is not None:
+        status.update(metrics.to_dict())
+    return status
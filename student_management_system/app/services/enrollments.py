@@ -0,0 +1,342 @@
+import time
+from datetime import date
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app import db
+from app.models.course import Course
+from app.models.enrollment import Enrollment, SEAT_STATUSES
+from app.services.summary import refresh_statistics, get_course_statistics
+from app.services.terms import term_id_for
+from app.services.transcript import invalidate_transcripts
+from app.services.grade_analytics import invalidate_grade_analytics
+
+# 学生选课/退课。名额不再靠“先查后插”判断：
+# 1. 占名额是一条条件 UPDATE（seats_taken < max_students 时加一），数据库保证同一门课的并发请求依次执行，
+#    不会超卖；名额满后同样用条件 UPDATE 占候补位。
+# 2. 选课记录用 INSERT ... ON CONFLICT DO NOTHING（MySQL 为 INSERT IGNORE）插入，重复选课得到 0 行，
+#    整个事务回滚，占用的名额随之释放，不再依赖唯一约束报错变成 500。
+# 3. 退课时先释放名额，再按先来后到把候补名单中的第一位转为正式选课。
+# 4. 管理员添加选课记录、修改状态也走同样的条件 UPDATE，不会绕过名额上限；候补学生只能按顺序转正。
+# 锁冲突或死锁时整个事务重试几次，仍失败则返回“稍后重试”。
+# 这些语句都绕过 ORM 刷新事件，提交前显式刷新统计汇总；名额计数已由条件 UPDATE 维护，不再按 enrollments 重算。
+# 汇总只刷新本次涉及的学生、课程各自的行（没有全局汇总行），课程汇总行的写入排在课程行锁之后，
+# 不同课程的选课事务之间没有共享的行。选课日期和学期（term_id）也直接写在语句中。
+
+REENROLL_STATUSES = ('dropped', 'withdrawn')
+MAX_ATTEMPTS = 5
+
+
+class EnrollmentError(Exception):
+    """选课/退课失败；code 供前端判断，status_code 为对应的 HTTP 状态码"""
+
+    def __init__(self, code, message, status_code=409):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+
+class _Retry(Exception):
+    """事务中途发现数据已被并发请求修改，需要整体重试"""
+
+
+class EnrollmentResult:
+    def __init__(self, enrollment, course, status, waitlist_position=None, promoted=()):
+        self.enrollment = enrollment
+        self.course = course
+        self.status = status
+        self.waitlist_position = waitlist_position
+        self.promoted = list(promoted)
+
+    @property
+    def message(self):
+        if self.status == 'waitlisted':
+            return f'课程名额已满，已加入候补名单（第 {self.waitlist_position} 位）：{self.course.course_name}'
+        return f'成功选修课程：{self.course.course_name}'
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'waitlist_position': self.waitlist_position,
+            # 选课人数取自刚刷新过的课程汇总行（按主键读取），不对 enrollments 做 COUNT
+            'enrollment': self.enrollment.to_dict(
+                course_enrollment_count=get_course_statistics(self.course.id).total_count
+            ) if self.enrollment else None
+        }
+
+
+def _is_lock_error(error):
+    text = str(getattr(error, 'orig', error)).lower()
+    return any(marker in text for marker in ('database is locked', 'deadlock', 'lock wait timeout'))
+
+
+def _run_in_transaction(work):
+    """执行 work() 并提交；锁冲突、死锁或并发修改时回滚后重试"""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except EnrollmentError:
+            db.session.rollback()
+            raise
+        except _Retry:
+            db.session.rollback()
+        except OperationalError as e:
+            db.session.rollback()
+            if not _is_lock_error(e):
+                raise
+        time.sleep(0.01 * (attempt + 1))
+    raise EnrollmentError('busy', '选课人数较多，请稍后重试', 503)
+
+
+def _update_course(course_id, condition=None, **values):
+    """按条件更新课程计数，返回是否更新成功；同一门课的并发请求在这一行上排队"""
+    courses = Course.__table__
+    statement = courses.update().where(courses.c.id == course_id)
+    if condition is not None:
+        statement = statement.where(condition)
+    # 显式保留 updated_at，名额变化不算课程信息修改
+    statement = statement.values(updated_at=courses.c.updated_at, **values)
+    return db.session.execute(statement).rowcount == 1
+
+
+def _claim_seat(course_id):
+    courses = Course.__table__
+    return _update_course(course_id, db.or_(courses.c.max_students.is_(None),
+                                            courses.c.seats_taken < courses.c.max_students),
+                          seats_taken=courses.c.seats_taken + 1)
+
+
+def _claim_waitlist(course_id):
+    courses = Course.__table__
+    return _update_course(course_id, courses.c.waitlist_count < courses.c.waitlist_size,
+                          waitlist_count=courses.c.waitlist_count + 1)
+
+
+def _claim_place(course_id):
+    """占一个名额，名额已满时占一个候补位；都没有时抛出 course_full"""
+    if _claim_seat(course_id):
+        return 'enrolled'
+    if _claim_waitlist(course_id):
+        return 'waitlisted'
+    raise EnrollmentError('course_full', '课程名额已满，无法选课')
+
+
+def _move_place(course_id, old_status, new_status):
+    """管理员设置状态时调整课程计数：进入已选/已完成或候补前先占位，离开时释放；返回是否空出了名额。
+
+    候补学生只能按顺序转正，不能直接改为已选/已完成；old_status 为 None 表示新建记录。
+    """
+    courses = Course.__table__
+    old_seat, new_seat = old_status in SEAT_STATUSES, new_status in SEAT_STATUSES
+    if old_status == 'waitlisted' and new_seat:
+        raise EnrollmentError('waitlisted', '该学生仍在候补名单中，名额空出后会按顺序自动转正')
+    if new_seat and not old_seat and not _claim_seat(course_id):
+        raise EnrollmentError('course_full', '课程名额已满，无法设为已选')
+    if new_status == 'waitlisted' and old_status != 'waitlisted' and not _claim_waitlist(course_id):
+        raise EnrollmentError('course_full', '课程候补名单已满')
+    if old_seat and not new_seat:
+        _update_course(course_id, courses.c.seats_taken > 0, seats_taken=courses.c.seats_taken - 1)
+    if old_status == 'waitlisted' and new_status != 'waitlisted':
+        _update_course(course_id, courses.c.waitlist_count > 0, waitlist_count=courses.c.waitlist_count - 1)
+    return old_seat and not new_seat
+
+
+def _check_status(status):
+    if status not in Enrollment.status.type.enums:
+        raise EnrollmentError('invalid_status', '选课状态无效', 400)
+
+
+def _insert_enrollment(values):
+    """插入选课记录，(学生, 课程) 已存在时不插入，返回插入的行数"""
+    table = Enrollment.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        statement = sqlite.insert(table).on_conflict_do_nothing(index_elements=['student_id', 'course_id'])
+    elif dialect == 'postgresql':
+        statement = postgresql.insert(table).on_conflict_do_nothing(index_elements=['student_id', 'course_id'])
+    elif dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(table).prefix_with('IGNORE')
+    else:
+        try:
+            with db.session.begin_nested():
+                return db.session.execute(table.insert(), values).rowcount
+        except IntegrityError:
+            return 0
+    return db.session.execute(statement, values).rowcount
+
+
+def _existing(student_id, course_id):
+    return db.session.execute(db.select(Enrollment.id, Enrollment.status, Enrollment.term_id, Enrollment.grade).where(
+        Enrollment.student_id == student_id, Enrollment.course_id == course_id)).first()
+
+
+def _already_enrolled(status):
+    if status == 'waitlisted':
+        return EnrollmentError('already_waitlisted', '您已在这门课程的候补名单中')
+    return EnrollmentError('already_enrolled', '您已经选修了这门课程')
+
+
+def _waitlist_position(course_id, enrollment_id):
+    return db.session.execute(db.select(db.func.count(Enrollment.id)).where(
+        Enrollment.course_id == course_id, Enrollment.status == 'waitlisted',
+        Enrollment.id <= enrollment_id)).scalar()
+
+
+def _promote_waitlist(course_id):
+    """有空余名额时，按加入顺序把候补学生转为正式选课，返回被转正的学生 ID 列表"""
+    courses = Course.__table__
+    promoted = []
+    while True:
+        waiting = db.session.execute(db.select(Enrollment.id, Enrollment.student_id).where(
+            Enrollment.course_id == course_id, Enrollment.status == 'waitlisted'
+        ).order_by(Enrollment.id).limit(1)).first()
+        if waiting is None:
+            return promoted
+        if not _update_course(course_id, db.and_(
+                db.or_(courses.c.max_students.is_(None), courses.c.seats_taken < courses.c.max_students),
+                courses.c.waitlist_count > 0),
+                seats_taken=courses.c.seats_taken + 1, waitlist_count=courses.c.waitlist_count - 1):
+            return promoted
+        updated = db.session.execute(db.update(Enrollment).where(
+            Enrollment.id == waiting.id, Enrollment.status == 'waitlisted'
+        ).values(status='enrolled', enrollment_date=date.today(), term_id=term_id_for(date.today()))).rowcount
+        if not updated:
+            raise _Retry()
+        promoted.append(waiting.student_id)
+
+
+def enroll_student(student_id, course_id):
+    """学生选课：有名额时直接选上，名额已满时进入候补名单，返回 EnrollmentResult；失败抛出 EnrollmentError"""
+    course = db.session.get(Course, course_id)
+    if course is None:
+        raise EnrollmentError('course_not_found', '课程不存在', 404)
+
+    def work():
+        existing = _existing(student_id, course_id)
+        if existing and existing.status not in REENROLL_STATUSES:
+            raise _already_enrolled(existing.status)
+
+        status = _claim_place(course_id)
+        today = date.today()
+        term_id = term_id_for(today)
+        if existing:
+            # 退过课的学生重新选课：复用原记录
+            inserted = db.session.execute(db.update(Enrollment).where(
+                Enrollment.id == existing.id, Enrollment.status.in_(REENROLL_STATUSES)
+            ).values(status=status, enrollment_date=today, term_id=term_id)).rowcount
+        else:
+            inserted = _insert_enrollment({'student_id': student_id, 'course_id': course_id,
+                                           'status': status, 'enrollment_date': today, 'term_id': term_id})
+        if not inserted:
+            # 并发的重复请求已经插入：回滚后重试，下一次会直接得到“已选”
+            raise _Retry()
+        refresh_statistics(db.session.connection(), [student_id], [course_id], recount_seats=False)
+        return status
+
+    status = _run_in_transaction(work)
+    enrollment = Enrollment.query.filter_by(student_id=student_id, course_id=course_id).one()
+    db.session.refresh(course)
+    position = _waitlist_position(course_id, enrollment.id) if status == 'waitlisted' else None
+    return EnrollmentResult(enrollment, course, status, waitlist_position=position)
+
+
+def drop_enrollment(student_id, course_id):
+    """学生退课：删除选课记录、释放名额并让候补名单中的第一位转正，返回 EnrollmentResult"""
+    course = db.session.get(Course, course_id)
+    courses = Course.__table__
+
+    def work():
+        existing = _existing(student_id, course_id)
+        if existing is None:
+            raise EnrollmentError('not_enrolled', '没有选修这门课程', 404)
+
+        # 先锁课程行（释放名额），再删除选课记录，与选课、转正的加锁顺序一致
+        if existing.status in SEAT_STATUSES:
+            _update_course(course_id, courses.c.seats_taken > 0, seats_taken=courses.c.seats_taken - 1)
+        elif existing.status == 'waitlisted':
+            _update_course(course_id, courses.c.waitlist_count > 0, waitlist_count=courses.c.waitlist_count - 1)
+        deleted = db.session.execute(db.delete(Enrollment).where(
+            Enrollment.id == existing.id, Enrollment.status == existing.status)).rowcount
+        if not deleted:
+            raise _Retry()
+
+        promoted = _promote_waitlist(course_id)
+        refresh_statistics(db.session.connection(), [student_id, *promoted], [course_id], recount_seats=False)
+        if existing.status == 'completed':
+            # 删除了计入 GPA 的课程
+            invalidate_transcripts(student_ids=[student_id])
+        if existing.grade is not None:
+            # 没有成绩的记录不计入成绩分布，选课期间的退课不让分布缓存失效
+            invalidate_grade_analytics([course_id], [existing.term_id])
+        return existing.status, promoted
+
+    status, promoted = _run_in_transaction(work)
+    return EnrollmentResult(None, course, status, promoted=promoted)
+
+
+def add_enrollment(student_id, course_id, status='enrolled', enrollment_date=None):
+    """管理员添加选课记录：已选/候补状态与学生选课一样先占名额，名额已满时抛出 course_full，返回新记录"""
+    _check_status(status)
+    if db.session.get(Course, course_id) is None:
+        raise EnrollmentError('course_not_found', '课程不存在', 404)
+    enrollment_date = enrollment_date or date.today()
+
+    def work():
+        existing = _existing(student_id, course_id)
+        if existing:
+            raise _already_enrolled(existing.status)
+        _move_place(course_id, None, status)
+        inserted = _insert_enrollment({'student_id': student_id, 'course_id': course_id, 'status': status,
+                                       'enrollment_date': enrollment_date,
+                                       'term_id': term_id_for(enrollment_date)})
+        if not inserted:
+            raise _Retry()
+        refresh_statistics(db.session.connection(), [student_id], [course_id], recount_seats=False)
+
+    _run_in_transaction(work)
+    return Enrollment.query.filter_by(student_id=student_id, course_id=course_id).one()
+
+
+def update_enrollment(enrollment_id, status, **values):
+    """管理员修改选课状态（以及成绩等字段）：名额按状态变化占用或释放，空出的名额让候补转正，返回被转正的学生 ID 列表"""
+    _check_status(status)
+    if status == 'waitlisted' and values.get('grade') is not None:
+        raise EnrollmentError('waitlisted', '该学生仍在候补名单中，不能录入成绩')
+
+    def work():
+        row = db.session.execute(db.select(
+            Enrollment.id, Enrollment.student_id, Enrollment.course_id, Enrollment.term_id, Enrollment.status
+        ).where(Enrollment.id == enrollment_id)).first()
+        if row is None:
+            raise EnrollmentError('not_found', '选课记录不存在', 404)
+
+        # 与选课、退课相同：先锁课程行（调整计数），再更新选课记录
+        freed = _move_place(row.course_id, row.status, status)
+        updated = db.session.execute(db.update(Enrollment).where(
+            Enrollment.id == row.id, Enrollment.status == row.status
+        ).values(status=status, **values)).rowcount
+        if not updated:
+            raise _Retry()
+
+        promoted = _promote_waitlist(row.course_id) if freed else []
+        refresh_statistics(db.session.connection(), [row.student_id, *promoted], [row.course_id],
+                           recount_seats=False)
+        invalidate_transcripts({(row.student_id, row.term_id)})
+        invalidate_grade_analytics([row.course_id], [row.term_id])
+        return promoted
+
+    return _run_in_transaction(work)
+
+
+def fill_from_waitlist(course_id):
+    """课程扩容或管理员删除选课记录后，把候补学生补进空出的名额，返回被转正的学生 ID 列表"""
+
+    def work():
+        promoted = _promote_waitlist(course_id)
+        if promoted:
+            refresh_statistics(db.session.connection(), promoted, [course_id], recount_seats=False)
+        return promoted
+
+    return _run_in_transaction(work)
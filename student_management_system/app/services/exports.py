@@ -0,0 +1,292 @@
+import csv
+import io
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response, current_app, send_file, stream_with_context
+from app import db
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.models.term import Term
+from app.models.statistics import CourseStatistics
+from app.services.filters import (student_list_query, course_list_query, enrollment_list_query,
+                                  grade_list_query, student_grade_query)
+from app.services.jobs import submit_job, purge_expired_jobs
+from app.services.replicas import use_replica
+from app.services.streaming import GENDER_LABELS
+
+# 服务端导出：查询条件与列表页共用 app.services.filters，只 SELECT 需要的列，
+# 服务端游标按批读取，边读边编码。CSV 带 BOM 以便 Excel 正确识别 UTF-8；
+# XLSX 使用 openpyxl 的 write_only 模式逐行写入。行数较多时转为后台任务写入文件。
+
+STATUS_LABELS = {'enrolled': '进行中', 'completed': '已完成', 'dropped': '已退课', 'withdrawn': '已撤销', 'waitlisted': '候补中'}
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXPORT_FORMATS = {'csv': 'text/csv; charset=utf-8', 'xlsx': XLSX_MIMETYPE}
+FORMAT_ALIASES = {'excel': 'xlsx', 'xls': 'xlsx'}
+
+
+class ExportError(ValueError):
+    """导出参数错误或导出环境不可用"""
+
+
+def _label(labels):
+    return lambda value: labels.get(value, value) if value else None
+
+
+class ExportSpec:
+    def __init__(self, title, build_query, columns, order, filters):
+        self.title = title
+        self.build_query = build_query  # build_query(filters) -> 已筛选的 Query
+        self.columns = columns  # [(表头, 列表达式, 转换函数或 None)]
+        self.order = order
+        self.filters = filters  # 允许从请求参数中读取的筛选项
+
+    @property
+    def headers(self):
+        return [header for header, _, _ in self.columns]
+
+
+def _student_name():
+    # 与 Student.full_name 一致
+    return Student.first_name + ' ' + Student.last_name
+
+
+EXPORTS = {
+    'students': ExportSpec(
+        '学生',
+        lambda f: student_list_query(f.get('search', '')),
+        [
+            ('学号', Student.student_id, None),
+            ('姓名', _student_name(), None),
+            ('邮箱', Student.email, None),
+            ('电话', Student.phone, None),
+            ('性别', Student.gender, _label(GENDER_LABELS)),
+            ('出生日期', Student.birth_date, None),
+            ('专业', Student.major, None),
+            ('入学年份', Student.enrollment_year, None),
+            ('地址', Student.address, None),
+        ],
+        [Student.id],
+        ('search',)
+    ),
+    'courses': ExportSpec(
+        '课程',
+        lambda f: course_list_query(f.get('search', '')).outerjoin(
+            CourseStatistics, CourseStatistics.course_id == Course.id),
+        [
+            ('课程代码', Course.course_code, None),
+            ('课程名称', Course.course_name, None),
+            ('学分', Course.credits, None),
+            ('院系', Course.department, None),
+            ('授课教师', Course.instructor, None),
+            ('选课人数', db.func.coalesce(CourseStatistics.total_count, 0), None),
+            ('课程描述', Course.description, None),
+        ],
+        [Course.id],
+        ('search',)
+    ),
+    'enrollments': ExportSpec(
+        '选课',
+        lambda f: enrollment_list_query(f.get('search', ''), f.get('status', '')),
+        [
+            ('学号', Student.student_id, None),
+            ('学生姓名', _student_name(), None),
+            ('课程代码', Course.course_code, None),
+            ('课程名称', Course.course_name, None),
+            ('学分', Course.credits, None),
+            ('选课日期', Enrollment.enrollment_date, None),
+            ('状态', Enrollment.status, _label(STATUS_LABELS)),
+            ('成绩', Enrollment.grade, None),
+        ],
+        [Enrollment.id],
+        ('search', 'status')
+    ),
+    'grades': ExportSpec(
+        '成绩',
+        lambda f: grade_list_query(f.get('search', ''), f.get('course', ''), f.get('status', 'completed')),
+        [
+            ('学号', Student.student_id, None),
+            ('学生姓名', _student_name(), None),
+            ('专业', Student.major, None),
+            ('课程代码', Course.course_code, None),
+            ('课程名称', Course.course_name, None),
+            ('学分', Course.credits, None),
+            ('成绩', Enrollment.grade, None),
+            ('状态', Enrollment.status, _label(STATUS_LABELS)),
+            ('更新时间', Enrollment.updated_at, None),
+        ],
+        [Enrollment.grade.desc(), Enrollment.id.desc()],
+        ('search', 'course', 'status')
+    ),
+    # 学生导出本人成绩，student_id 由视图根据当前用户填入，不从请求参数读取
+    'student_grades': ExportSpec(
+        '我的成绩',
+        lambda f: student_grade_query(f['student_id'], f.get('search', ''), f.get('status', ''),
+                                      f.get('semester', '')).outerjoin(Term, Term.id == Enrollment.term_id),
+        [
+            ('课程代码', Course.course_code, None),
+            ('课程名称', Course.course_name, None),
+            ('学分', Course.credits, None),
+            ('授课教师', Course.instructor, None),
+            ('选课日期', Enrollment.enrollment_date, None),
+            ('状态', Enrollment.status, _label(STATUS_LABELS)),
+            ('成绩', Enrollment.grade, None),
+            ('学期', Term.name, None),
+        ],
+        [Enrollment.updated_at.desc(), Enrollment.id.desc()],
+        ('search', 'status', 'semester')
+    ),
+}
+
+
+def normalize_format(value):
+    fmt = FORMAT_ALIASES.get((value or 'csv').lower(), (value or 'csv').lower())
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f'不支持的导出格式: {value}')
+    return fmt
+
+
+def filters_from_args(entity, args):
+    """从请求参数中取出该导出允许的筛选项；参数缺失时不放入，沿用列表页的默认值"""
+    return {name: args.get(name) for name in EXPORTS[entity].filters if name in args}
+
+
+def export_query(entity, filters):
+    spec = EXPORTS[entity]
+    query = spec.build_query(filters)
+    return query.order_by(*spec.order).with_entities(*[column for _, column, _ in spec.columns])
+
+
+def count_rows(entity, filters):
+    return EXPORTS[entity].build_query(filters).order_by(None).count()
+
+
+def iter_rows(entity, filters, batch_size=1000):
+    """服务端游标逐批读取，逐行产出已转换的元组"""
+    formatters = [formatter for _, _, formatter in EXPORTS[entity].columns]
+    statement = export_query(entity, filters).statement
+    result = db.session.execute(statement, execution_options={'yield_per': batch_size})
+    for partition in result.partitions():
+        for row in partition:
+            yield tuple(formatter(value) if formatter else value
+                        for formatter, value in zip(formatters, row))
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return format(value.normalize(), 'f')
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        # 防止以公式开头的文本在 Excel 中被当作公式执行
+        return "'" + value
+    return value
+
+
+def csv_chunks(headers, rows, rows_per_chunk=500):
+    """逐块产出 CSV 文本，首块以 BOM 开头"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def _xlsx_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def write_xlsx(headers, rows, target, title='Sheet1'):
+    """用 openpyxl 的只写模式逐行写入 XLSX，target 可以是路径或文件对象"""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportError('服务器未安装 openpyxl，无法导出 Excel 文件，请改用 CSV 格式')
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+    workbook.save(target)
+
+
+def export_filename(entity, fmt):
+    return f"{entity}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+
+
+def export_response(entity, fmt, filters):
+    """小批量导出：直接在请求中输出文件"""
+    spec = EXPORTS[entity]
+    batch_size = current_app.config.get('STREAM_BATCH_SIZE', 1000)
+    filename = export_filename(entity, fmt)
+
+    if fmt == 'csv':
+        body = csv_chunks(spec.headers, iter_rows(entity, filters, batch_size))
+        return Response(stream_with_context(body), mimetype=EXPORT_FORMATS['csv'],
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+    buffer = io.BytesIO()
+    write_xlsx(spec.headers, iter_rows(entity, filters, batch_size), buffer, title=spec.title)
+    buffer.seek(0)
+    return send_file(buffer, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=filename)
+
+
+def export_folder():
+    folder = current_app.config.get('EXPORT_FOLDER') or os.path.join(current_app.instance_path, 'exports')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _track_progress(rows, progress, total):
+    count = 0
+    for row in rows:
+        count += 1
+        if count % 500 == 0:
+            progress.update(progress=count, total=total)
+        yield row
+    progress.update(progress=count, total=total, force=True)
+
+
+def run_export(progress, entity, fmt, filters, folder, filename):
+    """后台任务：把导出结果写入文件，文件以任务 ID 命名，避免同名导出互相覆盖。
+    开始前顺带清理超过保留期的任务和文件，不占用提交导出的请求"""
+    purge_expired_jobs()
+    use_replica()
+    spec = EXPORTS[entity]
+    path = os.path.join(folder, f'{progress.job_id}.{fmt}')
+    total = count_rows(entity, filters)
+    progress.update(progress=0, total=total, message=f'正在导出{spec.title}数据', force=True)
+    rows = _track_progress(iter_rows(entity, filters, current_app.config.get('STREAM_BATCH_SIZE', 1000)),
+                           progress, total)
+
+    if fmt == 'csv':
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in csv_chunks(spec.headers, rows):
+                f.write(chunk)
+    else:
+        write_xlsx(spec.headers, rows, path, title=spec.title)
+
+    return {'result_path': path, 'result_name': filename, 'message': f'共导出 {total} 条{spec.title}记录'}
+
+
+def start_export_job(entity, fmt, filters, created_by=None):
+    return submit_job(f'export:{entity}', run_export, entity, fmt, filters, export_folder(),
+                      export_filename(entity, fmt), created_by=created_by)
@@ -0,0 +1,72 @@
+from app import db
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.models.term import Term, SEASON_LABELS
+from app.services.search import apply_search, search_filter
+
+# 列表页的筛选条件。页面、导出共用同一套查询，保证导出的就是列表里看到的数据。
+# 这里只负责筛选，排序、分页和加载策略由调用方决定。
+
+
+def student_list_query(search=''):
+    query = Student.query
+    if search:
+        query = apply_search(query, 'student', search)
+    return query
+
+
+def course_list_query(search=''):
+    query = Course.query
+    if search:
+        query = apply_search(query, 'course', search)
+    return query
+
+
+def _search_student_or_course(query, search):
+    return query.filter(db.or_(
+        search_filter('student', search, Enrollment.student_id),
+        search_filter('course', search, Enrollment.course_id)
+    ))
+
+
+def enrollment_list_query(search='', status=''):
+    query = Enrollment.query.join(Student).join(Course)
+    if search:
+        query = _search_student_or_course(query, search)
+    if status:
+        query = query.filter(Enrollment.status == status)
+    return query
+
+
+def grade_list_query(search='', course='', status='completed'):
+    # 只包含有成绩的记录
+    query = Enrollment.query.join(Student).join(Course).filter(Enrollment.grade.isnot(None))
+    if search:
+        query = _search_student_or_course(query, search)
+    if course:
+        query = query.filter(Course.id == course)
+    if status:
+        query = query.filter(Enrollment.status == status)
+    return query
+
+
+def semester_filter_clause(semester):
+    """'2024春季' / '2024秋季' 转换为 term_id 条件（学期名称唯一索引 + 选课学期索引），无法识别时返回 None"""
+    if not semester.endswith(tuple(SEASON_LABELS.values())):
+        return None
+    return Enrollment.term_id == db.select(Term.id).where(Term.name == semester).scalar_subquery()
+
+
+def student_grade_query(student_id, search='', status='', semester=''):
+    """学生本人的成绩列表（按课程名称或代码搜索、状态、学期筛选）"""
+    query = Enrollment.query.filter_by(student_id=student_id).filter(Enrollment.grade.isnot(None)).join(Course)
+    if search:
+        query = query.filter(search_filter('course', search, Enrollment.course_id))
+    if status:
+        query = query.filter(Enrollment.status == status)
+    if semester:
+        clause = semester_filter_clause(semester)
+        if clause is not None:
+            query = query.filter(clause)
+    return query
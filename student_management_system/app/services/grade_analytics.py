@@ -0,0 +1,288 @@
+import math
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from flask import current_app, has_app_context
+from sqlalchemy.orm import Session
+from app import db
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.models.term import Term
+
+# 成绩分布分析：按课程、学期或全部成绩统计人数、平均分、中位数、标准差、百分位数和固定分段直方图。
+# 每个范围只取一列成绩（按范围、成绩排序，走 (course_id|term_id, status, grade) 索引），
+# 在 Python 中单次遍历排好序的成绩算出全部指标；多门课程一起统计时也只有一条查询。
+# 结果（可直接序列化为 JSON 的字典）按 (范围, 键, 状态) 缓存在进程内（LRU，最多 GRADE_ANALYTICS_CACHE_SIZE 个范围键），
+# 有成绩的选课记录的成绩、状态、课程、学期变化时让对应课程、学期和全部成绩的缓存失效；
+# 与成绩单缓存相同，提交后再失效一次。没有成绩的记录（选课、候补、退课）不影响任何分布，不会让缓存失效。
+# 缓存的结果总是从主库读取，避免把副本上滞后的数据存入缓存。
+
+SCOPES = {
+    'course': Enrollment.course_id,
+    'term': Enrollment.term_id,
+    'all': None,
+}
+LOOKUP_CHUNK_SIZE = 500
+
+
+class AnalyticsError(ValueError):
+    """不支持的统计范围"""
+
+
+@dataclass
+class GradeDistribution:
+    count: int = 0
+    mean: float = 0.0
+    median: float = 0.0
+    stddev: float = 0.0
+    min: float = 0.0
+    max: float = 0.0
+    percentiles: dict = field(default_factory=dict)
+    histogram: list = field(default_factory=list)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _percentile(grades, p):
+    """线性插值百分位数（与 numpy.percentile 默认方式相同），grades 已排序"""
+    rank = (len(grades) - 1) * p / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    return grades[lower] + (grades[upper] - grades[lower]) * (rank - lower)
+
+
+def _histogram(grades, edges):
+    """固定分段直方图：[edges[i], edges[i+1])，最后一段包含上界"""
+    counts = [0] * (len(edges) - 1)
+    for grade in grades:
+        index = min(max(bisect_right(edges, grade) - 1, 0), len(counts) - 1)
+        counts[index] += 1
+    return [{'label': f'{edges[i]}-{edges[i + 1]}', 'lower': edges[i], 'upper': edges[i + 1], 'count': count}
+            for i, count in enumerate(counts)]
+
+
+def describe(grades, edges=None, percentiles=None):
+    """对一组已按升序排好的成绩计算分布"""
+    config = current_app.config
+    edges = edges or config.get('GRADE_HISTOGRAM_EDGES', [0, 60, 70, 80, 90, 100])
+    percentiles = percentiles or config.get('GRADE_PERCENTILES', (10, 25, 50, 75, 90))
+    grades = [float(grade) for grade in grades]
+    if not grades:
+        return GradeDistribution(percentiles={f'p{p}': 0.0 for p in percentiles}, histogram=_histogram([], edges))
+
+    count = len(grades)
+    mean = math.fsum(grades) / count
+    stddev = math.sqrt(math.fsum((grade - mean) ** 2 for grade in grades) / count)
+    return GradeDistribution(
+        count=count,
+        mean=round(mean, 2),
+        median=round(_percentile(grades, 50), 2),
+        stddev=round(stddev, 2),
+        min=grades[0],
+        max=grades[-1],
+        percentiles={f'p{p}': round(_percentile(grades, p), 2) for p in percentiles},
+        histogram=_histogram(grades, edges)
+    )
+
+
+def describe_query(query):
+    """对已筛选的选课查询（例如带搜索条件的成绩列表）直接计算分布，不缓存"""
+    rows = query.order_by(None).with_entities(Enrollment.grade).filter(
+        Enrollment.grade.isnot(None)).order_by(Enrollment.grade)
+    return describe([grade for grade, in rows]).to_dict()
+
+
+def _conditions(status):
+    conditions = [Enrollment.grade.isnot(None)]
+    if status:
+        conditions.append(Enrollment.status == status)
+    return conditions
+
+
+def _execute(statement):
+    # 显式绑定主库：结果会被缓存
+    return db.session.execute(statement, bind_arguments={'bind': db.engine})
+
+
+def _load(scope, keys, status):
+    """一条查询取出这些键的成绩（按键、成绩排序），返回 {键: 分布字典}"""
+    column = SCOPES[scope]
+    if column is None:
+        grades = [grade for grade, in _execute(
+            db.select(Enrollment.grade).where(*_conditions(status)).order_by(Enrollment.grade))]
+        return {None: describe(grades).to_dict()}
+
+    grouped = {key: [] for key in keys}
+    keys = [key for key in keys if key is not None]
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        statement = db.select(column, Enrollment.grade).where(
+            column.in_(keys[start:start + LOOKUP_CHUNK_SIZE]), *_conditions(status)
+        ).order_by(column, Enrollment.grade)
+        for key, grade in _execute(statement):
+            grouped[key].append(grade)
+    return {key: describe(grades).to_dict() for key, grades in grouped.items()}
+
+
+def _all_keys(scope, status):
+    column = SCOPES[scope]
+    if column is None:
+        return [None]
+    statement = db.select(column).where(column.isnot(None), *_conditions(status)).distinct().order_by(column)
+    return list(_execute(statement).scalars())
+
+
+class GradeAnalyticsCache:
+    """进程内 LRU + TTL 缓存：(范围, 键) → {状态: (过期时间, 分布字典)}。
+    版本号在每次失效时加一，读取前后版本号不同时不写回缓存"""
+
+    def __init__(self, app):
+        self.ttl = app.config.get('GRADE_ANALYTICS_TTL', 600)
+        self.maxsize = app.config.get('GRADE_ANALYTICS_CACHE_SIZE', 10000)
+        self.version = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, scope, keys, status):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._items.get((scope, key), {}).get(status)
+                if entry is not None and entry[0] > now:
+                    found[key] = entry[1]
+                    self._items.move_to_end((scope, key))
+            return found, self.version
+
+    def set_many(self, scope, results, status, version):
+        if not self.ttl:
+            return
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if version != self.version:
+                return
+            for key, data in results.items():
+                self._items.setdefault((scope, key), {})[status] = (expires, data)
+                self._items.move_to_end((scope, key))
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, scope_keys):
+        with self._lock:
+            self.version += 1
+            for scope_key in scope_keys:
+                self._items.pop(scope_key, None)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+def init_grade_analytics(app):
+    app.extensions['grade_analytics'] = GradeAnalyticsCache(app)
+
+
+def get_grade_analytics_cache():
+    return current_app.extensions['grade_analytics']
+
+
+def grade_distributions(scope, keys=None, status='completed'):
+    """多个课程/学期的成绩分布 {键: 分布字典}；keys 为空时统计该范围内所有有成绩的键。
+    已缓存的直接返回，其余的用一条查询一起计算"""
+    if scope not in SCOPES:
+        raise AnalyticsError(f'不支持的统计范围: {scope}')
+    status = status or ''
+    cache = get_grade_analytics_cache()
+    keys = _all_keys(scope, status) if keys is None else list(keys)
+    results, version = cache.get_many(scope, keys, status)
+    missing = [key for key in keys if key not in results]
+    if missing:
+        loaded = _load(scope, missing, status)
+        cache.set_many(scope, loaded, status, version)
+        results.update(loaded)
+    return {key: results[key] for key in keys}
+
+
+def grade_distribution(scope, key=None, status='completed'):
+    """单个课程/学期（scope='all' 时为全部成绩）的成绩分布"""
+    return grade_distributions(scope, [key], status)[key]
+
+
+def scope_names(scope, keys):
+    """统计结果的显示名称：课程为“代码 名称”，学期为学期名称"""
+    keys = [key for key in keys if key is not None]
+    if scope == 'course' and keys:
+        return {course_id: f'{code} {name}' for course_id, code, name in db.session.execute(
+            db.select(Course.id, Course.course_code, Course.course_name).where(Course.id.in_(keys)))}
+    if scope == 'term' and keys:
+        return dict(db.session.execute(db.select(Term.id, Term.name).where(Term.id.in_(keys))).all())
+    return {}
+
+
+def _scope_keys(course_ids=(), term_ids=()):
+    keys = {('course', course_id) for course_id in course_ids}
+    keys.update(('term', term_id) for term_id in term_ids)
+    keys.add(('all', None))
+    return keys
+
+
+def _invalidate(keys):
+    if keys and has_app_context() and 'grade_analytics' in current_app.extensions:
+        get_grade_analytics_cache().invalidate(keys)
+
+
+def invalidate_grade_analytics(course_ids=(), term_ids=(), session=None):
+    """成绩已变化（批量写入时显式调用）：立即失效，并在当前事务提交后再失效一次"""
+    keys = _scope_keys(course_ids, term_ids)
+    _invalidate(keys)
+    (session or db.session).info.setdefault('grade_analytics_keys', set()).update(keys)
+
+
+def _has_grade(obj):
+    """记录在本次修改前或修改后有成绩；从未有过成绩的记录不计入任何分布"""
+    state = db.inspect(obj)
+    if 'grade' in state.unloaded:
+        return True
+    history = state.attrs.grade.history
+    return any(grade is not None for grade in (*history.added, *history.unchanged, *history.deleted))
+
+
+def _changed_scopes(session):
+    course_ids, term_ids = set(), set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Enrollment) and _has_grade(obj):
+            course_ids.add(obj.course_id)
+            term_ids.add(obj.term_id)
+    for obj in session.dirty:
+        if isinstance(obj, Enrollment) and _has_grade(obj):
+            attrs = db.inspect(obj).attrs
+            if not any(attrs[attr].history.has_changes() for attr in ('grade', 'status', 'course_id', 'term_id')):
+                continue
+            course_ids.update({obj.course_id, *attrs.course_id.history.deleted})
+            term_ids.update({obj.term_id, *attrs.term_id.history.deleted})
+    course_ids.discard(None)
+    term_ids.discard(None)
+    return course_ids, term_ids
+
+
+@db.event.listens_for(Session, 'after_flush')
+def _invalidate_after_flush(session, flush_context):
+    course_ids, term_ids = _changed_scopes(session)
+    if course_ids or term_ids:
+        invalidate_grade_analytics(course_ids, term_ids, session=session)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    _invalidate(session.info.pop('grade_analytics_keys', None))
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('grade_analytics_keys', None)
@@ -0,0 +1,181 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from app import db
+from app.models.student import Student
+from app.models.enrollment import Enrollment, SEAT_STATUSES
+from app.services.enrollments import fill_from_waitlist
+from app.services.loading import apply_loader_policy
+from app.services.summary import refresh_statistics
+from app.services.transcript import invalidate_transcripts
+from app.services.grade_analytics import invalidate_grade_analytics
+
+# 批量录入成绩：整批一起校验（按 id、按 学生+课程 各一条查询定位选课记录），
+# 然后在一个事务里用按主键的批量 UPDATE（executemany）写入。
+# 批量 UPDATE 不经过 ORM 刷新事件，写入后显式刷新受影响学生和课程的统计汇总。
+# 名额只能通过选课服务占用：候补、已退课、已撤销的记录都不能在这里录入成绩或改为已选/已完成；
+# 改为退课/撤销空出的名额在提交后交给候补名单补位。
+
+ENROLLMENT_STATUSES = ('enrolled', 'completed', 'dropped', 'withdrawn')
+
+
+class GradeBatchError(ValueError):
+    """请求体格式错误，整批无法处理"""
+
+
+def _parse_grade(value):
+    if value is None or value == '':
+        return None
+    try:
+        grade = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError('成绩必须是数字')
+    if not grade.is_finite():
+        raise ValueError('成绩必须是数字')
+    if grade < 0 or grade > 100:
+        raise ValueError('成绩必须在0到100之间')
+    return grade.quantize(Decimal('0.01'))
+
+
+def _as_id(value):
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('ID 必须是整数')
+
+
+def _parse_item(item, default_course_id):
+    """返回 (enrollment_id, (student_id, course_id), 变更字段)"""
+    if not isinstance(item, dict):
+        raise ValueError('每一项必须是对象')
+
+    enrollment_id, pair = None, None
+    if item.get('enrollment_id') not in (None, ''):
+        enrollment_id = _as_id(item['enrollment_id'])
+    elif item.get('student_id') not in (None, ''):
+        course_id = item.get('course_id', default_course_id)
+        if course_id in (None, ''):
+            raise ValueError('按学生录入时需要 course_id')
+        pair = (_as_id(item['student_id']), _as_id(course_id))
+    else:
+        raise ValueError('需要 enrollment_id 或 student_id')
+
+    changes = {}
+    if 'grade' in item:
+        changes['grade'] = _parse_grade(item['grade'])
+    if item.get('status'):
+        if item['status'] not in ENROLLMENT_STATUSES:
+            raise ValueError('状态必须是 ' + '/'.join(ENROLLMENT_STATUSES))
+        changes['status'] = item['status']
+    if not changes:
+        raise ValueError('需要 grade 或 status')
+    # 与单条录入一致：录入成绩且未指定状态时自动设为已完成
+    if changes.get('grade') is not None and 'status' not in changes:
+        changes['status'] = 'completed'
+    return enrollment_id, pair, changes
+
+
+def _load_enrollments(enrollment_ids, pairs):
+    """按 id 和 (学生, 课程) 两种方式各一条查询取出选课记录"""
+    columns = (Enrollment.id, Enrollment.student_id, Enrollment.course_id, Enrollment.term_id,
+               Enrollment.grade, Enrollment.status)
+    by_id, by_pair = {}, {}
+    if enrollment_ids:
+        for row in db.session.execute(db.select(*columns).where(Enrollment.id.in_(enrollment_ids))):
+            by_id[row.id] = row
+    if pairs:
+        student_ids = {student_id for student_id, _ in pairs}
+        course_ids = {course_id for _, course_id in pairs}
+        for row in db.session.execute(db.select(*columns).where(
+                Enrollment.student_id.in_(student_ids), Enrollment.course_id.in_(course_ids))):
+            if (row.student_id, row.course_id) in pairs:
+                by_pair[(row.student_id, row.course_id)] = row
+    return by_id, by_pair
+
+
+def apply_grade_batch(items, course_id=None, atomic=False):
+    """批量更新成绩/状态，返回 (逐项结果, 更新条数)。
+
+    items 中每项为 {enrollment_id 或 student_id[+course_id], grade, status}，course_id 可以在整批上指定。
+    atomic 为真时只要有一项出错就不写入任何数据。
+    """
+    if not isinstance(items, list) or not items:
+        raise GradeBatchError('items 必须是非空数组')
+
+    results = []
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            enrollment_id, pair, changes = _parse_item(item, course_id)
+            parsed.append((index, enrollment_id, pair, changes))
+            results.append({'index': index, 'success': True})
+        except ValueError as e:
+            results.append({'index': index, 'success': False, 'error': str(e)})
+
+    by_id, by_pair = _load_enrollments(
+        {enrollment_id for _, enrollment_id, _, _ in parsed if enrollment_id is not None},
+        {pair for _, _, pair, _ in parsed if pair is not None}
+    )
+
+    updates = {}
+    for index, enrollment_id, pair, changes in parsed:
+        result = results[index]
+        row = by_id.get(enrollment_id) if enrollment_id is not None else by_pair.get(pair)
+        if row is None:
+            result.update(success=False, error='选课记录不存在' if enrollment_id is not None else '该学生未选这门课程')
+            continue
+        if course_id not in (None, '') and str(row.course_id) != str(course_id):
+            result.update(success=False, error='选课记录不属于该课程')
+            continue
+        if row.id in updates:
+            result.update(success=False, error=f'与第 {updates[row.id][0] + 1} 项重复')
+            continue
+
+        grade = changes['grade'] if 'grade' in changes else row.grade
+        status = changes.get('status', row.status)
+        if status in SEAT_STATUSES and row.status not in SEAT_STATUSES:
+            # 进入已选/已完成需要占名额，只能通过选课服务（候补转正、管理员修改选课记录）
+            if row.status == 'waitlisted':
+                result.update(success=False, error='该学生仍在候补名单中，不能录入成绩或改为已选')
+            else:
+                result.update(success=False, error='该选课记录已退课或撤销，需要先在选课管理中恢复为已选')
+            continue
+        updates[row.id] = (index, row, grade, status)
+        result.update(enrollment_id=row.id, student_id=row.student_id, course_id=row.course_id,
+                      grade=float(grade) if grade is not None else None, status=status,
+                      changed=(grade != row.grade or status != row.status))
+
+    if atomic and any(not result['success'] for result in results):
+        for result in results:
+            if result['success']:
+                result.update(success=False, error='批次中存在错误，未写入')
+        return results, 0
+
+    # 只写入确实有变化的记录；每行字典的键相同，整批作为一条 executemany 执行
+    now = datetime.utcnow()
+    rows = [{'id': row.id, 'grade': grade, 'status': status, 'updated_at': now}
+            for _, row, grade, status in updates.values() if grade != row.grade or status != row.status]
+    if rows:
+        try:
+            db.session.execute(db.update(Enrollment), rows)
+            changed = [updates[values['id']][1] for values in rows]
+            refresh_statistics(db.session.connection(),
+                               {row.student_id for row in changed}, {row.course_id for row in changed})
+            invalidate_transcripts({(row.student_id, row.term_id) for row in changed})
+            invalidate_grade_analytics({row.course_id for row in changed}, {row.term_id for row in changed})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        freed = {row.course_id for row in changed
+                 if row.status in SEAT_STATUSES and updates[row.id][3] not in SEAT_STATUSES}
+        for freed_course_id in sorted(freed):
+            fill_from_waitlist(freed_course_id)
+    return results, len(rows)
+
+
+def course_roster(course_id):
+    """成绩表格页面：课程的全部选课记录及学生信息，一条查询"""
+    query = Enrollment.query.join(Student).filter(Enrollment.course_id == course_id)
+    return apply_loader_policy(query, 'admin.grade_grid').order_by(Student.student_id).all()
@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import OrderedDict
+from importlib import import_module
+from flask import current_app, g, has_app_context
+from flask_login import current_user
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app import db
+from app.models.user import User
+from app.models.student import Student
+
+# 登录用户及其学生记录的读穿透缓存。
+# 每个请求内：Flask-Login 已经把 current_user 缓存在 g 上，学生记录同样只查一次（g._current_student）；
+# 跨请求：按 IDENTITY_CACHE_TTL 缓存两者的列值，命中时用 merge(load=False) 挂到当前会话，不发 SELECT。
+# 密码哈希不进入缓存（后端可能是外部缓存），只在校验密码时按需从数据库加载。
+# 用户或学生在本进程中被修改时，通过会话事件删除对应的缓存项；多进程部署时其他进程最多滞后 TTL 秒。
+
+_MISSING = object()
+# 不缓存的列：挂到会话后标记为过期，访问时单独查询
+UNCACHED_COLUMNS = {'password_hash'}
+
+
+class MemoryIdentityCache:
+    """进程内 LRU + TTL 缓存"""
+
+    def __init__(self, app):
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 60)
+        self.maxsize = app.config.get('IDENTITY_CACHE_SIZE', 10000)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] <= now:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class NullIdentityCache:
+    """不做跨请求缓存，每个请求都查询数据库"""
+
+    def __init__(self, app):
+        pass
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+IDENTITY_CACHE_BACKENDS = {
+    'memory': MemoryIdentityCache,
+    'null': NullIdentityCache,
+}
+
+
+def _backend_class(name):
+    """内置后端名，或 'package.module:ClassName' 形式的自定义后端（构造参数为 app）"""
+    if name in IDENTITY_CACHE_BACKENDS:
+        return IDENTITY_CACHE_BACKENDS[name]
+    module_name, _, class_name = name.partition(':')
+    return getattr(import_module(module_name), class_name)
+
+
+def init_identity_cache(app):
+    backend = app.config.get('IDENTITY_CACHE_BACKEND', 'memory')
+    if not app.config.get('IDENTITY_CACHE_TTL'):
+        backend = 'null'
+    app.extensions['identity_cache'] = _backend_class(backend)(app)
+
+
+def get_identity_cache():
+    return current_app.extensions['identity_cache']
+
+
+def _user_key(user_id):
+    return f'user:{user_id}'
+
+
+def _student_key(user_id):
+    return f'student:{user_id}'
+
+
+def _snapshot(obj):
+    mapper = db.inspect(obj).mapper
+    return {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs if attr.key not in UNCACHED_COLUMNS}
+
+
+def _attach(model, values):
+    """把缓存的列值还原为当前会话中的持久化对象，不查询数据库"""
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    obj = db.session.merge(obj, load=False)
+    uncached = [attr.key for attr in db.inspect(model).column_attrs if attr.key in UNCACHED_COLUMNS]
+    if uncached:
+        db.session.expire(obj, uncached)
+    return obj
+
+
+def _load(model, key, loader):
+    cache = get_identity_cache()
+    values = cache.get(key)
+    if values is not None:
+        return _attach(model, values)
+    obj = loader()
+    # 查不到时不缓存，新建的用户或学生记录可以立即被找到
+    if obj is not None:
+        cache.set(key, _snapshot(obj))
+    return obj
+
+
+def load_user(user_id):
+    """Flask-Login 的 user_loader"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    return _load(User, _user_key(user_id), lambda: db.session.get(User, user_id))
+
+
+def get_current_student():
+    """当前登录用户对应的学生记录（students.user_id），没有时返回 None"""
+    if not current_user.is_authenticated:
+        return None
+    student = g.get('_current_student', _MISSING)
+    if student is _MISSING or student is None:
+        user_id = current_user.id
+        student = _load(Student, _student_key(user_id),
+                        lambda: Student.query.filter_by(user_id=user_id).first())
+        g._current_student = student
+    return student
+
+
+def invalidate_users(*user_ids):
+    if has_app_context():
+        get_identity_cache().delete(*[_user_key(user_id) for user_id in user_ids])
+
+
+def invalidate_students(*user_ids):
+    """按关联的用户 id 删除学生记录缓存"""
+    if has_app_context():
+        g.pop('_current_student', None)
+        get_identity_cache().delete(*[_student_key(user_id) for user_id in user_ids])
+
+
+def _changed_keys(session):
+    user_ids, student_user_ids = set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, Student):
+            student_user_ids.add(obj.user_id)
+            student_user_ids.update(db.inspect(obj).attrs.user_id.history.deleted)
+    user_ids.discard(None)
+    student_user_ids.discard(None)
+    return user_ids, student_user_ids
+
+
+@db.event.listens_for(Session, 'after_flush')
+def _invalidate_after_flush(session, flush_context):
+    user_ids, student_user_ids = _changed_keys(session)
+    if not (user_ids or student_user_ids):
+        return
+    invalidate_users(*user_ids)
+    invalidate_students(*student_user_ids)
+    # 提交后再删一次：避免其他请求在提交前读到旧值又写回缓存
+    pending = session.info.setdefault('identity_cache_keys', (set(), set()))
+    pending[0].update(user_ids)
+    pending[1].update(student_user_ids)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    pending = session.info.pop('identity_cache_keys', None)
+    if pending:
+        invalidate_users(*pending[0])
+        invalidate_students(*pending[1])
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('identity_cache_keys', None)
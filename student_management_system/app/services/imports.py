@@ -0,0 +1,421 @@
+import csv
+import io
+import re
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from flask import current_app
+from app import db
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.services.exports import STATUS_LABELS
+from app.services.catalog import invalidate_catalog
+from app.services.search import index_ids
+from app.services.streaming import GENDER_LABELS
+from app.services.summary import refresh_statistics
+from app.services.terms import term_ids_for
+from app.services.transcript import invalidate_transcripts
+from app.services.grade_analytics import invalidate_grade_analytics
+
+# 批量导入：先逐行解析、校验格式，再对整个文件做集合式的唯一性检查
+# （每个唯一键一条 IN 查询，而不是每行一次查询），最后按批 executemany 插入有效行。
+# 批量插入不经过 ORM 刷新事件，因此插入后显式更新搜索索引和统计汇总表。
+
+EMAIL_PATTERN = re.compile(r"[^@]+@[^@]+\.[^@]+")
+
+# 单条语句的参数个数有上限（SQLite 为 32766），IN 查询按此大小分块
+LOOKUP_CHUNK_SIZE = 10000
+
+
+class ImportFileError(ValueError):
+    """文件无法读取或缺少必需的列"""
+
+
+class ImportField:
+    def __init__(self, name, label, parse=None, required=False, default=None, aliases=()):
+        self.name = name
+        self.label = label
+        self.parse = parse  # parse(text) -> 值，格式错误时抛出 ValueError
+        self.required = required
+        self.default = default
+        self.aliases = aliases
+
+
+def _text(value):
+    """单元格值转为去掉首尾空白的字符串；Excel 中的整数会被读成浮点数"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _max_length(column):
+    return lambda value: _check_length(value, column.type.length)
+
+
+def _check_length(value, length):
+    if length and len(value) > length:
+        raise ValueError(f'长度不能超过{length}个字符')
+    return value
+
+
+def _email(value):
+    if not EMAIL_PATTERN.fullmatch(value):
+        raise ValueError('请输入有效的邮箱地址')
+    return _check_length(value, Student.email.type.length)
+
+
+def _integer(minimum=None, maximum=None):
+    def parse(value):
+        try:
+            number = int(Decimal(value))
+        except (InvalidOperation, ValueError):
+            raise ValueError('必须是整数')
+        if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+            raise ValueError(f'必须在{minimum}到{maximum}之间' if maximum is not None else f'必须不小于{minimum}')
+        return number
+    return parse
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in ('%Y-%m-%d', '%Y/%m/%d'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError('日期格式应为 YYYY-MM-DD')
+
+
+def _choice(labels):
+    """接受英文取值或对应的中文标签"""
+    reverse = {label: key for key, label in labels.items()}
+
+    def parse(value):
+        if value in labels:
+            return value
+        if value in reverse:
+            return reverse[value]
+        raise ValueError('可选值：' + '、'.join(labels.values()))
+    return parse
+
+
+def _grade(value):
+    try:
+        grade = Decimal(value)
+    except InvalidOperation:
+        raise ValueError('成绩必须是数字')
+    if not grade.is_finite():
+        raise ValueError('成绩必须是数字')
+    if grade < 0 or grade > 100:
+        raise ValueError('成绩必须在0到100之间')
+    return grade.quantize(Decimal('0.01'))
+
+
+class ImportSpec:
+    def __init__(self, title, fields, validate, insert):
+        self.title = title
+        self.fields = fields
+        self.validate = validate  # validate(records, result)：集合式唯一性/外键检查
+        self.insert = insert  # insert(rows, batch_size)：批量写入有效行
+
+    def column_map(self, headers):
+        """表头 -> 字段名，接受字段名、中文表头（与导出文件一致）和别名"""
+        names = {}
+        for field in self.fields:
+            for key in (field.name, field.label) + tuple(field.aliases):
+                names[key.strip().lower()] = field.name
+        mapping, ignored = {}, []
+        for index, header in enumerate(headers):
+            name = names.get(_text(header).lower())
+            if name and name not in mapping.values():
+                mapping[index] = name
+            elif _text(header):
+                ignored.append(_text(header))
+        missing = [field.label for field in self.fields if field.required and field.name not in mapping.values()]
+        if missing:
+            raise ImportFileError('缺少必需的列：' + '、'.join(missing))
+        return mapping, ignored
+
+
+class ImportResult:
+    def __init__(self, entity, dry_run=False):
+        self.entity = entity
+        self.dry_run = dry_run
+        self.total = 0
+        self.inserted = 0
+        self.errors = []
+        self.ignored_columns = []
+        self.elapsed = 0
+
+    def add_error(self, row, field, message, value=None):
+        self.errors.append({'row': row, 'field': field, 'value': value, 'message': message})
+
+    @property
+    def error_rows(self):
+        return {error['row'] for error in self.errors}
+
+    @property
+    def valid(self):
+        return self.total - len(self.error_rows)
+
+    def to_dict(self, max_errors=None):
+        return {
+            'entity': self.entity,
+            'dry_run': self.dry_run,
+            'total': self.total,
+            'valid': self.valid,
+            'inserted': self.inserted,
+            'error_count': len(self.errors),
+            'errors': self.errors[:max_errors] if max_errors else self.errors,
+            'ignored_columns': self.ignored_columns,
+            'elapsed': round(self.elapsed, 3)
+        }
+
+
+def _existing(column, values):
+    """values 中已存在于数据库的值"""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+        found.update(value for (value,) in db.session.execute(db.select(column).where(column.in_(chunk))))
+    return found
+
+
+def _lookup(key_column, values):
+    """{业务键: 主键 id}"""
+    values = list(values)
+    mapping = {}
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+        mapping.update(db.session.execute(
+            db.select(key_column, key_column.class_.id).where(key_column.in_(chunk))
+        ).all())
+    return mapping
+
+
+def _check_unique(records, result, field, label, column):
+    """文件内重复和数据库中已存在的值都记为错误"""
+    first_row = {}
+    for row, values in records:
+        value = values.get(field)
+        if value in first_row:
+            result.add_error(row, label, f'与第 {first_row[value]} 行重复', value)
+        elif value is not None:
+            first_row[value] = row
+    for value in _existing(column, first_row):
+        result.add_error(first_row[value], label, f'{label}已存在', value)
+
+
+def _bulk_insert(model, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(db.insert(model), rows[start:start + batch_size])
+
+
+def _validate_students(records, result):
+    _check_unique(records, result, 'student_id', '学号', Student.student_id)
+    _check_unique(records, result, 'email', '邮箱', Student.email)
+
+
+def _insert_students(rows, batch_size):
+    _bulk_insert(Student, rows, batch_size)
+    index_ids('student', _lookup(Student.student_id, [row['student_id'] for row in rows]).values())
+
+
+def _validate_courses(records, result):
+    _check_unique(records, result, 'course_code', '课程代码', Course.course_code)
+
+
+def _insert_courses(rows, batch_size):
+    _bulk_insert(Course, rows, batch_size)
+    index_ids('course', _lookup(Course.course_code, [row['course_code'] for row in rows]).values())
+    invalidate_catalog()
+
+
+def _validate_enrollments(records, result):
+    # 学号、课程代码各一条查询换成主键，再用一条查询取出这些学生已有的选课
+    student_ids = _lookup(Student.student_id, {values['student_id'] for _, values in records})
+    course_ids = _lookup(Course.course_code, {values['course_code'] for _, values in records})
+
+    existing_pairs = set()
+    ids = list(set(student_ids.values()))
+    for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        existing_pairs.update(tuple(pair) for pair in db.session.execute(
+            db.select(Enrollment.student_id, Enrollment.course_id).where(
+                Enrollment.student_id.in_(ids[start:start + LOOKUP_CHUNK_SIZE]))
+        ))
+
+    first_row = {}
+    for row, values in records:
+        student_id = student_ids.get(values['student_id'])
+        course_id = course_ids.get(values['course_code'])
+        if student_id is None:
+            result.add_error(row, '学号', '学生不存在', values['student_id'])
+        if course_id is None:
+            result.add_error(row, '课程代码', '课程不存在', values['course_code'])
+        if student_id is None or course_id is None:
+            continue
+
+        pair = (student_id, course_id)
+        if pair in first_row:
+            result.add_error(row, '课程代码', f'与第 {first_row[pair]} 行的选课重复', values['course_code'])
+        elif pair in existing_pairs:
+            result.add_error(row, '课程代码', '该学生已选过这门课程', values['course_code'])
+        else:
+            first_row[pair] = row
+        # 插入时使用主键；未填写状态时，有成绩视为已完成（与单条录入成绩一致）
+        values['student_id'], values['course_id'] = student_id, course_id
+        del values['course_code']
+        if values['status'] is None:
+            values['status'] = 'completed' if values['grade'] is not None else 'enrolled'
+
+
+def _insert_enrollments(rows, batch_size):
+    # 选课日期只有少数几个：按日期一次取得学期 ID
+    term_ids = term_ids_for([row['enrollment_date'] for row in rows])
+    for row in rows:
+        row['term_id'] = term_ids[row['enrollment_date']]
+    _bulk_insert(Enrollment, rows, batch_size)
+    refresh_statistics(db.session.connection(),
+                       {row['student_id'] for row in rows}, {row['course_id'] for row in rows})
+    invalidate_transcripts({(row['student_id'], row['term_id']) for row in rows if row['status'] == 'completed'})
+    graded = [row for row in rows if row['grade'] is not None]
+    if graded:
+        invalidate_grade_analytics({row['course_id'] for row in graded}, {row['term_id'] for row in graded})
+
+
+IMPORTS = {
+    'students': ImportSpec('学生', [
+        ImportField('student_id', '学号', _max_length(Student.student_id), required=True),
+        ImportField('first_name', '名', _max_length(Student.first_name), required=True),
+        ImportField('last_name', '姓', _max_length(Student.last_name), required=True),
+        ImportField('email', '邮箱', _email, required=True),
+        ImportField('phone', '电话', _max_length(Student.phone)),
+        ImportField('gender', '性别', _choice(GENDER_LABELS)),
+        ImportField('birth_date', '出生日期', _date),
+        ImportField('major', '专业', _max_length(Student.major)),
+        ImportField('enrollment_year', '入学年份', _integer(1900, 2100)),
+        ImportField('address', '地址'),
+    ], _validate_students, _insert_students),
+    'courses': ImportSpec('课程', [
+        ImportField('course_code', '课程代码', _max_length(Course.course_code), required=True),
+        ImportField('course_name', '课程名称', _max_length(Course.course_name), required=True),
+        ImportField('credits', '学分', _integer(1, 20), default=3),
+        ImportField('department', '院系', _max_length(Course.department)),
+        ImportField('instructor', '授课教师', _max_length(Course.instructor)),
+        ImportField('description', '课程描述'),
+    ], _validate_courses, _insert_courses),
+    'enrollments': ImportSpec('选课', [
+        ImportField('student_id', '学号', required=True),
+        ImportField('course_code', '课程代码', required=True),
+        ImportField('enrollment_date', '选课日期', _date, default=date.today),
+        ImportField('status', '状态', _choice(STATUS_LABELS)),
+        ImportField('grade', '成绩', _grade),
+    ], _validate_enrollments, _insert_enrollments),
+}
+
+
+def read_table(stream, filename):
+    """读取上传的 CSV/XLSX，返回 (表头, 数据行迭代器)"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+    if extension == 'csv':
+        data = stream.read()
+        try:
+            text = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            # Excel 在中文系统上另存的 CSV 通常是 GBK 编码
+            text = data.decode('gb18030')
+        reader = csv.reader(io.StringIO(text))
+        return next(reader, []), reader
+
+    if extension in ('xlsx', 'xlsm'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportFileError('服务器未安装 openpyxl，无法读取 Excel 文件，请改用 CSV 格式')
+        try:
+            sheet = load_workbook(stream, read_only=True, data_only=True).active
+        except Exception:
+            raise ImportFileError('无法读取 Excel 文件')
+        rows = sheet.iter_rows(values_only=True)
+        return list(next(rows, [])), rows
+
+    raise ImportFileError('只支持 CSV 或 XLSX 文件')
+
+
+def import_rows(entity, headers, rows, dry_run=False, batch_size=None):
+    """校验并导入数据行，返回 ImportResult；dry_run 时只校验不写入"""
+    started = time.perf_counter()
+    spec = IMPORTS[entity]
+    batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+    max_rows = current_app.config.get('IMPORT_MAX_ROWS', 50000)
+    fields = {field.name: field for field in spec.fields}
+    mapping, ignored = spec.column_map(headers)
+
+    result = ImportResult(entity, dry_run=dry_run)
+    result.ignored_columns = ignored
+
+    # 第一遍：逐行解析，行号与电子表格一致（表头为第 1 行）
+    records = []
+    for row_number, raw in enumerate(rows, start=2):
+        if not any(_text(value) for value in raw):
+            continue
+        result.total += 1
+        if result.total > max_rows:
+            raise ImportFileError(f'单次最多导入 {max_rows} 行')
+
+        values, valid = {}, True
+        for index, name in mapping.items():
+            field = fields[name]
+            raw_value = raw[index] if index < len(raw) else None
+            text = _text(raw_value)
+            if not text:
+                if field.required:
+                    result.add_error(row_number, field.label, f'{field.label}是必填项')
+                    valid = False
+                continue
+            try:
+                value = raw_value if isinstance(raw_value, (date, datetime)) else text
+                values[name] = field.parse(value) if field.parse else text
+            except ValueError as e:
+                result.add_error(row_number, field.label, str(e), text)
+                valid = False
+        # 每行字典的键保持一致，executemany 才能整批执行
+        for field in spec.fields:
+            if field.name not in values:
+                values[field.name] = field.default() if callable(field.default) else field.default
+        if valid:
+            records.append((row_number, values))
+
+    # 第二遍：整个文件一次性检查唯一性和关联
+    spec.validate(records, result)
+
+    error_rows = result.error_rows
+    valid_rows = [values for row, values in records if row not in error_rows]
+
+    if not dry_run and valid_rows:
+        try:
+            spec.insert(valid_rows, batch_size)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        result.inserted = len(valid_rows)
+
+    result.errors.sort(key=lambda error: error['row'])
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def import_file(entity, stream, filename, dry_run=False, batch_size=None):
+    headers, rows = read_table(stream, filename)
+    if not headers:
+        raise ImportFileError('文件为空')
+    return import_rows(entity, headers, rows, dry_run=dry_run, batch_size=batch_size)
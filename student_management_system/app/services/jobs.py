@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.job import BackgroundJob
+
+# 进程内的后台任务执行器：任务在线程池中运行，不占用处理请求的 Web 线程。
+# 任务状态和进度记录在 background_jobs 表中；进度通过独立连接写入，
+# 不会干扰任务本身正在读取的服务端游标。
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('JOB_WORKERS', 2),
+                                           thread_name_prefix='background-job')
+        return _executor
+
+
+def _update_job(job_id, **values):
+    with db.engine.begin() as connection:
+        connection.execute(
+            db.update(BackgroundJob.__table__).where(BackgroundJob.__table__.c.id == job_id).values(**values)
+        )
+
+
+class JobProgress:
+    """传给任务函数，用于汇报进度；写库频率按时间间隔节流"""
+
+    def __init__(self, job_id, min_interval=1.0):
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self._last_write = 0
+
+    def update(self, progress=None, total=None, message=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_write < self.min_interval:
+            return
+        values = {}
+        if progress is not None:
+            values['progress'] = progress
+        if total is not None:
+            values['total'] = total
+        if message is not None:
+            values['message'] = message
+        if values:
+            _update_job(self.job_id, **values)
+            self._last_write = now
+
+
+def _run_job(app, job_id, func, args, kwargs):
+    with app.app_context():
+        _update_job(job_id, status='running', started_at=datetime.utcnow())
+        try:
+            result = func(JobProgress(job_id), *args, **kwargs) or {}
+            _update_job(job_id, status='completed', finished_at=datetime.utcnow(), **result)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception('后台任务 %s 执行失败', job_id)
+            _update_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+        finally:
+            db.session.remove()
+
+
+def submit_job(kind, func, *args, created_by=None, **kwargs):
+    """创建任务记录并提交执行。
+
+    func(progress, *args, **kwargs) 在新的应用上下文中运行，可以返回要写回任务记录的字段
+    （如 result_path、result_name、message）。JOBS_RUN_INLINE 为真时在当前线程同步执行，便于测试。
+    """
+    job = BackgroundJob(kind=kind, created_by=created_by)
+    db.session.add(job)
+    db.session.commit()
+    job_id = job.id
+
+    app = current_app._get_current_object()
+    if app.config.get('JOBS_RUN_INLINE'):
+        _run_job(app, job_id, func, args, kwargs)
+        db.session.expire(job)
+    else:
+        _get_executor(app).submit(_run_job, app, job_id, func, args, kwargs)
+    return job
+
+
+def get_job(job_id, kind=None):
+    job = db.session.get(BackgroundJob, job_id)
+    if job is None or (kind and not job.kind.startswith(kind)):
+        return None
+    return job
+
+
+def find_active_job(kind, max_age=timedelta(hours=1)):
+    """同类任务正在排队或运行时返回该任务，用于避免重复提交；
+    超过 max_age 仍未结束的任务视为进程退出后遗留的记录，不再计入"""
+    return BackgroundJob.query.filter(
+        BackgroundJob.kind == kind,
+        BackgroundJob.status.in_(('pending', 'running')),
+        BackgroundJob.created_at > datetime.utcnow() - max_age
+    ).order_by(BackgroundJob.created_at.desc()).first()
+
+
+def purge_expired_jobs(max_age=None):
+    """删除超过保留期的已结束任务及其结果文件，返回删除的任务数"""
+    if max_age is None:
+        max_age = timedelta(hours=current_app.config.get('JOB_RETENTION_HOURS', 24))
+    cutoff = datetime.utcnow() - max_age
+    expired = BackgroundJob.query.filter(
+        BackgroundJob.status.in_(('completed', 'failed')),
+        BackgroundJob.finished_at < cutoff
+    ).all()
+    for job in expired:
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(expired)
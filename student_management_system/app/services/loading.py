@@ -0,0 +1,51 @@
+from app import db
+from app.models.enrollment import Enrollment
+
+# 各列表视图的关系加载策略，按视图端点名登记。
+# 查询里已经 JOIN 了关联表的用 contains_eager 直接复用 JOIN 的列，
+# 没有 JOIN 的用 joinedload（多对一、带 LIMIT 的小结果集）。
+# 模板里新增对关联对象的访问时，需要同时在这里补上对应的加载选项，
+# tests/test_query_counts.py 会检查列表页的查询条数不随每页行数增长。
+# backref 关系在映射器配置完成后才存在，所以这里登记的是返回加载选项的函数。
+
+
+def _joined_student_and_course():
+    return (db.joinedload(Enrollment.student), db.joinedload(Enrollment.course))
+
+
+def _eager_student_and_course():
+    return (db.contains_eager(Enrollment.student), db.contains_eager(Enrollment.course))
+
+
+def _eager_student():
+    return (db.contains_eager(Enrollment.student),)
+
+
+def _joined_course():
+    return (db.joinedload(Enrollment.course),)
+
+
+def _eager_course():
+    return (db.contains_eager(Enrollment.course),)
+
+
+def _eager_course_joined_term():
+    return (db.contains_eager(Enrollment.course), db.joinedload(Enrollment.term))
+
+
+LOADER_POLICIES = {
+    'admin.dashboard': _joined_student_and_course,
+    'admin.enrollments': _eager_student_and_course,
+    'admin.grades': _eager_student_and_course,
+    'admin.grade_grid': _eager_student,
+    'admin.api_enrollments': _joined_student_and_course,
+    'student.dashboard': _joined_course,
+    'student.enrollments': _eager_course,
+    'student.grades': _eager_course_joined_term,
+}
+
+
+def apply_loader_policy(query, endpoint):
+    """为查询加上指定视图登记的加载选项"""
+    policy = LOADER_POLICIES.get(endpoint)
+    return query.options(*policy()) if policy else query
@@ -0,0 +1,174 @@
+from datetime import date, datetime
+from decimal import Decimal
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+from app import db
+
+# 键集（游标）分页：按稳定的排序键定位下一页，而不是 OFFSET 扫描，
+# 因此翻到多深的页面代价都相同。排序键的最后一列必须唯一（通常是 id）。
+# 游标是签名过的不透明字符串，记录翻页方向、排序键名和边界行的键值。
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析、签名不符或与当前排序不匹配"""
+
+
+class KeysetPage:
+    """一页键集分页结果，属性命名与 Flask-SQLAlchemy 的 Pagination 保持一致"""
+    is_keyset = True
+
+    def __init__(self, items, per_page, total, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.total = total
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def to_dict(self, serialize):
+        return {
+            'items': [serialize(item) for item in self.items],
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'per_page': self.per_page,
+            'total': self.total,
+            'total_is_approximate': True
+        }
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='keyset-cursor')
+
+
+def _dump_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _load_value(column, value):
+    if value is None:
+        return None
+    column_type = column.expression.type
+    if isinstance(column_type, db.DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column_type, db.Date):
+        return date.fromisoformat(value)
+    if isinstance(column_type, db.Numeric):
+        return Decimal(value)
+    return value
+
+
+def _order_signature(order):
+    return [f"{column.key}:{'d' if descending else 'a'}" for column, descending in order]
+
+
+def encode_cursor(order, direction, values):
+    return _serializer().dumps({
+        'd': direction,
+        'o': _order_signature(order),
+        'k': [_dump_value(v) for v in values]
+    })
+
+
+def decode_cursor(order, cursor):
+    """解析游标，返回 (方向, 键值列表)"""
+    try:
+        data = _serializer().loads(cursor)
+        if data['d'] not in ('next', 'prev') or data['o'] != _order_signature(order):
+            raise InvalidCursor('游标与当前排序不匹配')
+        if len(data['k']) != len(order):
+            raise InvalidCursor('游标键值数量不正确')
+        return data['d'], [_load_value(column, v) for (column, _), v in zip(order, data['k'])]
+    except (BadSignature, KeyError, TypeError, ValueError) as e:
+        if isinstance(e, InvalidCursor):
+            raise
+        raise InvalidCursor('无效的分页游标') from e
+
+
+def _after(order, values, backwards):
+    """排在游标行之后的行：(a, b) 之后 = a 之后 OR (a 相等 AND b 之后)"""
+    clauses = []
+    for i, (column, descending) in enumerate(order):
+        before_desc = descending != backwards
+        condition = column < values[i] if before_desc else column > values[i]
+        equal = [order[j][0] == values[j] for j in range(i)]
+        clauses.append(db.and_(*equal, condition))
+    return db.or_(*clauses)
+
+
+def keyset_paginate(query, order, cursor=None, per_page=20, count=True):
+    """按 order（[(列, 是否降序), ...]）对查询做键集分页"""
+    direction, values = decode_cursor(order, cursor) if cursor else ('next', None)
+    backwards = direction == 'prev'
+
+    page_query = query.order_by(None)
+    if values is not None:
+        page_query = page_query.filter(_after(order, values, backwards))
+    page_query = page_query.order_by(*[
+        column.desc() if descending != backwards else column.asc()
+        for column, descending in order
+    ])
+
+    rows = page_query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = True if backwards else has_more
+    has_prev = has_more if backwards else values is not None
+
+    def keys(row):
+        return [getattr(row, column.key) for column, _ in order]
+
+    next_cursor = encode_cursor(order, 'next', keys(rows[-1])) if rows and has_next else None
+    prev_cursor = encode_cursor(order, 'prev', keys(rows[0])) if rows and has_prev else None
+
+    total = estimated_count(query) if count else None
+    return KeysetPage(rows, per_page, total, next_cursor, prev_cursor)
+
+
+def _table_estimate(table):
+    """读取数据库维护的表行数统计：PostgreSQL 为 pg_class.reltuples，MySQL 为 information_schema 的 TABLE_ROWS；
+    其他数据库（以及统计信息尚未生成时）用最大主键值近似，只需读一次索引末端"""
+    dialect = db.session.get_bind().dialect.name
+    estimate = None
+    if dialect == 'postgresql':
+        estimate = db.session.execute(db.text(
+            'SELECT reltuples FROM pg_class WHERE oid = CAST(:name AS regclass)'), {'name': table.name}).scalar()
+    elif dialect in ('mysql', 'mariadb'):
+        estimate = db.session.execute(db.text(
+            'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name'
+        ), {'name': table.name}).scalar()
+    if estimate is None or estimate < 0:
+        key = list(table.primary_key.columns)[0]
+        estimate = db.session.execute(db.select(db.func.max(key))).scalar()
+    return int(estimate or 0)
+
+
+def estimated_count(query):
+    """键集分页展示的近似总数。
+
+    没有筛选条件时读取表统计信息，代价与表大小无关；带筛选条件时准确总数需要 COUNT 扫描全部匹配行，
+    因此返回 None，页面不显示总数。
+    """
+    if query.whereclause is not None:
+        return None
+    entity = query.column_descriptions[0]['entity']
+    table = getattr(entity, '__table__', None)
+    if table is None:
+        return None
+    return _table_estimate(table)
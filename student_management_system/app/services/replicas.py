@@ -0,0 +1,176 @@
+import itertools
+import re
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session as BaseSession
+from sqlalchemy.pool import StaticPool
+from app.services.database import engine_options, configure_engine
+
+# 只读副本路由。
+# 报表、列表、GET API、导出等只读视图用 @read_replica 标记，这些请求中的 SELECT 发往延迟在
+# REPLICA_MAX_LAG_SECONDS 以内的副本；副本都不可用时退回主库。
+# 写入总是走主库；同一请求中一旦写过（flush，或实际执行了 INSERT/UPDATE/DELETE），之后的读取也走主库。
+# 不带语句的 session.connection() 和非 SELECT 的只读语句只是发往主库，不算写入。
+# 写过数据的请求还会在会话 cookie 中记下时间，该用户之后 REPLICA_STICKY_SECONDS 秒内的请求都读主库，
+# 保证“选课后跳转到课程列表”这类先写后读的流程能读到自己刚写入的数据。
+
+
+
+def create_replica_engines(config):
+    """按 REPLICA_DATABASE_URIS 创建副本引擎 {replica_1: engine, ...}，连接池参数与主库相同。
+
+    副本引擎不注册为 Flask-SQLAlchemy 的绑定（绑定会给所有模型元数据增加一份绑定键），只由 RoutingSession 使用。
+    """
+    engines = {}
+    for i, uri in enumerate(config.get('REPLICA_DATABASE_URIS') or [], 1):
+        options = engine_options(config, uri)
+        if make_url(uri).get_backend_name() == 'sqlite' and 'poolclass' not in options:
+            # 内存数据库（测试）所有连接共用一个
+            options['poolclass'] = StaticPool
+        engine = create_engine(uri, **options)
+        configure_engine(engine, config)
+        engines[f'replica_{i}'] = engine
+    return engines
+
+
+def _measure_lag(engine):
+    """副本延迟（秒），无法判断（复制已停止等）时返回 None"""
+    with engine.connect() as connection:
+        name = engine.dialect.name
+        if name in ('mysql', 'mariadb'):
+            for statement, column in (('SHOW REPLICA STATUS', 'Seconds_Behind_Source'),
+                                      ('SHOW SLAVE STATUS', 'Seconds_Behind_Master')):
+                try:
+                    row = connection.exec_driver_sql(statement).mappings().first()
+                except Exception:
+                    continue
+                # 没有复制状态说明连的不是副本（例如开发环境直接指向主库），视为没有延迟
+                return 0 if row is None else row[column]
+            return None
+        if name == 'postgresql':
+            return connection.execute(text(
+                'SELECT CASE WHEN pg_is_in_recovery() '
+                'THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END'
+            )).scalar()
+        return 0
+
+
+class ReplicaSet:
+    """一组只读副本及其延迟检查结果；每个副本的延迟最多每 REPLICA_CHECK_INTERVAL 秒查询一次"""
+
+    def __init__(self, app, engines):
+        self.engines = engines
+        self.max_lag = app.config.get('REPLICA_MAX_LAG_SECONDS', 5)
+        self.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', 5)
+        self.logger = app.logger
+        self._state = {}
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(list(engines))
+
+    def _healthy(self, name):
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(name)
+            if state and now - state['checked_at'] < self.check_interval:
+                return state['healthy']
+        try:
+            lag = _measure_lag(self.engines[name])
+            error = None
+        except Exception as e:
+            lag, error = None, str(e)
+            self.logger.warning('只读副本 %s 不可用：%s', name, e)
+        healthy = lag is not None and lag <= self.max_lag
+        with self._lock:
+            self._state[name] = {'checked_at': now, 'lag': lag, 'healthy': healthy, 'error': error}
+        return healthy
+
+    def choose(self):
+        """轮询返回一个可用副本的引擎，都不可用时返回 None"""
+        for _ in range(len(self.engines)):
+            name = next(self._cycle)
+            if self._healthy(name):
+                return self.engines[name]
+        return None
+
+    def status(self):
+        with self._lock:
+            return {name: {key: value for key, value in self._state.get(name, {'healthy': None}).items()
+                           if key != 'checked_at'}
+                    for name in self.engines}
+
+
+_WRITE_STATEMENT = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE|MERGE)\b', re.IGNORECASE)
+
+
+def _is_plain_select(clause):
+    return (clause is not None and getattr(clause, 'is_select', False)
+            and getattr(clause, '_for_update_arg', None) is None)
+
+
+def _mark_write():
+    if has_app_context():
+        g.db_wrote = True
+
+
+@event.listens_for(BaseSession, 'before_flush')
+def _mark_flush(session, flush_context, instances):
+    _mark_write()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _mark_write_statement(connection, cursor, statement, parameters, context, executemany):
+    # 包括绕过 ORM、直接在 session.connection() 上执行的批量写入
+    if _WRITE_STATEMENT.match(statement):
+        _mark_write()
+
+
+class RoutingSession(Session):
+    """只读视图中的 SELECT 发往副本，其余语句（以及写过之后的读取）发往主库"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            if _is_plain_select(clause) and g.get('read_replica') and not g.get('db_wrote'):
+                replicas = current_app.extensions.get('replicas')
+                engine = replicas.choose() if replicas else None
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_replica():
+    """当前应用上下文（请求或后台任务）之后的只读查询使用副本"""
+    if not current_app.extensions.get('replicas'):
+        return
+    if has_request_context() and session.get('primary_until', 0) > time.time():
+        return
+    g.read_replica = True
+
+
+def read_replica(f):
+    """视图装饰器：请求中的只读查询使用副本"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        use_replica()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def _stick_to_primary(response):
+    # 本次请求写过数据：之后一段时间内该用户的请求都读主库
+    if g.get('db_wrote'):
+        session['primary_until'] = time.time() + current_app.config.get('REPLICA_STICKY_SECONDS', 10)
+    return response
+
+
+def init_replicas(app):
+    """根据 REPLICA_DATABASE_URIS 创建副本集合；未配置副本时所有查询都走主库"""
+    engines = create_replica_engines(app.config)
+    if not engines:
+        return
+    app.extensions['replicas'] = ReplicaSet(app, engines)
+    app.after_request(_stick_to_primary)
@@ -0,0 +1,177 @@
+from flask import current_app, has_app_context
+from sqlalchemy.orm import Session
+from app import db
+from app.models.user import User
+from app.models.student import Student
+from app.models.course import Course
+from app.services.search.backends import LikeBackend, backend_for_dialect
+
+# 全文搜索子系统：SQLite 使用 FTS5，MySQL 使用 FULLTEXT(ngram)，其他数据库退回 LIKE。
+# 索引表由 db.create_all() 或迁移创建，写入 User/Student/Course 时在 flush 后同步更新；
+# 迁移 0006_statistics_jobs_search 只建空索引表，升级后以及绕过 ORM 批量修改后执行 `flask rebuild-search` 建立索引。
+
+
+class SearchEntity:
+    def __init__(self, model, index_table, document, like_columns):
+        self.model = model
+        self.index_table = index_table
+        self.document = document
+        self.like_columns = like_columns
+        self.fields = [column.key for column in like_columns]
+
+
+SEARCH_ENTITIES = {
+    'user': SearchEntity(
+        User, 'users_fts',
+        lambda u: (u.username, u.email, u.full_name),
+        [User.username, User.email, User.full_name]
+    ),
+    'student': SearchEntity(
+        Student, 'students_fts',
+        # 额外索引“姓+名”和“名+姓”，中文姓名可以整体搜索
+        lambda s: (s.student_id, s.first_name, s.last_name, s.email,
+                   f'{s.last_name or ""}{s.first_name or ""}', f'{s.first_name or ""}{s.last_name or ""}'),
+        [Student.student_id, Student.first_name, Student.last_name, Student.email]
+    ),
+    'course': SearchEntity(
+        Course, 'courses_fts',
+        lambda c: (c.course_code, c.course_name, c.instructor),
+        [Course.course_code, Course.course_name, Course.instructor]
+    ),
+}
+
+_ENTITY_BY_MODEL = {entity.model: entity for entity in SEARCH_ENTITIES.values()}
+
+
+def _setting():
+    return current_app.config.get('SEARCH_BACKEND', 'auto') if has_app_context() else 'auto'
+
+
+def get_backend(bind=None):
+    bind = bind or db.engine
+    return backend_for_dialect(bind.dialect.name, _setting())
+
+
+def _match(entity_name, text):
+    entity = SEARCH_ENTITIES[entity_name]
+    selectable = get_backend().match(entity, text)
+    if selectable is None:
+        selectable = LikeBackend().match(entity, text)
+    return entity, selectable.subquery()
+
+
+def apply_search(query, entity_name, text, ranked=True):
+    """把搜索条件加到实体自身的查询上；ranked 时按相关度排序"""
+    entity, matches = _match(entity_name, text)
+    query = query.join(matches, matches.c.id == entity.model.id)
+    if ranked:
+        query = query.order_by(matches.c.score.desc(), entity.model.id)
+    return query
+
+
+def search_filter(entity_name, text, column):
+    """column IN (匹配的实体 id)，用于选课等关联表的搜索"""
+    _, matches = _match(entity_name, text)
+    return column.in_(db.select(matches.c.id))
+
+
+def search(entity_name, text, limit=20):
+    """按相关度排序的搜索结果：[(对象, score), ...]"""
+    entity, matches = _match(entity_name, text)
+    rows = db.session.query(entity.model, matches.c.score).join(
+        matches, matches.c.id == entity.model.id
+    ).order_by(matches.c.score.desc(), entity.model.id).limit(limit).all()
+    return [(obj, float(score or 0)) for obj, score in rows]
+
+
+def create_search_schema(connection):
+    backend_for_dialect(connection.dialect.name, _setting()).create_schema(connection)
+
+
+def drop_search_schema(connection):
+    backend_for_dialect(connection.dialect.name, _setting()).drop_schema(connection)
+
+
+def is_search_table(name):
+    """索引表及 FTS5 的影子表（users_fts_data 等）不由模型描述，迁移比较时忽略"""
+    return any(name == entity.index_table or name.startswith(f'{entity.index_table}_')
+               for entity in SEARCH_ENTITIES.values())
+
+
+@db.event.listens_for(db.metadata, 'after_create')
+def _create_search_schema(target, connection, **kw):
+    create_search_schema(connection)
+
+
+def index_all(connection, batch_size=1000):
+    """在给定连接上重建全部搜索索引，返回每个实体索引的文档数，不提交事务"""
+    backend = get_backend(connection)
+    backend.create_schema(connection)
+    counts = {}
+    for name, entity in SEARCH_ENTITIES.items():
+        model = entity.model
+        backend.clear(connection, entity)
+        counts[name] = 0
+        last_id = 0
+        while True:
+            # 文档只用到 like_columns 中的列，按列读取，不加载 ORM 对象
+            rows = connection.execute(db.select(model.id, *entity.like_columns).where(
+                model.id > last_id).order_by(model.id).limit(batch_size)).all()
+            if not rows:
+                break
+            backend.index(connection, entity, [(row.id, entity.document(row)) for row in rows])
+            counts[name] += len(rows)
+            last_id = rows[-1].id
+    return counts
+
+
+def rebuild_search_index(batch_size=1000):
+    """重建全部搜索索引，返回每个实体索引的文档数"""
+    counts = index_all(db.session.connection(), batch_size)
+    db.session.commit()
+    return counts
+
+
+def index_ids(entity_name, ids, batch_size=1000):
+    """为绕过 ORM 刷新事件批量写入的记录建立索引（如批量导入），不提交事务"""
+    entity = SEARCH_ENTITIES[entity_name]
+    model = entity.model
+    connection = db.session.connection()
+    backend = get_backend(connection)
+    ids = sorted(ids)
+    for start in range(0, len(ids), batch_size):
+        objects = model.query.filter(model.id.in_(ids[start:start + batch_size])).all()
+        backend.index(connection, entity, [(obj.id, entity.document(obj)) for obj in objects])
+
+
+@db.event.listens_for(Session, 'after_flush')
+def _update_search_index_after_flush(session, flush_context):
+    changed = {}
+    removed = {}
+
+    for obj in session.new:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            changed.setdefault(entity, []).append(obj)
+
+    for obj in session.dirty:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            state = db.inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in entity.fields):
+                changed.setdefault(entity, []).append(obj)
+
+    for obj in session.deleted:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            removed.setdefault(entity, []).append(obj.id)
+
+    if not (changed or removed):
+        return
+
+    connection = session.connection()
+    backend = backend_for_dialect(connection.dialect.name, _setting())
+    for entity, objects in changed.items():
+        backend.index(connection, entity, [(obj.id, entity.document(obj)) for obj in objects])
+    for entity, ids in removed.items():
+        backend.remove(connection, entity, ids)
@@ -0,0 +1,170 @@
+import sqlite3
+from sqlalchemy.dialects.mysql import match as mysql_match
+from app import db
+from app.services.search.tokenizer import ngrams, index_tokens, text_runs, query_runs, short_runs
+
+# 搜索后端统一接口：
+#   create_schema(connection)              创建索引表
+#   drop_schema(connection)                删除索引表
+#   index(connection, entity, documents)   写入/覆盖文档，documents 为 [(id, (字段值, ...)), ...]
+#   remove(connection, entity, ids)        删除文档
+#   clear(connection, entity)              清空某个实体的全部文档
+#   match(entity, text)                    返回 (id, score) 的 SELECT，score 越大越相关；
+#                                          查询串无法走索引时返回 None，由调用方退回 LIKE；
+#                                          部分段过短时，这些段用 LIKE 与索引匹配同时作为条件
+
+
+class LikeBackend:
+    """不建索引，直接对模型字段做 LIKE 匹配；用于不支持全文索引的数据库和过短的查询串"""
+    name = 'like'
+
+    def create_schema(self, connection):
+        pass
+
+    def drop_schema(self, connection):
+        pass
+
+    def index(self, connection, entity, documents):
+        pass
+
+    def remove(self, connection, entity, ids):
+        pass
+
+    def clear(self, connection, entity):
+        pass
+
+    def match(self, entity, text):
+        model = entity.model
+        return db.select(model.id.label('id'), db.literal(0).label('score')).where(
+            db.or_(*[column.contains(text, autoescape=True) for column in entity.like_columns])
+        )
+
+
+class _IndexTableBackend:
+    """每个实体一张索引表，主键/rowid 与模型主键相同，维护时按主键增删"""
+
+    def _table(self, entity):
+        return db.table(entity.index_table, db.column(self.key_column), db.column('content'))
+
+    def _like_short_runs(self, statement, entity, text):
+        """过短的段无法走索引：连接到模型表，每段要求任一字段包含该段"""
+        runs = short_runs(text)
+        if not runs:
+            return statement
+        model = entity.model
+        key = self._table(entity).c[self.key_column]
+        return statement.join(model, model.id == key).where(*[
+            db.or_(*[column.contains(run, autoescape=True) for column in entity.like_columns]) for run in runs
+        ])
+
+    def _content(self, values):
+        raise NotImplementedError
+
+    def drop_schema(self, connection):
+        for entity in _entities():
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {entity.index_table}")
+
+    def index(self, connection, entity, documents):
+        if not documents:
+            return
+        self.remove(connection, entity, [doc_id for doc_id, _ in documents])
+        table = self._table(entity)
+        connection.execute(table.insert(), [
+            {self.key_column: doc_id, 'content': self._content(values)} for doc_id, values in documents
+        ])
+
+    def remove(self, connection, entity, ids):
+        if not ids:
+            return
+        table = self._table(entity)
+        connection.execute(table.delete().where(table.c[self.key_column].in_(list(ids))))
+
+    def clear(self, connection, entity):
+        connection.execute(self._table(entity).delete())
+
+
+class SQLiteFTSBackend(_IndexTableBackend):
+    """SQLite FTS5 虚拟表，内容是预先切好的 n-gram，按 bm25 排序"""
+    name = 'sqlite-fts5'
+    key_column = 'rowid'
+
+    def create_schema(self, connection):
+        for entity in _entities():
+            connection.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {entity.index_table} USING fts5(content)"
+            )
+
+    def _content(self, values):
+        return index_tokens(*values)
+
+    def match(self, entity, text):
+        runs = query_runs(text)
+        if not runs:
+            return None
+        # 每段一个短语："ab bc cd" 要求片段相邻，多段之间是 AND
+        expression = ' AND '.join('"{}"'.format(' '.join(ngrams(run))) for run in runs)
+        table = self._table(entity)
+        fts = db.literal_column(entity.index_table)
+        return self._like_short_runs(db.select(
+            table.c.rowid.label('id'),
+            (-db.func.bm25(fts)).label('score')
+        ).select_from(table).where(fts.op('MATCH')(expression)), entity, text)
+
+
+class MySQLFulltextBackend(_IndexTableBackend):
+    """MySQL InnoDB FULLTEXT 索引，使用内置 ngram 解析器（ngram_token_size 默认为 2，与 NGRAM_SIZE 一致）"""
+    name = 'mysql-fulltext'
+    key_column = 'id'
+
+    def create_schema(self, connection):
+        for entity in _entities():
+            connection.exec_driver_sql(
+                f"CREATE TABLE IF NOT EXISTS {entity.index_table} ("
+                "id INT NOT NULL PRIMARY KEY, content TEXT NOT NULL, "
+                "FULLTEXT KEY ft_content (content) WITH PARSER ngram"
+                ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+            )
+
+    def _content(self, values):
+        return ' '.join(run for value in values for run in text_runs(value))
+
+    def match(self, entity, text):
+        runs = query_runs(text)
+        if not runs:
+            return None
+        against = ' '.join(f'+"{run}"' for run in runs)
+        table = self._table(entity)
+        score = mysql_match(table.c.content, against=against).in_boolean_mode()
+        return self._like_short_runs(
+            db.select(table.c.id.label('id'), score.label('score')).where(score > 0), entity, text)
+
+
+_fts5_available = None
+
+
+def sqlite_fts5_available():
+    global _fts5_available
+    if _fts5_available is None:
+        try:
+            connection = sqlite3.connect(':memory:')
+            connection.execute('CREATE VIRTUAL TABLE t USING fts5(content)')
+            connection.close()
+            _fts5_available = True
+        except sqlite3.OperationalError:
+            _fts5_available = False
+    return _fts5_available
+
+
+def backend_for_dialect(dialect_name, setting='auto'):
+    if setting == 'like':
+        return LikeBackend()
+    if dialect_name == 'sqlite' and sqlite_fts5_available():
+        return SQLiteFTSBackend()
+    if dialect_name == 'mysql':
+        return MySQLFulltextBackend()
+    return LikeBackend()
+
+
+def _entities():
+    from app.services.search import SEARCH_ENTITIES
+    return SEARCH_ENTITIES.values()
@@ -0,0 +1,47 @@
+import re
+import unicodedata
+
+# n-gram 分词：中文姓名、课程名之间没有空格，按词切分无法做子串搜索，
+# 因此把每段连续的字母/数字/汉字切成长度为 NGRAM_SIZE 的片段建立索引。
+# 查询时同一段的片段按短语（相邻）匹配，效果等同于原来的 LIKE '%...%'。
+
+NGRAM_SIZE = 2
+
+# 段与段之间插入的分隔词，长度大于 NGRAM_SIZE，不会与任何片段相同，
+# 用来阻止短语匹配跨越两个字段或两段文字
+RUN_BREAK = 'brk'
+
+_RUN = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def text_runs(text):
+    """规范化文本并拆成连续的字母/数字/汉字段"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return _RUN.findall(text)
+
+
+def ngrams(run, size=NGRAM_SIZE):
+    if len(run) <= size:
+        return [run]
+    return [run[i:i + size] for i in range(len(run) - size + 1)]
+
+
+def index_tokens(*values):
+    """文档的索引词序列（以空格分隔）"""
+    tokens = []
+    for value in values:
+        for run in text_runs(value):
+            if tokens:
+                tokens.append(RUN_BREAK)
+            tokens.extend(ngrams(run))
+    return ' '.join(tokens)
+
+
+def query_runs(text):
+    """查询串中可以走索引的段"""
+    return [run for run in text_runs(text) if len(run) >= NGRAM_SIZE]
+
+
+def short_runs(text):
+    """查询串中短于 NGRAM_SIZE 的段：无法用片段匹配，由搜索后端改用 LIKE 与索引匹配同时作为条件"""
+    return [run for run in text_runs(text) if len(run) < NGRAM_SIZE]
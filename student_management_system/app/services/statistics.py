@@ -0,0 +1,164 @@
+from dataclasses import dataclass, asdict
+from app import db
+from app.models.user import User
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.models.term import Term
+from app.services.summary import get_enrollment_summary, get_student_statistics
+from app.services.loading import apply_loader_policy
+
+
+@dataclass
+class DashboardStats:
+    """管理员仪表盘统计结果"""
+    total_users: int = 0
+    active_users: int = 0
+    total_students: int = 0
+    total_courses: int = 0
+    total_enrollments: int = 0
+    completed_courses: int = 0
+    total_grades: int = 0
+    avg_grade: float = 0.0
+    highest_grade: float = 0.0
+    lowest_grade: float = 0.0
+
+    @property
+    def inactive_users(self):
+        return self.total_users - self.active_users
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _to_float(value):
+    return float(value) if value is not None else 0.0
+
+
+def get_dashboard_stats():
+    """计算仪表盘所需的全部统计数据，最多两条聚合语句"""
+    # 用户/学生/课程计数：条件聚合 + 标量子查询，一条语句完成
+    entity_row = db.session.query(
+        db.func.count(User.id),
+        db.func.coalesce(db.func.sum(db.case((User.is_active.is_(True), 1), else_=0)), 0),
+        db.select(db.func.count(Student.id)).scalar_subquery(),
+        db.select(db.func.count(Course.id)).scalar_subquery()
+    ).one()
+
+    # 选课与成绩统计：优先对增量维护的课程汇总表求和，汇总表为空时退回到一条聚合语句
+    summary = get_enrollment_summary()
+    if summary is not None:
+        enrollment_row = (
+            summary.total_count,
+            summary.completed_count,
+            summary.graded_count,
+            summary.avg_grade if summary.graded_count else None,
+            summary.grade_max,
+            summary.grade_min
+        )
+    else:
+        # COUNT(grade)/AVG/MAX/MIN 本身会忽略 NULL 成绩
+        enrollment_row = db.session.query(
+            db.func.count(Enrollment.id),
+            db.func.coalesce(db.func.sum(db.case((Enrollment.status == 'completed', 1), else_=0)), 0),
+            db.func.count(Enrollment.grade),
+            db.func.avg(Enrollment.grade),
+            db.func.max(Enrollment.grade),
+            db.func.min(Enrollment.grade)
+        ).one()
+
+    return DashboardStats(
+        total_users=entity_row[0],
+        active_users=int(entity_row[1]),
+        total_students=entity_row[2],
+        total_courses=entity_row[3],
+        total_enrollments=enrollment_row[0],
+        completed_courses=int(enrollment_row[1]),
+        total_grades=enrollment_row[2],
+        avg_grade=_to_float(enrollment_row[3]),
+        highest_grade=_to_float(enrollment_row[4]),
+        lowest_grade=_to_float(enrollment_row[5])
+    )
+
+
+def get_recent_enrollments(limit=5):
+    """最近的选课记录，学生和课程随主查询一起加载"""
+    query = Enrollment.query.order_by(Enrollment.created_at.desc()).limit(limit)
+    return apply_loader_policy(query, 'admin.dashboard').all()
+
+
+@dataclass
+class StudentStats:
+    """单个学生（或其筛选后的选课记录）的统计结果，学生仪表盘、个人资料、选课、成绩页面共用"""
+    total_count: int = 0
+    enrolled_count: int = 0
+    completed_count: int = 0
+    graded_count: int = 0
+    avg_grade: float = 0.0
+    highest_grade: float = 0.0
+    lowest_grade: float = 0.0
+    completed_avg_grade: float = 0.0
+    completed_credits: int = 0
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _is_completed():
+    return Enrollment.status == 'completed'
+
+
+def get_student_stats(student_id, query=None):
+    """学生的选课与成绩统计。
+
+    不传 query 时直接读取增量维护的学生汇总行；传入筛选后的选课查询（需已 join Course）时，
+    用一条聚合语句在数据库中计算，不把记录取回 Python。
+    """
+    if query is None:
+        summary = get_student_statistics(student_id)
+        return StudentStats(
+            total_count=summary.total_count,
+            enrolled_count=summary.enrolled_count,
+            completed_count=summary.completed_count,
+            graded_count=summary.graded_count,
+            avg_grade=summary.avg_grade,
+            highest_grade=_to_float(summary.grade_max),
+            lowest_grade=_to_float(summary.grade_min),
+            completed_avg_grade=summary.completed_avg_grade,
+            completed_credits=summary.completed_credits
+        )
+
+    # COUNT/AVG/MAX/MIN 忽略 NULL：CASE 不匹配时为 NULL，只统计已完成课程的成绩
+    completed_grade = db.case((_is_completed(), Enrollment.grade))
+    row = query.order_by(None).with_entities(
+        db.func.count(Enrollment.id),
+        db.func.coalesce(db.func.sum(db.case((Enrollment.status == 'enrolled', 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(db.case((_is_completed(), 1), else_=0)), 0),
+        db.func.count(Enrollment.grade),
+        db.func.avg(Enrollment.grade),
+        db.func.max(Enrollment.grade),
+        db.func.min(Enrollment.grade),
+        db.func.avg(completed_grade),
+        db.func.coalesce(db.func.sum(db.case((_is_completed(), Course.credits), else_=0)), 0)
+    ).one()
+    return StudentStats(
+        total_count=row[0],
+        enrolled_count=int(row[1]),
+        completed_count=int(row[2]),
+        graded_count=row[3],
+        avg_grade=_to_float(row[4]),
+        highest_grade=_to_float(row[5]),
+        lowest_grade=_to_float(row[6]),
+        completed_avg_grade=_to_float(row[7]),
+        completed_credits=int(row[8])
+    )
+
+
+def get_student_semesters(student_id, graded_only=True):
+    """学生选课涉及的学期名称（'2024秋季'、'2024春季' ...），新学期在前；按 (student_id, term_id) 索引分组"""
+    statement = db.select(Term.name).join(Enrollment, Enrollment.term_id == Term.id).where(
+        Enrollment.student_id == student_id
+    ).group_by(Term.id, Term.name, Term.start_date).order_by(Term.start_date.desc())
+    if graded_only:
+        statement = statement.where(Enrollment.grade.isnot(None))
+    return list(db.session.execute(statement).scalars())
@@ -0,0 +1,235 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response, stream_with_context
+from app import db
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.models.statistics import CourseStatistics
+from app.services.search import search_filter
+
+# 批量 API 的流式输出：用 Core SELECT 只取需要的列，服务端游标按批读取，
+# 边读边编码输出，内存占用与表大小无关，也不会触发任何 ORM 懒加载。
+# 字段名中带点的（如 student.student_id）输出为嵌套对象。
+
+GENDER_LABELS = {'Male': '男', 'Female': '女', 'Other': '其他'}
+
+
+def _seats_available():
+    """与 Course.seats_available 相同：不限人数时为 NULL，否则为不小于 0 的剩余名额"""
+    remaining = Course.max_students - db.func.coalesce(Course.seats_taken, 0)
+    return db.case((Course.max_students.is_(None), None), (remaining < 0, 0), else_=remaining)
+
+
+# 默认字段及顺序与模型的 to_dict() 相同，分页 API 和流式 API 返回的行结构一致
+def _student_fields(prefix=''):
+    return {
+        f'{prefix}id': Student.id,
+        f'{prefix}student_id': Student.student_id,
+        f'{prefix}first_name': Student.first_name,
+        f'{prefix}last_name': Student.last_name,
+        f'{prefix}full_name': Student.first_name + ' ' + Student.last_name,
+        f'{prefix}birth_date': Student.birth_date,
+        f'{prefix}gender': Student.gender,
+        f'{prefix}gender_raw': Student.gender,
+        f'{prefix}email': Student.email,
+        f'{prefix}phone': Student.phone,
+        f'{prefix}address': Student.address,
+        f'{prefix}major': Student.major,
+        f'{prefix}enrollment_year': Student.enrollment_year,
+        f'{prefix}user_id': Student.user_id,
+        f'{prefix}created_at': Student.created_at,
+        f'{prefix}updated_at': Student.updated_at,
+    }
+
+
+def _course_fields(prefix=''):
+    return {
+        f'{prefix}id': Course.id,
+        f'{prefix}course_code': Course.course_code,
+        f'{prefix}course_name': Course.course_name,
+        f'{prefix}description': Course.description,
+        f'{prefix}credits': Course.credits,
+        f'{prefix}department': Course.department,
+        f'{prefix}instructor': Course.instructor,
+        f'{prefix}max_students': Course.max_students,
+        f'{prefix}waitlist_size': Course.waitlist_size,
+        f'{prefix}seats_taken': Course.seats_taken,
+        f'{prefix}seats_available': _seats_available(),
+        f'{prefix}waitlist_count': Course.waitlist_count,
+        f'{prefix}created_at': Course.created_at,
+        f'{prefix}updated_at': Course.updated_at,
+        # 选课人数取自课程汇总表，不再逐门课程 COUNT
+        f'{prefix}enrollment_count': db.func.coalesce(CourseStatistics.total_count, 0),
+    }
+
+
+STREAM_FIELDS = {
+    'students': _student_fields(),
+    'courses': _course_fields(),
+    'enrollments': {
+        'id': Enrollment.id,
+        'student_id': Enrollment.student_id,
+        'course_id': Enrollment.course_id,
+        'enrollment_date': Enrollment.enrollment_date,
+        'term_id': Enrollment.term_id,
+        'status': Enrollment.status,
+        'grade': Enrollment.grade,
+        'created_at': Enrollment.created_at,
+        'updated_at': Enrollment.updated_at,
+        **_student_fields('student.'),
+        **_course_fields('course.'),
+    },
+}
+
+
+def _gender_label(value):
+    return GENDER_LABELS.get(value, value) if value else None
+
+
+# 字段值的额外转换
+FIELD_FORMATTERS = {
+    ('students', 'gender'): _gender_label,
+    ('enrollments', 'student.gender'): _gender_label,
+}
+
+
+class FieldError(ValueError):
+    """请求了不存在的字段"""
+
+
+def resolve_fields(entity, requested=None):
+    """解析 ?fields= 参数；'student' 这样的前缀会展开为 student.* 全部字段"""
+    available = STREAM_FIELDS[entity]
+    if not requested:
+        return list(available)
+
+    fields = []
+    for name in (part.strip() for part in requested.split(',')):
+        if not name:
+            continue
+        if name in available:
+            expanded = [name]
+        else:
+            expanded = [field for field in available if field.startswith(name + '.')]
+        if not expanded:
+            raise FieldError(f'未知字段: {name}')
+        fields.extend(field for field in expanded if field not in fields)
+    return fields
+
+
+def build_stream_query(entity, fields, filters=None):
+    """按字段投影和筛选条件构造 SELECT"""
+    filters = filters or {}
+    columns = [STREAM_FIELDS[entity][field].label(field) for field in fields]
+    statement = db.select(*columns)
+
+    if entity == 'students':
+        statement = statement.select_from(Student).order_by(Student.id)
+        if filters.get('major'):
+            statement = statement.where(Student.major == filters['major'])
+        if filters.get('enrollment_year'):
+            statement = statement.where(Student.enrollment_year == filters['enrollment_year'])
+        if filters.get('search'):
+            statement = statement.where(search_filter('student', filters['search'], Student.id))
+
+    elif entity == 'courses':
+        statement = statement.select_from(Course).outerjoin(
+            CourseStatistics, CourseStatistics.course_id == Course.id
+        ).order_by(Course.id)
+        if filters.get('department'):
+            statement = statement.where(Course.department == filters['department'])
+        if filters.get('credits'):
+            statement = statement.where(Course.credits == filters['credits'])
+        if filters.get('search'):
+            statement = statement.where(search_filter('course', filters['search'], Course.id))
+
+    elif entity == 'enrollments':
+        statement = statement.select_from(Enrollment).join(
+            Student, Student.id == Enrollment.student_id
+        ).join(Course, Course.id == Enrollment.course_id).outerjoin(
+            CourseStatistics, CourseStatistics.course_id == Course.id
+        )
+        if filters.get('sort') == 'updated':
+            statement = statement.order_by(Enrollment.updated_at.desc(), Enrollment.id.desc())
+        else:
+            statement = statement.order_by(Enrollment.id)
+        if filters.get('status'):
+            statement = statement.where(Enrollment.status == filters['status'])
+        if filters.get('student_id'):
+            statement = statement.where(Enrollment.student_id == filters['student_id'])
+        if filters.get('course_id'):
+            statement = statement.where(Enrollment.course_id == filters['course_id'])
+        if filters.get('has_grade') in ('1', 'true'):
+            statement = statement.where(Enrollment.grade.isnot(None))
+        if filters.get('search'):
+            statement = statement.where(db.or_(
+                search_filter('student', filters['search'], Enrollment.student_id),
+                search_filter('course', filters['search'], Enrollment.course_id)
+            ))
+
+    return statement
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _row_to_dict(entity, fields, row):
+    data = {}
+    for field, value in zip(fields, row):
+        formatter = FIELD_FORMATTERS.get((entity, field))
+        value = _json_value(formatter(value) if formatter else value)
+        if '.' in field:
+            group, name = field.split('.', 1)
+            data.setdefault(group, {})[name] = value
+        else:
+            data[field] = value
+    return data
+
+
+def stream_rows(entity, fields, statement, batch_size=1000):
+    """服务端游标逐批读取，逐行产出字典"""
+    result = db.session.execute(statement, execution_options={'yield_per': batch_size})
+    for partition in result.partitions():
+        for row in partition:
+            yield _row_to_dict(entity, fields, row)
+
+
+def _encode(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield _encode(row) + '\n'
+
+
+def json_array_chunks(rows, rows_per_chunk=200):
+    """把行拼成 JSON 数组分块输出，每块包含若干行，减少写出次数"""
+    yield '['
+    buffer = []
+    first = True
+    for row in rows:
+        buffer.append(_encode(row))
+        if len(buffer) >= rows_per_chunk:
+            yield ('' if first else ',') + ','.join(buffer)
+            first = False
+            buffer = []
+    if buffer:
+        yield ('' if first else ',') + ','.join(buffer)
+    yield ']'
+
+
+def stream_response(entity, fields, statement, ndjson=False, batch_size=1000):
+    rows = stream_rows(entity, fields, statement, batch_size=batch_size)
+    if ndjson:
+        body, mimetype = ndjson_lines(rows), 'application/x-ndjson'
+    else:
+        body, mimetype = json_array_chunks(rows), 'application/json'
+    return Response(stream_with_context(body), mimetype=mimetype)
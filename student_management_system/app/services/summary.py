@@ -0,0 +1,242 @@
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app import db
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment, SEAT_STATUSES
+from app.models.statistics import StudentStatistics, CourseStatistics
+
+# 汇总表的维护方式：每次 flush 后找出受影响的学生/课程，
+# 只针对这些键用一条 INSERT ... SELECT ... GROUP BY 重新计算，
+# 全局汇总不落表：读取时对课程汇总表求和，不需要扫描 enrollments 全表，
+# 写入时也不会让所有选课事务争抢同一行。
+# 绕过 ORM 的批量 UPDATE/DELETE 不会触发 flush 事件，调用方需要自行调用 refresh_* 函数。
+
+STUDENT_COLUMNS = ['student_id', 'total_count', 'enrolled_count', 'completed_count',
+                   'graded_count', 'grade_sum', 'grade_min', 'grade_max',
+                   'completed_graded_count', 'completed_grade_sum', 'completed_credits', 'updated_at']
+
+COURSE_COLUMNS = ['course_id', 'total_count', 'enrolled_count', 'completed_count',
+                  'graded_count', 'grade_sum', 'grade_min', 'grade_max', 'updated_at']
+
+
+
+@dataclass
+class EnrollmentSummary:
+    """全局选课汇总，由 course_statistics 求和得到"""
+    total_count: int = 0
+    enrolled_count: int = 0
+    completed_count: int = 0
+    graded_count: int = 0
+    grade_sum: float = 0
+    grade_min: float = None
+    grade_max: float = None
+
+    @property
+    def avg_grade(self):
+        return float(self.grade_sum) / self.graded_count if self.graded_count else 0
+
+
+def _count_if(condition):
+    return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
+
+
+def _sum_if(condition, value):
+    return db.func.coalesce(db.func.sum(db.case((condition, value), else_=None)), 0)
+
+
+def _now():
+    return db.literal(datetime.utcnow(), db.DateTime)
+
+
+def _student_aggregate():
+    completed = Enrollment.status == 'completed'
+    completed_graded = db.and_(completed, Enrollment.grade.isnot(None))
+    return db.select(
+        Enrollment.student_id,
+        db.func.count(Enrollment.id),
+        _count_if(Enrollment.status == 'enrolled'),
+        _count_if(completed),
+        db.func.count(Enrollment.grade),
+        db.func.coalesce(db.func.sum(Enrollment.grade), 0),
+        db.func.min(Enrollment.grade),
+        db.func.max(Enrollment.grade),
+        _count_if(completed_graded),
+        _sum_if(completed_graded, Enrollment.grade),
+        _sum_if(completed, Course.credits),
+        _now()
+    ).join(Course, Course.id == Enrollment.course_id).group_by(Enrollment.student_id)
+
+
+def _course_aggregate():
+    return db.select(
+        Enrollment.course_id,
+        db.func.count(Enrollment.id),
+        _count_if(Enrollment.status == 'enrolled'),
+        _count_if(Enrollment.status == 'completed'),
+        db.func.count(Enrollment.grade),
+        db.func.coalesce(db.func.sum(Enrollment.grade), 0),
+        db.func.min(Enrollment.grade),
+        db.func.max(Enrollment.grade),
+        _now()
+    ).group_by(Enrollment.course_id)
+
+
+def _refresh(connection, table, key, columns, aggregate, group_column, ids):
+    delete = table.delete()
+    if ids is not None:
+        delete = delete.where(table.c[key].in_(ids))
+        aggregate = aggregate.where(group_column.in_(ids))
+    connection.execute(delete)
+    connection.execute(table.insert().from_select(columns, aggregate))
+
+
+def refresh_student_statistics(connection, student_ids=None):
+    """重新计算指定学生的汇总行；student_ids 为 None 时重建全部，也可以传入子查询"""
+    _refresh(connection, StudentStatistics.__table__, 'student_id', STUDENT_COLUMNS,
+             _student_aggregate(), Enrollment.student_id, student_ids)
+
+
+def refresh_course_statistics(connection, course_ids=None):
+    """重新计算指定课程的汇总行；course_ids 为 None 时重建全部"""
+    _refresh(connection, CourseStatistics.__table__, 'course_id', COURSE_COLUMNS,
+             _course_aggregate(), Enrollment.course_id, course_ids)
+
+
+def refresh_course_seats(connection, course_ids=None):
+    """按 enrollments 重算课程的已占名额和候补人数（courses.seats_taken / waitlist_count）"""
+    courses = Course.__table__
+
+    def _count(condition):
+        return db.select(db.func.count(Enrollment.id)).where(
+            Enrollment.course_id == courses.c.id, condition).scalar_subquery()
+
+    # 显式保留 updated_at，名额变化不算课程信息修改
+    update = courses.update().values(
+        seats_taken=_count(Enrollment.status.in_(SEAT_STATUSES)),
+        waitlist_count=_count(Enrollment.status == 'waitlisted'),
+        updated_at=courses.c.updated_at
+    )
+    if course_ids is not None:
+        update = update.where(courses.c.id.in_(course_ids))
+    connection.execute(update)
+
+
+def refresh_statistics(connection, student_ids=(), course_ids=(), recount_seats=True):
+    """刷新受影响学生、课程的汇总行；调用方已经用条件 UPDATE 维护名额计数时传 recount_seats=False"""
+    if student_ids:
+        refresh_student_statistics(connection, list(student_ids))
+    if course_ids:
+        refresh_course_statistics(connection, list(course_ids))
+        if recount_seats:
+            refresh_course_seats(connection, list(course_ids))
+
+
+def rebuild_statistics():
+    """从 enrollments 全量重建所有汇总表"""
+    connection = db.session.connection()
+    refresh_student_statistics(connection)
+    refresh_course_statistics(connection)
+    refresh_course_seats(connection)
+    db.session.commit()
+    return {
+        'students': StudentStatistics.query.count(),
+        'courses': CourseStatistics.query.count()
+    }
+
+
+def _changed(state, *attributes):
+    return any(state.attrs[attr].history.has_changes() for attr in attributes)
+
+
+def _history_ids(state, column, relationship):
+    """某个外键当前值与 flush 前旧值的集合"""
+    ids = {getattr(state.obj(), column)}
+    ids.update(state.attrs[column].history.deleted)
+    ids.update(obj.id for obj in state.attrs[relationship].history.deleted if obj is not None)
+    return {value for value in ids if value is not None}
+
+
+@db.event.listens_for(Session, 'after_flush')
+def _update_statistics_after_flush(session, flush_context):
+    student_ids = set()
+    course_ids = set()
+    credit_course_ids = set()
+
+    for obj in session.new:
+        if isinstance(obj, Enrollment):
+            student_ids.add(obj.student_id)
+            course_ids.add(obj.course_id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Enrollment):
+            student_ids.add(obj.student_id)
+            course_ids.add(obj.course_id)
+        elif isinstance(obj, Student):
+            student_ids.add(obj.id)
+        elif isinstance(obj, Course):
+            course_ids.add(obj.id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Enrollment):
+            state = db.inspect(obj)
+            if _changed(state, 'student_id', 'course_id', 'student', 'course', 'status', 'grade'):
+                student_ids.update(_history_ids(state, 'student_id', 'student'))
+                course_ids.update(_history_ids(state, 'course_id', 'course'))
+        elif isinstance(obj, Course) and _changed(db.inspect(obj), 'credits'):
+            credit_course_ids.add(obj.id)
+
+    student_ids.discard(None)
+    course_ids.discard(None)
+    if not (student_ids or course_ids or credit_course_ids):
+        return
+
+    connection = session.connection()
+    if credit_course_ids:
+        # 学分变化会影响选过这些课程的学生的已修学分
+        refresh_student_statistics(connection, db.select(Enrollment.student_id).where(
+            Enrollment.course_id.in_(credit_course_ids)).distinct())
+    refresh_statistics(connection, student_ids, course_ids)
+
+
+def _empty_student_statistics(student_id):
+    return StudentStatistics(
+        student_id=student_id, total_count=0, enrolled_count=0, completed_count=0,
+        graded_count=0, grade_sum=0, grade_min=None, grade_max=None,
+        completed_graded_count=0, completed_grade_sum=0, completed_credits=0
+    )
+
+
+def get_student_statistics(student_id):
+    """读取单个学生的汇总行，没有选课记录时返回全零结果"""
+    return db.session.get(StudentStatistics, student_id) or _empty_student_statistics(student_id)
+
+
+def get_course_statistics(course_id):
+    return db.session.get(CourseStatistics, course_id) or CourseStatistics(
+        course_id=course_id, total_count=0, enrolled_count=0, completed_count=0,
+        graded_count=0, grade_sum=0, grade_min=None, grade_max=None
+    )
+
+
+def course_enrollment_counts():
+    """各课程的选课人数 {course_id: total_count}，一条查询读出课程汇总表"""
+    return dict(db.session.execute(db.select(CourseStatistics.course_id, CourseStatistics.total_count)).all())
+
+
+def get_enrollment_summary():
+    """对课程汇总表求和得到全局汇总，代价与课程数成正比；汇总表为空时返回 None"""
+    row = db.session.query(
+        db.func.count(CourseStatistics.course_id),
+        db.func.coalesce(db.func.sum(CourseStatistics.total_count), 0),
+        db.func.coalesce(db.func.sum(CourseStatistics.enrolled_count), 0),
+        db.func.coalesce(db.func.sum(CourseStatistics.completed_count), 0),
+        db.func.coalesce(db.func.sum(CourseStatistics.graded_count), 0),
+        db.func.coalesce(db.func.sum(CourseStatistics.grade_sum), 0),
+        db.func.min(CourseStatistics.grade_min),
+        db.func.max(CourseStatistics.grade_max)
+    ).one()
+    if not row[0]:
+        return None
+    return EnrollmentSummary(*row[1:])
@@ -0,0 +1,184 @@
+import time
+from app import db
+from app.models.user import User
+from app.models.student import Student
+from app.services.search import index_ids
+from app.services.identity import invalidate_students
+
+# 用户与学生档案的批量同步：两条查询分别读出学生用户和学生记录，
+# 在内存中用字典先按已有的 user_id 关联、再按邮箱、最后按姓名配对，计算出需要修改的字段，
+# 只对有变化的学生执行按主键的批量 UPDATE；新配对的学生同时写入 user_id。
+
+UPDATE_BATCH_SIZE = 1000
+SYNC_FIELDS = ('user_id', 'email', 'phone', 'first_name', 'last_name')
+
+
+def split_full_name(full_name):
+    """用户姓名拆分为 (名, 姓)，与原有规则一致：按第一个空格拆分"""
+    full_name = (full_name or '').strip()
+    if ' ' in full_name:
+        first_name, last_name = full_name.split(' ', 1)
+        return first_name, last_name
+    return full_name, ''
+
+
+class SyncResult:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.users = 0
+        self.matched = 0
+        self.changes = []
+        self.unmatched = []
+        self.conflicts = []
+        self.timings = {}
+
+    @property
+    def updated(self):
+        return 0 if self.dry_run else len(self.changes)
+
+    def to_dict(self, max_items=None):
+        return {
+            'dry_run': self.dry_run,
+            'users': self.users,
+            'matched': self.matched,
+            'changed': len(self.changes),
+            'updated': self.updated,
+            'unmatched_count': len(self.unmatched),
+            'changes': self.changes[:max_items] if max_items else self.changes,
+            'unmatched': self.unmatched[:max_items] if max_items else self.unmatched,
+            'conflicts': self.conflicts[:max_items] if max_items else self.conflicts,
+            'timings': {phase: round(seconds, 3) for phase, seconds in self.timings.items()}
+        }
+
+
+class _PhaseTimer:
+    def __init__(self, timings):
+        self.timings = timings
+        self.started = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.timings[phase] = now - self.started
+        self.started = now
+
+
+def match_students(users, students):
+    """返回 [(user, student, 匹配方式)] 和未匹配的用户列表。
+
+    依次按已关联的 user_id、邮箱、姓名（先全名，后名字）配对。已关联账户的学生和
+    已配对的学生不会再分配给其他用户；邮箱属于其他学生的用户不参与姓名配对，
+    这样写入新邮箱时不会违反学生邮箱的唯一约束。
+    """
+    by_user_id = {student.user_id: student for student in students if student.user_id is not None}
+    by_email = {student.email: student for student in students}
+    by_full_name = {}
+    by_first_name = {}
+    for student in students:
+        by_full_name.setdefault((student.first_name, student.last_name), []).append(student)
+        by_first_name.setdefault(student.first_name, []).append(student)
+
+    pairs, pending = [], []
+    claimed = {student.id for student in by_user_id.values()}
+    for user in users:
+        student = by_user_id.get(user.id)
+        if student is not None:
+            pairs.append((user, student, 'user_id'))
+        else:
+            pending.append(user)
+
+    unmatched, by_name = [], []
+    for user in pending:
+        student = by_email.get(user.email)
+        if student is None:
+            by_name.append(user)
+        elif student.id in claimed:
+            unmatched.append(user)
+        else:
+            pairs.append((user, student, 'email'))
+            claimed.add(student.id)
+
+    for user in by_name:
+        first_name, last_name = split_full_name(user.full_name)
+        candidates = (by_full_name.get((first_name, last_name), []) + by_first_name.get(first_name, [])
+                      if first_name else [])
+        student = next((c for c in candidates if c.id not in claimed), None)
+        if student is None:
+            unmatched.append(user)
+            continue
+        pairs.append((user, student, 'name'))
+        claimed.add(student.id)
+    return pairs, unmatched
+
+
+def diff_student(user, student):
+    """用户信息同步到学生记录时需要修改的字段：{字段: (原值, 新值)}"""
+    target = {'user_id': user.id, 'email': user.email, 'phone': user.phone or ''}
+    if user.full_name:
+        target['first_name'], target['last_name'] = split_full_name(user.full_name)
+    # 空值与空字符串视为相同，避免每次同步都把 NULL 电话“改”成空字符串
+    return {
+        field: (getattr(student, field), value)
+        for field, value in target.items()
+        if (getattr(student, field) or '') != value
+    }
+
+
+def sync_student_data(dry_run=False):
+    """把学生用户的邮箱、电话、姓名同步到对应的学生记录，返回 SyncResult。
+
+    dry_run 为真时只计算差异，不写入数据库。
+    """
+    result = SyncResult(dry_run=dry_run)
+    timer = _PhaseTimer(result.timings)
+
+    users = db.session.execute(db.select(
+        User.id, User.username, User.email, User.full_name, User.phone
+    ).where(User.role == 'student').order_by(User.id)).all()
+    students = db.session.execute(db.select(
+        Student.id, Student.student_id, *[getattr(Student, field) for field in SYNC_FIELDS]
+    ).order_by(Student.id)).all()
+    result.users = len(users)
+    timer.lap('load')
+
+    pairs, unmatched = match_students(users, students)
+    result.matched = len(pairs)
+    result.unmatched = [{'user_id': user.id, 'username': user.username, 'email': user.email}
+                        for user in unmatched]
+    timer.lap('match')
+
+    email_owners = {student.email: student.id for student in students}
+    updates, stale_user_ids = [], set()
+    for user, student, matched_by in pairs:
+        changes = diff_student(user, student)
+        if email_owners.get(user.email, student.id) != student.id:
+            # 已关联的学生改用的邮箱属于另一个学生：不同步邮箱，留给管理员处理
+            changes.pop('email', None)
+            result.conflicts.append({'user_id': user.id, 'username': user.username, 'email': user.email,
+                                     'student_number': student.student_id})
+        if not changes:
+            continue
+        result.changes.append({
+            'student_id': student.id,
+            'student_number': student.student_id,
+            'user_id': user.id,
+            'username': user.username,
+            'matched_by': matched_by,
+            'changes': {field: {'old': old, 'new': new} for field, (old, new) in changes.items()}
+        })
+        # 每行都带上全部同步字段，使所有参数结构一致，可以合并成一次 executemany
+        row = {'id': student.id}
+        row.update({field: getattr(student, field) for field in SYNC_FIELDS})
+        row.update({field: new for field, (_, new) in changes.items()})
+        updates.append(row)
+        stale_user_ids.update(user_id for user_id in (student.user_id, user.id) if user_id is not None)
+    timer.lap('diff')
+
+    if not dry_run and updates:
+        for start in range(0, len(updates), UPDATE_BATCH_SIZE):
+            db.session.execute(db.update(Student), updates[start:start + UPDATE_BATCH_SIZE])
+        # 批量 UPDATE 不触发 ORM 刷新事件，需要手动更新搜索索引
+        index_ids('student', [row['id'] for row in updates])
+        db.session.commit()
+        invalidate_students(*stale_user_ids)
+    timer.lap('apply')
+    return result
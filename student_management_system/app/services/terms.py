@@ -0,0 +1,76 @@
+from datetime import date
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import db
+from app.models.enrollment import Enrollment
+from app.models.term import Term
+
+# 选课记录的学期（enrollments.term_id）。
+# ORM 写入在 flush 前按 enrollment_date 填写；选课服务、批量导入等直接执行 INSERT/UPDATE 的代码
+# 调用 term_id_for / term_ids_for 取得学期 ID 后写入同一条语句。学期不存在时自动创建。
+# 绕过以上途径的批量 SQL 修改后，用 `flask rebuild-terms` 重新按选课日期回填。
+
+
+def _lookup(connection, names):
+    return dict(connection.execute(db.select(Term.name, Term.id).where(Term.name.in_(names))).all())
+
+
+def term_ids_for(days, connection=None):
+    """一组日期所在学期的 ID {日期: term_id}，缺少的学期先创建"""
+    connection = connection or db.session.connection()
+    values = {day: Term.values_for(day) for day in set(days)}
+    names = {value['name'] for value in values.values()}
+    ids = _lookup(connection, names)
+    missing = {value['name']: value for value in values.values() if value['name'] not in ids}
+    if missing:
+        for value in missing.values():
+            try:
+                with connection.begin_nested():
+                    connection.execute(Term.__table__.insert(), value)
+            except IntegrityError:
+                # 并发请求已经创建了这个学期
+                pass
+        ids = _lookup(connection, names)
+    return {day: ids[value['name']] for day, value in values.items()}
+
+
+def term_id_for(day, connection=None):
+    return term_ids_for([day], connection)[day]
+
+
+def find_term(name):
+    """按名称（'2024春季'）查找学期，不存在时返回 None"""
+    return Term.query.filter_by(name=name).first()
+
+
+def rebuild_terms(connection=None):
+    """按选课日期重新填写所有选课记录的学期，返回更新的行数"""
+    connection = connection or db.session.connection()
+    days = [row[0] for row in connection.execute(db.select(Enrollment.enrollment_date).distinct())]
+    ids = term_ids_for(days, connection)
+    table = Enrollment.__table__
+    updated = 0
+    for day, term_id in ids.items():
+        updated += connection.execute(table.update().where(
+            table.c.enrollment_date == day,
+            db.or_(table.c.term_id.is_(None), table.c.term_id != term_id)
+        ).values(term_id=term_id, updated_at=table.c.updated_at)).rowcount
+    return updated
+
+
+@db.event.listens_for(Session, 'before_flush')
+def _assign_terms(session, flush_context, instances):
+    pending = []
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Enrollment):
+            continue
+        if obj in session.new:
+            if obj.enrollment_date is None:
+                obj.enrollment_date = date.today()
+            pending.append(obj)
+        elif db.inspect(obj).attrs.enrollment_date.history.has_changes():
+            pending.append(obj)
+    if pending:
+        ids = term_ids_for([obj.enrollment_date for obj in pending], session.connection())
+        for obj in pending:
+            obj.term_id = ids[obj.enrollment_date]
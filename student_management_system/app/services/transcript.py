@@ -0,0 +1,357 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from flask import current_app, has_app_context
+from sqlalchemy.orm import Session
+from app import db
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.models.term import Term
+from app.services.filters import semester_filter_clause
+
+# 成绩单与学分加权 GPA。
+# 只有已完成且有成绩的选课计入；成绩按 GPA_SCALES 中的刻度换算为绩点（CASE 表达式，在数据库中计算），
+# GPA = Σ(学分 × 绩点) / Σ学分。单个学生的成绩单用一条查询取出全部计入的课程，按学期汇总并计算累计 GPA。
+# 结果按 (学生, 学期) 缓存在进程内：成绩、状态、学期变化时只让受影响的学期失效，下次读取只重新查询这些学期；
+# 与身份缓存相同，提交后再失效一次。课程学分变化时清空整个缓存。多进程部署时其他进程最多滞后 TRANSCRIPT_CACHE_TTL 秒。
+# 年级/专业排名是一条 GROUP BY + RANK() 窗口函数的查询，不逐个学生计算。
+
+ALL_TERMS = '*'
+
+
+class GPAScaleError(ValueError):
+    """未配置的绩点刻度"""
+
+
+def get_scale(name=None):
+    """返回 (刻度名称, [(最低分, 绩点), ...] 按分数从高到低)"""
+    scales = current_app.config.get('GPA_SCALES', {})
+    name = name or current_app.config.get('GPA_SCALE', 'standard')
+    if name not in scales:
+        raise GPAScaleError(f'不支持的绩点刻度: {name}')
+    return name, sorted(scales[name], key=lambda step: step[0], reverse=True)
+
+
+def grade_points_expr(thresholds, grade=Enrollment.grade):
+    """成绩换算为绩点的 CASE 表达式，低于最低分数线为 0"""
+    return db.case(*[(grade >= minimum, db.literal(float(points))) for minimum, points in thresholds],
+                   else_=db.literal(0.0))
+
+
+def _counted():
+    return db.and_(Enrollment.status == 'completed', Enrollment.grade.isnot(None))
+
+
+def _gpa(quality_points, credits):
+    return round(quality_points / credits, 2) if credits else 0.0
+
+
+@dataclass
+class TranscriptCourse:
+    course_id: int
+    course_code: str
+    course_name: str
+    credits: int
+    grade: float
+    grade_points: float
+
+
+@dataclass
+class TermGPA:
+    """一个学期的成绩：课程、学分合计、学分 × 绩点合计"""
+    term_id: int
+    term_name: str
+    start_date: object = None
+    courses: list = field(default_factory=list)
+    credits: int = 0
+    quality_points: float = 0.0
+
+    @property
+    def gpa(self):
+        return _gpa(self.quality_points, self.credits)
+
+    def to_dict(self):
+        return {
+            'term_id': self.term_id,
+            'term': self.term_name,
+            'credits': self.credits,
+            'gpa': self.gpa,
+            'courses': [course.__dict__.copy() for course in self.courses]
+        }
+
+
+@dataclass
+class Transcript:
+    """学生的成绩单：按学期从早到晚排列"""
+    student_id: int
+    scale: str
+    terms: list = field(default_factory=list)
+
+    @property
+    def credits(self):
+        return sum(term.credits for term in self.terms)
+
+    @property
+    def quality_points(self):
+        return sum(term.quality_points for term in self.terms)
+
+    @property
+    def gpa(self):
+        return _gpa(self.quality_points, self.credits)
+
+    def to_dict(self):
+        terms = []
+        credits, quality_points = 0, 0.0
+        for term in self.terms:
+            credits += term.credits
+            quality_points += term.quality_points
+            terms.append(dict(term.to_dict(), cumulative_gpa=_gpa(quality_points, credits)))
+        return {'student_id': self.student_id, 'scale': self.scale, 'credits': self.credits,
+                'gpa': self.gpa, 'terms': terms}
+
+
+def _load_terms(student_id, thresholds, term_ids=None):
+    """一条查询取出学生计入 GPA 的课程（可以只取部分学期），返回 {term_id: TermGPA}"""
+    statement = db.select(
+        Enrollment.term_id, Term.name, Term.start_date,
+        Course.id, Course.course_code, Course.course_name, Course.credits, Enrollment.grade,
+        grade_points_expr(thresholds)
+    ).join(Course, Course.id == Enrollment.course_id).outerjoin(Term, Term.id == Enrollment.term_id).where(
+        Enrollment.student_id == student_id, _counted()
+    ).order_by(Term.start_date, Course.course_code)
+    if term_ids is not None:
+        ids = [term_id for term_id in term_ids if term_id is not None]
+        conditions = [Enrollment.term_id.in_(ids)] if ids else []
+        if None in term_ids:
+            conditions.append(Enrollment.term_id.is_(None))
+        statement = statement.where(db.or_(*conditions))
+
+    terms = {}
+    for term_id, name, start_date, course_id, code, course_name, credits, grade, points in \
+            db.session.execute(statement):
+        term = terms.get(term_id)
+        if term is None:
+            term = terms[term_id] = TermGPA(term_id, name or '未分学期', start_date)
+        credits = credits or 0
+        term.courses.append(TranscriptCourse(course_id, code, course_name, credits, float(grade), float(points)))
+        term.credits += credits
+        term.quality_points += credits * float(points)
+    return terms
+
+
+class TranscriptCache:
+    """进程内 LRU + TTL 缓存：学生 → {刻度: {term_id: TermGPA}, 待重新计算的学期}。
+
+    每个学生带一个代数，失效时加一（清空时整个缓存的代数加一）；读取后写回时代数已变化则放弃写回，
+    避免把失效前读到的结果存入缓存。
+    """
+
+    def __init__(self, app):
+        self.ttl = app.config.get('TRANSCRIPT_CACHE_TTL', 300)
+        self.maxsize = app.config.get('TRANSCRIPT_CACHE_SIZE', 10000)
+        self._items = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def _generation(self, student_id):
+        return self._epoch, self._generations.get(student_id, 0)
+
+    def get(self, student_id, scale):
+        """返回 (各学期结果副本, 待重新计算的学期, 代数)；未缓存时前两项为 None"""
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation(student_id)
+            item = self._items.get(student_id)
+            if item is None or item['expires'] <= now or scale not in item['scales']:
+                return None, None, generation
+            self._items.move_to_end(student_id)
+            entry = item['scales'][scale]
+            return dict(entry['terms']), set(entry['stale']), generation
+
+    def set(self, student_id, scale, terms, generation):
+        if not self.ttl:
+            return
+        with self._lock:
+            if self._generation(student_id) != generation:
+                return
+            item = self._items.get(student_id)
+            if item is None or item['expires'] <= time.monotonic():
+                item = self._items[student_id] = {'expires': time.monotonic() + self.ttl, 'scales': {}}
+            item['scales'][scale] = {'terms': terms, 'stale': set()}
+            self._items.move_to_end(student_id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, pairs):
+        """pairs 为 (学生, 学期) 集合，学期为 ALL_TERMS 时整个学生失效"""
+        with self._lock:
+            for student_id, term_id in pairs:
+                self._generations[student_id] = self._generations.get(student_id, 0) + 1
+                item = self._items.get(student_id)
+                if item is None:
+                    continue
+                if term_id == ALL_TERMS:
+                    del self._items[student_id]
+                    continue
+                for entry in item['scales'].values():
+                    entry['terms'].pop(term_id, None)
+                    entry['stale'].add(term_id)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def __len__(self):
+        return len(self._items)
+
+
+def init_transcript_cache(app):
+    app.extensions['transcript_cache'] = TranscriptCache(app)
+
+
+def get_transcript_cache():
+    return current_app.extensions['transcript_cache']
+
+
+def get_transcript(student_id, scale=None):
+    """学生的成绩单（学期 GPA、累计 GPA），按 (学生, 学期) 缓存"""
+    scale, thresholds = get_scale(scale)
+    cache = get_transcript_cache()
+    terms, stale, generation = cache.get(student_id, scale)
+    if terms is None:
+        terms = _load_terms(student_id, thresholds)
+        cache.set(student_id, scale, terms, generation)
+    elif stale:
+        # 只重新计算失效的学期
+        terms.update(_load_terms(student_id, thresholds, stale))
+        cache.set(student_id, scale, terms, generation)
+    ordered = sorted(terms.values(), key=lambda term: (term.start_date is None, term.start_date))
+    return Transcript(student_id, scale, ordered)
+
+
+def _invalidate(pairs):
+    if pairs and has_app_context() and 'transcript_cache' in current_app.extensions:
+        get_transcript_cache().invalidate(pairs)
+
+
+def invalidate_transcripts(pairs=(), student_ids=(), session=None):
+    """成绩已变化（批量写入时显式调用）：pairs 为受影响的 (学生, 学期)，student_ids 为整个失效的学生。
+    立即失效，并在当前事务提交后再失效一次"""
+    pairs = set(pairs) | {(student_id, ALL_TERMS) for student_id in student_ids}
+    _invalidate(pairs)
+    (session or db.session).info.setdefault('transcript_pairs', set()).update(pairs)
+
+
+def _changed_pairs(session):
+    pairs = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Enrollment):
+            pairs.add((obj.student_id, obj.term_id))
+    for obj in session.dirty:
+        if isinstance(obj, Enrollment):
+            attrs = db.inspect(obj).attrs
+            if not any(attrs[attr].history.has_changes()
+                       for attr in ('grade', 'status', 'term_id', 'course_id', 'student_id')):
+                continue
+            student_ids = {obj.student_id, *attrs.student_id.history.deleted}
+            term_ids = {obj.term_id, *attrs.term_id.history.deleted}
+            pairs.update((student_id, term_id) for student_id in student_ids for term_id in term_ids)
+        elif isinstance(obj, Course) and db.inspect(obj).attrs.credits.history.has_changes():
+            return None
+    return {pair for pair in pairs if pair[0] is not None}
+
+
+@db.event.listens_for(Session, 'after_flush')
+def _invalidate_after_flush(session, flush_context):
+    pairs = _changed_pairs(session)
+    if pairs is None:
+        # 学分变化影响所有选过该课程的学生，直接清空
+        if has_app_context() and 'transcript_cache' in current_app.extensions:
+            get_transcript_cache().clear()
+        session.info['transcript_clear'] = True
+    elif pairs:
+        invalidate_transcripts(pairs, session=session)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    pairs = session.info.pop('transcript_pairs', None)
+    if session.info.pop('transcript_clear', False):
+        if has_app_context() and 'transcript_cache' in current_app.extensions:
+            get_transcript_cache().clear()
+    elif pairs:
+        _invalidate(pairs)
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('transcript_pairs', None)
+    session.info.pop('transcript_clear', None)
+
+
+# 排名
+
+RANKING_FILTERS = ('major', 'enrollment_year', 'semester', 'scale')
+
+
+def ranking_statement(major=None, enrollment_year=None, semester=None, scale=None):
+    """学生按 GPA 排名的查询（一条 GROUP BY 加 RANK() 窗口函数）。
+
+    major、enrollment_year 限定参与排名的学生，semester 只统计该学期的课程（学期 GPA 排名）。
+    结果列：rank, cohort_size, student_pk, student_number, name, major, enrollment_year, credits, courses, gpa
+    """
+    _, thresholds = get_scale(scale)
+    credits = db.func.sum(Course.credits)
+    quality_points = db.func.sum(Course.credits * grade_points_expr(thresholds))
+    totals = db.select(
+        Enrollment.student_id.label('student_id'),
+        credits.label('credits'),
+        db.func.count(Enrollment.id).label('courses'),
+        db.func.round(quality_points / db.func.nullif(credits, 0), 2).label('gpa')
+    ).join(Course, Course.id == Enrollment.course_id).join(Student, Student.id == Enrollment.student_id).where(
+        _counted()
+    ).group_by(Enrollment.student_id)
+    if major:
+        totals = totals.where(Student.major == major)
+    if enrollment_year:
+        totals = totals.where(Student.enrollment_year == enrollment_year)
+    if semester:
+        clause = semester_filter_clause(semester)
+        if clause is not None:
+            totals = totals.where(clause)
+    totals = totals.subquery('gpa_totals')
+
+    gpa = db.func.coalesce(totals.c.gpa, 0)
+    return db.select(
+        db.func.rank().over(order_by=gpa.desc()).label('rank'),
+        db.func.count().over().label('cohort_size'),
+        Student.id.label('student_pk'),
+        Student.student_id.label('student_number'),
+        (Student.first_name + ' ' + Student.last_name).label('name'),
+        Student.major,
+        Student.enrollment_year,
+        totals.c.credits,
+        totals.c.courses,
+        gpa.label('gpa')
+    ).join(Student, Student.id == totals.c.student_id).order_by(gpa.desc(), Student.student_id)
+
+
+def rank_students(limit=None, offset=0, **filters):
+    """按 GPA 排名的学生列表（字典），limit 为空时返回全部"""
+    statement = ranking_statement(**filters)
+    if limit is not None:
+        statement = statement.limit(limit).offset(offset)
+    return [dict(row._mapping) for row in db.session.execute(statement)]
+
+
+def iter_ranking(batch_size=1000, **filters):
+    """服务端游标逐批读取排名（导出用）"""
+    result = db.session.execute(ranking_statement(**filters), execution_options={'yield_per': batch_size})
+    for partition in result.partitions():
+        for row in partition:
+            yield row
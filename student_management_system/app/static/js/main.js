@@ -114,14 +114,15 @@ $(document).ready(function() {
     });
 
     // Export data functionality
+    // 导出由服务端按当前筛选条件生成完整文件（/admin/export/<entity>），不再只抓取当前页的表格
     $('.export-btn').on('click', function() {
         var format = $(this).data('format');
-        var table = $(this).data('table');
+        var url = $(this).data('url');
 
-        if (format === 'csv') {
-            exportTableToCSV(table);
-        } else if (format === 'print') {
+        if (format === 'print') {
             window.print();
+        } else if (url) {
+            window.location.href = url + (url.indexOf('?') === -1 ? '?' : '&') + 'format=' + encodeURIComponent(format);
         }
     });
 
@@ -166,34 +167,6 @@ function showAlert(message, type) {
     }, 5000);
 }
 
-function exportTableToCSV(tableId) {
-    var csv = [];
-    var rows = document.querySelectorAll(tableId + ' tr');
-
-    for (var i = 0; i < rows.length; i++) {
-        var row = [], cols = rows[i].querySelectorAll('td, th');
-
-        for (var j = 0; j < cols.length; j++) {
-            // Remove HTML tags and get text content
-            var data = cols[j].innerText.replace(/(\r\n|\n|\r)/gm, '').replace(/"/g, '""');
-            row.push('"' + data + '"');
-        }
-
-        csv.push(row.join(','));
-    }
-
-    var csvFile = new Blob([csv.join('\n')], { type: 'text/csv' });
-    var downloadLink = document.createElement('a');
-
-    downloadLink.download = 'export_' + new Date().toISOString().slice(0, 10) + '.csv';
-    downloadLink.href = window.URL.createObjectURL(csvFile);
-    downloadLink.style.display = 'none';
-
-    document.body.appendChild(downloadLink);
-    downloadLink.click();
-    document.body.removeChild(downloadLink);
-}
-
 // Loading indicator
 function showLoading() {
     $('<div id="loadingOverlay" style="position:fixed;top:0;left:0;width:100%;height:100%;background:rgba(0,0,0,0.5);z-index:9999;display:flex;justify-content:center;align-items:center;"><div class="spinner-border text-light" style="width:3rem;height:3rem;" role="status"></div></div>').appendTo('body');
@@ -229,7 +202,8 @@ function makeAjaxRequest(url, method, data, callback) {
         error: function(xhr) {
             hideLoading();
             var message = xhr.responseJSON ? xhr.responseJSON.message : '发生错误';
-            showAlert(message, 'danger');
+            // 限流（429）和过载（503）是暂时的，用提示色
+            showAlert(message, xhr.status === 429 || xhr.status === 503 ? 'warning' : 'danger');
         }
     });
 }
@@ -242,7 +216,8 @@ function enrollInCourse(courseId) {
         {},
         function(response) {
             // 这里的response已经是success=true的情况，因为makeAjaxRequest已经处理了success=false的情况
-            showAlert(response.message || '选课成功', 'success');
+            // 名额已满进入候补名单时用提示色
+            showAlert(response.message || '选课成功', response.status === 'waitlisted' ? 'info' : 'success');
             setTimeout(() => location.reload(), 1500);
         }
     );
@@ -1,4 +1,6 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+import functools
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file, abort,
+                   stream_with_context)
 from flask_login import login_required, current_user
 from app import db
 from app.models.user import User
@@ -7,42 +9,188 @@ from app.models.student import Student
 from app.models.course import Course
 from app.models.enrollment import Enrollment
 from app.views.auth import admin_required
+from app.services.statistics import get_dashboard_stats, get_recent_enrollments
+from app.services.loading import apply_loader_policy
+from app.services.pagination import keyset_paginate, InvalidCursor
+from app.services.streaming import resolve_fields, build_stream_query, stream_response, FieldError
+from app.services.search import apply_search, search as search_entities, SEARCH_ENTITIES
+from app.services.filters import student_list_query, course_list_query, enrollment_list_query, grade_list_query
+from app.services.exports import (normalize_format, filters_from_args, count_rows, export_response,
+                                  start_export_job, csv_chunks, export_filename, ExportError)
+from app.services.jobs import get_job, submit_job, find_active_job
+from app.services.accounts import provision_student_accounts
+from app.services.sync import sync_student_data as run_student_sync
+from app.services.imports import IMPORTS, import_file, ImportFileError
+from app.services.grades import apply_grade_batch, course_roster, GradeBatchError
+from app.services.database import pool_status
+from app.services.replicas import read_replica
+from app.services.enrollments import fill_from_waitlist, add_enrollment, update_enrollment, EnrollmentError
+from app.services.admission import get_admission
+from app.services.catalog import get_catalog
+from app.services.summary import course_enrollment_counts
+from app.services.transcript import rank_students, iter_ranking, RANKING_FILTERS, GPAScaleError
+from app.services.grade_analytics import (grade_distributions, grade_distribution, describe_query, scope_names,
+                                          AnalyticsError)
 from functools import wraps
+import os
 import re
 
 admin_bp = Blueprint('admin', __name__)
 
+# 键集分页的排序键：[(列, 是否降序)]，最后一列必须唯一；排序列不能为 NULL（比较条件不会匹配 NULL，这些行会被跳过）
+KEYSET_ORDERS = {
+    'users': [(User.id, False)],
+    'students': [(Student.id, False)],
+    'courses': [(Course.id, False)],
+    'enrollments': [(Enrollment.id, False)],
+    'grades': [(Enrollment.grade, True), (Enrollment.id, True)],
+    'recent': [(Enrollment.updated_at, True), (Enrollment.id, True)],
+}
+
+def keyset_requested():
+    return request.args.get('pagination') == 'keyset' or bool(request.args.get('cursor'))
+
+def paginate_list(query, order_name, per_page=20):
+    """列表分页：默认按页码分页，请求 pagination=keyset 或携带 cursor 时改用键集分页"""
+    if keyset_requested():
+        order = KEYSET_ORDERS[order_name]
+        try:
+            return keyset_paginate(query, order, cursor=request.args.get('cursor'), per_page=per_page)
+        except InvalidCursor:
+            flash('分页链接已失效，已返回第一页', 'warning')
+            return keyset_paginate(query, order, per_page=per_page)
+
+    page = request.args.get('page', 1, type=int)
+    return query.paginate(page=page, per_page=per_page, error_out=False)
+
+# 流式 API 支持的筛选参数
+STREAM_FILTERS = {
+    'students': ('major', 'enrollment_year', 'search'),
+    'courses': ('department', 'credits', 'search'),
+    'enrollments': ('status', 'student_id', 'course_id', 'has_grade', 'search', 'sort'),
+}
+
+def api_list(entity, query, order_name, serialize):
+    """API 列表：默认流式输出完整结果（JSON 数组，format=ndjson 时逐行输出），
+    带 cursor/limit 参数时返回一页键集分页结果"""
+    if not (request.args.get('cursor') or request.args.get('limit')):
+        try:
+            fields = resolve_fields(entity, request.args.get('fields'))
+        except FieldError as e:
+            return jsonify({'error': str(e)}), 400
+        filters = {name: request.args.get(name) for name in STREAM_FILTERS[entity]}
+        ndjson = request.args.get('format') == 'ndjson' or \
+            request.accept_mimetypes.best == 'application/x-ndjson'
+        return stream_response(entity, fields, build_stream_query(entity, fields, filters),
+                               ndjson=ndjson, batch_size=current_app.config.get('STREAM_BATCH_SIZE', 1000))
+
+    limit = request.args.get('limit', 100, type=int)
+    limit = max(1, min(limit, current_app.config.get('API_MAX_PAGE_SIZE', 500)))
+    try:
+        page = keyset_paginate(query, KEYSET_ORDERS[order_name],
+                               cursor=request.args.get('cursor'), per_page=limit)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page.to_dict(serialize))
+
 @admin_bp.route('/dashboard')
 @login_required
 @admin_required
+@read_replica
 def dashboard():
-    # 基础统计
-    stats = {
-        'total_users': User.query.count(),
-        'total_students': Student.query.count(),
-        'total_courses': Course.query.count(),
-        'total_enrollments': Enrollment.query.count(),
-        'active_users': User.query.filter_by(is_active=True).count()
-    }
-
-    # 成绩统计
-    grade_stats = {
-        'total_grades': Enrollment.query.filter(Enrollment.grade.isnot(None)).count(),
-        'avg_grade': db.session.query(db.func.avg(Enrollment.grade)).filter(Enrollment.grade.isnot(None)).scalar() or 0,
-        'highest_grade': db.session.query(db.func.max(Enrollment.grade)).filter(Enrollment.grade.isnot(None)).scalar() or 0,
-        'lowest_grade': db.session.query(db.func.min(Enrollment.grade)).filter(Enrollment.grade.isnot(None)).scalar() or 0,
-        'completed_courses': Enrollment.query.filter_by(status='completed').count()
-    }
+    # 统计数据由统计服务通过聚合查询一次性计算
+    stats = get_dashboard_stats()
 
     # 最近活动
-    recent_enrollments = Enrollment.query.order_by(Enrollment.created_at.desc()).limit(5).all()
-    recent_grades = Enrollment.query.filter(Enrollment.grade.isnot(None)).order_by(Enrollment.updated_at.desc()).limit(5).all()
+    recent_enrollments = get_recent_enrollments(limit=5)
 
     return render_template('admin/dashboard.html',
                          stats=stats,
-                         grade_stats=grade_stats,
-                         recent_enrollments=recent_enrollments,
-                         recent_grades=recent_grades)
+                         recent_enrollments=recent_enrollments)
+
+@admin_bp.route('/api/dashboard/stats')
+@login_required
+@admin_required
+@read_replica
+def api_dashboard_stats():
+    return jsonify(get_dashboard_stats().to_dict())
+
+@admin_bp.route('/api/metrics/pool')
+@login_required
+@admin_required
+def api_pool_metrics():
+    """本进程各数据库连接池的状态：已借出、溢出、取连接等待时间和超时次数；副本另附延迟检查结果"""
+    data = {key or 'default': pool_status(engine) for key, engine in db.engines.items()}
+    replicas = current_app.extensions.get('replicas')
+    if replicas:
+        for name, state in replicas.status().items():
+            data[name] = dict(pool_status(replicas.engines[name]), replication=state)
+    return jsonify(data)
+
+@admin_bp.route('/api/metrics/admission')
+@login_required
+@admin_required
+def api_admission_metrics():
+    """本进程选课接口准入控制的状态：正在处理、排队人数，放行、限流和过载拒绝次数"""
+    admission = get_admission()
+    if admission is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(admission.status(), enabled=True))
+
+@admin_bp.route('/api/reports/gpa-ranking')
+@login_required
+@admin_required
+@read_replica
+def api_gpa_ranking():
+    """学生 GPA 排名：major、enrollment_year 限定参与排名的学生，semester 按学期 GPA 排名，scale 选择绩点刻度。
+    page/per_page 分页返回 JSON；format=csv 时流式导出完整排名"""
+    filters = {name: request.args.get(name) or None for name in RANKING_FILTERS}
+    filters['enrollment_year'] = request.args.get('enrollment_year', type=int)
+    try:
+        if request.args.get('format') == 'csv':
+            headers = ['排名', '学号', '姓名', '专业', '入学年份', '已修学分', '课程数', 'GPA']
+            rows = ((row.rank, row.student_number, row.name, row.major, row.enrollment_year,
+                     row.credits, row.courses, row.gpa)
+                    for row in iter_ranking(current_app.config.get('STREAM_BATCH_SIZE', 1000), **filters))
+            return current_app.response_class(
+                stream_with_context(csv_chunks(headers, rows)), mimetype='text/csv; charset=utf-8',
+                headers={'Content-Disposition': f"attachment; filename={export_filename('gpa_ranking', 'csv')}"})
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = max(1, min(request.args.get('per_page', 50, type=int), current_app.config.get('API_MAX_PAGE_SIZE', 500)))
+        items = rank_students(limit=per_page, offset=(page - 1) * per_page, **filters)
+    except GPAScaleError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'items': items,
+        'page': page,
+        'per_page': per_page,
+        # 总人数由窗口函数随每一行返回；页码超出范围时未知
+        'total': items[0]['cohort_size'] if items else (0 if page == 1 else None),
+        'filters': filters
+    })
+
+@admin_bp.route('/api/analytics/grades')
+@login_required
+@admin_required
+@read_replica
+def api_grade_analytics():
+    """成绩分布：scope 为 course、term 或 all，ids 为逗号分隔的课程/学期 ID（省略时统计该范围内全部），
+    status 为空字符串时统计所有状态的成绩"""
+    scope = request.args.get('scope', 'course')
+    status = request.args.get('status', 'completed')
+    ids = request.args.get('ids', '').strip()
+    try:
+        keys = [int(key) for key in ids.split(',') if key.strip()] if ids else None
+        results = grade_distributions(scope, keys, status)
+    except ValueError as e:
+        return jsonify({'error': str(e) if isinstance(e, AnalyticsError) else 'ids 必须是逗号分隔的整数'}), 400
+    names = scope_names(scope, results)
+    return jsonify({
+        'scope': scope,
+        'status': status,
+        'items': [dict(distribution, key=key, name=names.get(key)) for key, distribution in results.items()]
+    })
 
 # Batch activate inactive users
 @admin_bp.route('/users/activate-inactive', methods=['POST'])
@@ -81,59 +229,19 @@ def activate_inactive_users():
 @login_required
 @admin_required
 def sync_student_data():
-    """同步用户和学生数据"""
+    """同步用户和学生数据；dry_run 时只返回差异，不写入"""
+    data = (request.get_json(silent=True) or {}) if request.is_json else request.form
+    dry_run = str(data.get('dry_run', '')).lower() in ('1', 'on', 'true')
     try:
-        # 获取所有学生用户
-        student_users = User.query.filter_by(role='student').all()
-        synced_count = 0
-        error_count = 0
-
-        for user in student_users:
-            try:
-                # 查找对应的学生记录
-                student = Student.query.filter_by(email=user.email).first()
-                if not student:
-                    # 如果通过邮箱找不到，尝试通过姓名匹配
-                    students_by_name = Student.query.filter(
-                        (Student.first_name == user.full_name.split()[0]) if user.full_name.split() else False
-                    ).all()
-
-                    # 如果找到匹配的，取第一个
-                    if students_by_name:
-                        student = students_by_name[0]
-                        student.email = user.email  # 同步邮箱
+        result = run_student_sync(dry_run=dry_run)
 
-                if student:
-                    # 同步基本信息
-                    student.email = user.email
-                    student.phone = user.phone or ''
-
-                    # 同步姓名
-                    if user.full_name:
-                        if ' ' in user.full_name:
-                            parts = user.full_name.split(' ', 1)
-                            student.first_name = parts[0]
-                            student.last_name = parts[1] if len(parts) > 1 else ''
-                        else:
-                            student.first_name = user.full_name
-                            student.last_name = ''
-
-                    synced_count += 1
-                else:
-                    error_count += 1
-
-            except Exception as e:
-                print(f"同步用户 {user.username} 时出错: {e}")
-                error_count += 1
-                continue
-
-        db.session.commit()
-
-        message = f'数据同步完成！成功同步 {synced_count} 个学生，失败 {error_count} 个'
+        action = '预览完成：需要更新' if dry_run else '数据同步完成！成功同步'
+        message = (f'{action} {len(result.changes)} 个学生（匹配 {result.matched} 个，'
+                   f'其余已是最新），失败 {len(result.unmatched)} 个')
         if request.is_json:
-            return jsonify({'success': True, 'message': message})
+            return jsonify({'success': True, 'message': message, **result.to_dict()})
 
-        flash(message, 'success')
+        flash(message, 'info' if dry_run else 'success')
 
     except Exception as e:
         db.session.rollback()
@@ -148,25 +256,15 @@ def sync_student_data():
 @admin_bp.route('/users')
 @login_required
 @admin_required
+@read_replica
 def users():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
 
     query = User.query
     if search:
-        query = query.filter(
-            db.or_(
-                User.username.like(f'%{search}%'),
-                User.email.like(f'%{search}%'),
-                User.full_name.like(f'%{search}%')
-            )
-        )
+        query = apply_search(query, 'user', search)
 
-    users = query.paginate(
-        page=page,
-        per_page=20,
-        error_out=False
-    )
+    users = paginate_list(query, 'users')
 
     return render_template('admin/users/index.html', users=users, search=search)
 
@@ -311,14 +409,9 @@ def edit_user(user_id):
             elif not user.is_admin() and user.administrator:
                 db.session.delete(user.administrator)
 
-            # If the user is a student, also update the student record
+            # If the user is a student, also update the linked student record
             if user.is_student():
-                # Try to find student record by old email first, then by new email
-                student = Student.query.filter_by(email=user.email).first()
-                if not student:
-                    # If not found by old email, try finding by new email
-                    student = Student.query.filter_by(email=data['email']).first()
-
+                student = user.student
                 if student:
                     # Update student record with the latest user information
                     student.email = data['email']
@@ -380,29 +473,13 @@ def delete_user(user_id):
 @admin_bp.route('/students')
 @login_required
 @admin_required
+@read_replica
 def students():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
 
-    query = Student.query
-    if search:
-        query = query.filter(
-            (Student.student_id.contains(search)) |
-            (Student.first_name.contains(search)) |
-            (Student.last_name.contains(search)) |
-            (Student.email.contains(search))
-        )
-
-    students = query.paginate(
-        page=page,
-        per_page=20,
-        error_out=False
-    )
+    students = paginate_list(student_list_query(search), 'students')
 
-    # 获取所有用户邮箱，用于检查学生是否有登录账户
-    user_emails = set(user.email for user in User.query.filter_by(role='student').all())
-
-    return render_template('admin/students/index.html', students=students, search=search, user_emails=user_emails)
+    return render_template('admin/students/index.html', students=students, search=search)
 
 @admin_bp.route('/students/create', methods=['GET', 'POST'])
 @login_required
@@ -478,6 +555,7 @@ def create_student():
                 major=data.get('major'),
                 enrollment_year=data.get('enrollment_year')
             )
+            student.user = user
             db.session.add(student)
             db.session.commit()
 
@@ -525,9 +603,9 @@ def edit_student(student_id):
         if Student.query.filter(Student.email == data.get('email'), Student.id != student_id).first():
             errors['email'] = '邮箱已存在'
 
-        # Check if username exists (if username is being updated)
-        if data.get('username') and data.get('username') != student.email.split('@')[0]:
-            if User.query.filter(User.username == data.get('username')).first():
+        # Check if username exists (excluding the linked user account)
+        if data.get('username'):
+            if User.query.filter(User.username == data.get('username'), User.id != student.user_id).first():
                 errors['username'] = '用户名已存在'
 
         if errors and request.is_json:
@@ -550,8 +628,8 @@ def edit_student(student_id):
             student.major = data.get('major')
             student.enrollment_year = data.get('enrollment_year')
 
-            # Find and update the corresponding user account (if exists)
-            user = User.query.filter_by(email=student.email).first()
+            # Update the linked user account (if exists)
+            user = student.user
             if user:
                 # Update user info to match student info
                 user.email = data['email']
@@ -589,8 +667,8 @@ def delete_student(student_id):
     student = Student.query.get_or_404(student_id)
 
     try:
-        # Find and delete the corresponding user account (if exists)
-        user = User.query.filter_by(email=student.email).first()
+        # Delete the linked user account (if exists)
+        user = student.user
         if user:
             db.session.delete(user)
 
@@ -614,70 +692,25 @@ def delete_student(student_id):
 @login_required
 @admin_required
 def create_user_accounts_for_students():
-    """为没有用户账户的现有学生创建账户"""
+    """为没有用户账户的现有学生创建账户（后台任务，页面显示进度）"""
     try:
-        # 获取所有学生记录
-        students = Student.query.all()
-        created_count = 0
-        skipped_count = 0
-
-        for student in students:
-            # 检查是否已有对应的用户账户（通过邮箱或学号查找）
-            existing_user = User.query.filter(
-                (User.email == student.email) | (User.username == student.student_id)
-            ).first()
-
-            if existing_user:
-                skipped_count += 1
-                continue
-
-            # 生成默认用户名（优先使用学号）
-            username = student.student_id
-
-            # 如果学号作为用户名已存在，尝试其他方式
-            if User.query.filter_by(username=username).first():
-                # 尝试使用邮箱前缀
-                email_prefix = student.email.split('@')[0]
-                if not User.query.filter_by(username=email_prefix).first():
-                    username = email_prefix
-                else:
-                    # 使用姓名拼音或简单组合
-                    name_part = student.first_name.lower()
-                    if student.last_name:
-                        name_part += student.last_name.lower()
-
-                    username = name_part
-                    counter = 1
-                    while User.query.filter_by(username=username).first():
-                        username = f"{name_part}{counter}"
-                        counter += 1
-
-            # 创建用户账户
-            user = User(
-                username=username,
-                email=student.email,
-                full_name=student.full_name,
-                phone=student.phone or '',
-                role='student',
-                is_active=True
-            )
-            # 设置默认密码为学号（确保学号不为空）
-            default_password = student.student_id if student.student_id else "123456"
-            user.set_password(default_password)
-
-            db.session.add(user)
-            created_count += 1
-
-        db.session.commit()
-
-        message = f'成功为 {created_count} 个学生创建用户账户，跳过 {skipped_count} 个已有账户的学生'
-        if created_count > 0:
-            message += f'。默认密码为学号，首次登录后请修改密码。'
+        job = find_active_job('accounts:students')
+        if job is None:
+            job = submit_job('accounts:students', provision_student_accounts, created_by=current_user.id)
+            message = '已开始为学生批量创建用户账户'
+        else:
+            message = '批量创建用户账户的任务正在进行中'
 
         if request.is_json:
-            return jsonify({'success': True, 'message': message})
+            return jsonify({
+                'success': True,
+                'message': message,
+                'job': job.to_dict(),
+                'status_url': url_for('admin.api_job_status', job_id=job.id)
+            }), 202
 
-        flash(message, 'success')
+        flash(message, 'info')
+        return redirect(url_for('admin.job_status', job_id=job.id))
 
     except Exception as e:
         db.session.rollback()
@@ -692,26 +725,30 @@ def create_user_accounts_for_students():
 @admin_bp.route('/courses')
 @login_required
 @admin_required
+@read_replica
 def courses():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
 
-    query = Course.query
-    if search:
-        query = query.filter(
-            (Course.course_code.contains(search)) |
-            (Course.course_name.contains(search)) |
-            (Course.instructor.contains(search))
-        )
-
-    courses = query.paginate(
-        page=page,
-        per_page=20,
-        error_out=False
-    )
+    courses = paginate_list(course_list_query(search), 'courses')
 
     return render_template('admin/courses/index.html', courses=courses, search=search)
 
+def _parse_capacity(data, errors):
+    """课程容量表单字段：最大选课人数留空表示不限，候补名单长度默认 0"""
+    max_students, waitlist_size = None, 0
+    try:
+        if data.get('max_students') not in (None, ''):
+            max_students = int(data.get('max_students'))
+            if max_students <= 0:
+                errors['max_students'] = '最大选课人数必须大于0'
+        if data.get('waitlist_size') not in (None, ''):
+            waitlist_size = int(data.get('waitlist_size'))
+            if waitlist_size < 0:
+                errors['waitlist_size'] = '候补名单长度不能为负数'
+    except (TypeError, ValueError):
+        errors['max_students'] = '人数必须是整数'
+    return max_students, waitlist_size
+
 @admin_bp.route('/courses/create', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -735,6 +772,8 @@ def create_course():
         if Course.query.filter_by(course_code=data.get('course_code')).first():
             errors['course_code'] = '课程代码已存在'
 
+        max_students, waitlist_size = _parse_capacity(data, errors)
+
         if errors and request.is_json:
             return jsonify({'success': False, 'errors': errors}), 400
 
@@ -750,7 +789,9 @@ def create_course():
             description=data.get('description'),
             credits=int(data.get('credits', 3)),
             department=data.get('department'),
-            instructor=data.get('instructor')
+            instructor=data.get('instructor'),
+            max_students=max_students,
+            waitlist_size=waitlist_size
         )
 
         try:
@@ -788,6 +829,8 @@ def edit_course(course_id):
         if not data.get('credits') or int(data.get('credits', 0)) <= 0:
             errors['credits'] = '学分必须大于0'
 
+        max_students, waitlist_size = _parse_capacity(data, errors)
+
         if errors and request.is_json:
             return jsonify({'success': False, 'errors': errors}), 400
 
@@ -802,9 +845,14 @@ def edit_course(course_id):
         course.credits = int(data.get('credits', 3))
         course.department = data.get('department')
         course.instructor = data.get('instructor')
+        # 已选人数超过新容量时不会退掉已选学生，只是不再接受新的选课
+        course.max_students = max_students
+        course.waitlist_size = waitlist_size
 
         try:
             db.session.commit()
+            # 扩容后把候补学生补进空出的名额
+            fill_from_waitlist(course.id)
 
             if request.is_json:
                 return jsonify({'success': True, 'message': '课程更新成功', 'course': course.to_dict()})
@@ -845,30 +893,13 @@ def delete_course(course_id):
 @admin_bp.route('/enrollments')
 @login_required
 @admin_required
+@read_replica
 def enrollments():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     status_filter = request.args.get('status', '')
 
-    query = Enrollment.query.join(Student).join(Course)
-
-    if search:
-        query = query.filter(
-            (Student.student_id.contains(search)) |
-            (Student.first_name.contains(search)) |
-            (Student.last_name.contains(search)) |
-            (Course.course_code.contains(search)) |
-            (Course.course_name.contains(search))
-        )
-
-    if status_filter:
-        query = query.filter(Enrollment.status == status_filter)
-
-    enrollments = query.paginate(
-        page=page,
-        per_page=20,
-        error_out=False
-    )
+    query = enrollment_list_query(search, status_filter)
+    enrollments = paginate_list(apply_loader_policy(query, 'admin.enrollments'), 'enrollments')
 
     return render_template('admin/enrollments/index.html', enrollments=enrollments, search=search, status_filter=status_filter)
 
@@ -905,28 +936,28 @@ def create_enrollment():
                 flash(error, 'error')
             from datetime import datetime
             students = Student.query.all()
-            courses = Course.query.all()
+            courses = get_catalog().courses
             return render_template('admin/enrollments/create.html', students=students, courses=courses, today=datetime.now().strftime('%Y-%m-%d'))
 
-        # Create new enrollment (without grade)
+        # Create new enrollment (without grade)，成绩需要单独录入；已选/候补状态经选课服务占用名额
         from datetime import datetime
-        enrollment = Enrollment(
-            student_id=data['student_id'],
-            course_id=data['course_id'],
-            enrollment_date=datetime.strptime(data.get('enrollment_date'), '%Y-%m-%d').date() if data.get('enrollment_date') else None,
-            status=data.get('status', 'enrolled'),
-            grade=None  # 移除成绩录入，成绩需要单独录入
-        )
-
         try:
-            db.session.add(enrollment)
-            db.session.commit()
+            enrollment = add_enrollment(
+                int(data['student_id']),
+                int(data['course_id']),
+                status=data.get('status') or 'enrolled',
+                enrollment_date=datetime.strptime(data.get('enrollment_date'), '%Y-%m-%d').date() if data.get('enrollment_date') else None
+            )
 
             if request.is_json:
                 return jsonify({'success': True, 'message': '选课信息创建成功', 'enrollment': enrollment.to_dict()})
 
             flash('选课信息创建成功', 'success')
             return redirect(url_for('admin.enrollments'))
+        except EnrollmentError as e:
+            if request.is_json:
+                return jsonify({'success': False, 'code': e.code, 'message': e.message}), e.status_code
+            flash(e.message, 'error')
         except Exception as e:
             db.session.rollback()
             print(f"选课创建错误: {e}")  # 调试信息
@@ -936,7 +967,7 @@ def create_enrollment():
 
     from datetime import datetime
     students = Student.query.all()
-    courses = Course.query.all()
+    courses = get_catalog().courses
     return render_template('admin/enrollments/create.html', students=students, courses=courses, today=datetime.now().strftime('%Y-%m-%d'))
 
 @admin_bp.route('/grades/record', methods=['GET', 'POST'])
@@ -967,6 +998,9 @@ def record_grade():
 
         if not existing:
             errors['enrollment'] = '该学生尚未选课，请先添加选课记录'
+        elif existing.status == 'waitlisted':
+            # 改为已完成会占用名额，候补学生需要先通过选课服务转正
+            errors['enrollment'] = '该学生仍在候补名单中，不能录入成绩'
 
         if errors:
             if request.is_json:
@@ -974,7 +1008,7 @@ def record_grade():
             for field, error in errors.items():
                 flash(error, 'error')
             students = Student.query.all()
-            courses = Course.query.all()
+            courses = get_catalog().courses
             return render_template('admin/grades/record.html',
                                  students=students,
                                  courses=courses,
@@ -1006,12 +1040,47 @@ def record_grade():
 
     # GET request - show form
     students = Student.query.all()
-    courses = Course.query.all()
+    courses = get_catalog().courses
     return render_template('admin/grades/record.html', students=students, courses=courses)
 
+@admin_bp.route('/courses/<int:course_id>/grades')
+@login_required
+@admin_required
+def course_grade_grid(course_id):
+    """课程成绩表格：整班名单一次录入，保存时批量提交"""
+    course = Course.query.get_or_404(course_id)
+    enrollments = course_roster(course.id)
+    return render_template('admin/grades/grid.html', course=course, enrollments=enrollments)
+
+@admin_bp.route('/api/grades/batch', methods=['POST'])
+@login_required
+@admin_required
+def batch_update_grades():
+    """批量录入成绩：{course_id?, atomic?, items: [{enrollment_id 或 student_id, grade, status}]}"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': '请求体必须是 JSON 对象'}), 400
+
+    try:
+        results, updated = apply_grade_batch(data.get('items'), course_id=data.get('course_id'),
+                                             atomic=bool(data.get('atomic')))
+    except GradeBatchError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'成绩录入失败: {str(e)}'}), 500
+
+    failed = sum(1 for result in results if not result['success'])
+    return jsonify({
+        'success': failed == 0,
+        'updated': updated,
+        'failed': failed,
+        'results': results
+    })
+
 @admin_bp.route('/api/check-enrollment')
 @login_required
 @admin_required
+@read_replica
 def check_enrollment():
     """检查学生是否已选指定课程"""
     student_id = request.args.get('student_id')
@@ -1033,6 +1102,7 @@ def check_enrollment():
 @admin_bp.route('/api/student-courses/<int:student_id>')
 @login_required
 @admin_required
+@read_replica
 def get_student_courses(student_id):
     """获取指定学生已选的课程"""
 
@@ -1064,22 +1134,28 @@ def edit_enrollment(enrollment_id):
     if request.method == 'POST':
         data = request.get_json() if request.is_json else request.form
 
-        # Update enrollment
-        enrollment.status = data.get('status', 'enrolled')
+        # Update enrollment：未提交状态时保持原状态；名额变化（以及空出名额后的候补转正）由选课服务处理
+        status = data.get('status') or enrollment.status
+        values = {}
         if data.get('grade'):
-            enrollment.grade = float(data.get('grade'))
+            values['grade'] = float(data.get('grade'))
             # 如果录入了成绩，自动将状态更新为已完成
-            if enrollment.status == 'enrolled':
-                enrollment.status = 'completed'
+            if status == 'enrolled':
+                status = 'completed'
 
         try:
-            db.session.commit()
+            update_enrollment(enrollment.id, status, **values)
+            db.session.refresh(enrollment)
 
             if request.is_json:
                 return jsonify({'success': True, 'message': '选课信息更新成功', 'enrollment': enrollment.to_dict()})
 
             flash('选课信息更新成功', 'success')
             return redirect(url_for('admin.enrollments'))
+        except EnrollmentError as e:
+            if request.is_json:
+                return jsonify({'success': False, 'code': e.code, 'message': e.message}), e.status_code
+            flash(e.message, 'error')
         except Exception as e:
             db.session.rollback()
             if request.is_json:
@@ -1088,7 +1164,7 @@ def edit_enrollment(enrollment_id):
 
     # 获取所有学生和课程数据
     students = Student.query.all()
-    courses = Course.query.all()
+    courses = get_catalog().courses
     return render_template('admin/enrollments/edit.html', enrollment=enrollment, students=students, courses=courses)
 
 @admin_bp.route('/enrollments/<int:enrollment_id>/delete', methods=['POST'])
@@ -1096,10 +1172,12 @@ def edit_enrollment(enrollment_id):
 @admin_required
 def delete_enrollment(enrollment_id):
     enrollment = Enrollment.query.get_or_404(enrollment_id)
+    course_id = enrollment.course_id
 
     try:
         db.session.delete(enrollment)
         db.session.commit()
+        fill_from_waitlist(course_id)
 
         if request.is_json:
             return jsonify({'success': True, 'message': '选课信息删除成功'})
@@ -1117,44 +1195,32 @@ def delete_enrollment(enrollment_id):
 @admin_bp.route('/grades')
 @login_required
 @admin_required
+@read_replica
 def grades():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     course_filter = request.args.get('course', '')
     status_filter = request.args.get('status', 'completed')
 
-    query = Enrollment.query.join(Student).join(Course)
-
     # 只显示有成绩的记录
-    query = query.filter(Enrollment.grade.isnot(None))
-
-    if search:
-        query = query.filter(
-            (Student.student_id.contains(search)) |
-            (Student.first_name.contains(search)) |
-            (Student.last_name.contains(search)) |
-            (Course.course_code.contains(search)) |
-            (Course.course_name.contains(search))
-        )
-
-    if course_filter:
-        query = query.filter(Course.id == course_filter)
-
-    if status_filter:
-        query = query.filter(Enrollment.status == status_filter)
+    query = grade_list_query(search, course_filter, status_filter)
 
     # 按成绩降序排列
-    enrollments = query.order_by(Enrollment.grade.desc()).paginate(
-        page=page,
-        per_page=20,
-        error_out=False
-    )
+    enrollments = paginate_list(apply_loader_policy(query, 'admin.grades').order_by(Enrollment.grade.desc()), 'grades')
+
+    # 成绩分布按全部筛选结果统计（不只是当前页）：无搜索条件时使用按课程/全部缓存的结果
+    if search or (course_filter and not course_filter.isdigit()):
+        analytics = describe_query(query)
+    elif course_filter:
+        analytics = grade_distribution('course', int(course_filter), status_filter)
+    else:
+        analytics = grade_distribution('all', None, status_filter)
 
     # 获取所有课程用于筛选
     courses = Course.query.order_by(Course.course_name).all()
 
     return render_template('admin/grades/index.html',
                          enrollments=enrollments,
+                         analytics=analytics,
                          search=search,
                          course_filter=course_filter,
                          status_filter=status_filter,
@@ -1171,10 +1237,12 @@ def delete_grade(enrollment_id):
     student_name = f"{enrollment.student.first_name} {enrollment.student.last_name}"
     course_name = enrollment.course.course_name
     grade = enrollment.grade
+    course_id = enrollment.course_id
 
     try:
         db.session.delete(enrollment)
         db.session.commit()
+        fill_from_waitlist(course_id)
 
         if request.is_json:
             return jsonify({
@@ -1194,24 +1262,187 @@ def delete_grade(enrollment_id):
 
     return redirect(url_for('admin.grades'))
 
+# 服务端导出，筛选参数与对应列表页相同
+ADMIN_EXPORTS = ('students', 'courses', 'enrollments', 'grades')
+
+@admin_bp.route('/export/<entity>')
+@login_required
+@admin_required
+@read_replica
+def export(entity):
+    if entity not in ADMIN_EXPORTS:
+        abort(404)
+
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    try:
+        fmt = normalize_format(request.args.get('format'))
+    except ExportError as e:
+        if wants_json:
+            return jsonify({'error': str(e)}), 400
+        flash(str(e), 'error')
+        return redirect(request.referrer or url_for(f'admin.{entity}'))
+
+    filters = filters_from_args(entity, request.args)
+
+    # 行数较多（或显式要求 async=1）时转为后台任务，避免长时间占用 Web 进程
+    if request.args.get('async') == '1' or \
+            count_rows(entity, filters) > current_app.config.get('EXPORT_SYNC_MAX_ROWS', 5000):
+        job = start_export_job(entity, fmt, filters, created_by=current_user.id)
+        if wants_json:
+            return jsonify({
+                'job': job.to_dict(),
+                'status_url': url_for('admin.api_job_status', job_id=job.id),
+                'download_url': url_for('admin.download_export', job_id=job.id)
+            }), 202
+        flash('导出数据较多，已转为后台任务，完成后可在本页面下载', 'info')
+        return redirect(url_for('admin.job_status', job_id=job.id))
+
+    try:
+        return export_response(entity, fmt, filters)
+    except ExportError as e:
+        flash(str(e), 'error')
+        return redirect(request.referrer or url_for(f'admin.{entity}'))
+
+@admin_bp.route('/api/grades/export')
+@login_required
+@admin_required
+@read_replica
+def export_grades():
+    return export('grades')
+
+@admin_bp.route('/jobs/<job_id>')
+@login_required
+@admin_required
+def job_status(job_id):
+    job = get_job(job_id)
+    if not job:
+        abort(404)
+    return render_template('admin/jobs/view.html', job=job)
+
+@admin_bp.route('/api/jobs/<job_id>')
+@login_required
+@admin_required
+def api_job_status(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    data = job.to_dict()
+    if job.status == 'completed' and job.result_path:
+        data['download_url'] = url_for('admin.download_export', job_id=job.id)
+    return jsonify(data)
+
+@admin_bp.route('/exports/<job_id>/download')
+@login_required
+@admin_required
+def download_export(job_id):
+    job = get_job(job_id, kind='export:')
+    if not job:
+        abort(404)
+    if job.status != 'completed' or not job.result_path or not os.path.exists(job.result_path):
+        flash('导出文件尚未生成或已过期', 'warning')
+        return redirect(url_for('admin.job_status', job_id=job_id))
+    return send_file(job.result_path, as_attachment=True, download_name=job.result_name)
+
+# 批量导入（CSV/XLSX），表头可以用字段名或导出文件中的中文表头
+@admin_bp.route('/import/<entity>', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_data(entity):
+    if entity not in IMPORTS:
+        abort(404)
+    spec = IMPORTS[entity]
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    result = None
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        dry_run = request.form.get('dry_run') in ('1', 'on', 'true')
+
+        if not upload or not upload.filename:
+            if wants_json:
+                return jsonify({'success': False, 'message': '请选择要导入的文件'}), 400
+            flash('请选择要导入的文件', 'error')
+            return render_template('admin/imports/index.html', entity=entity, spec=spec)
+
+        try:
+            result = import_file(entity, upload.stream, upload.filename, dry_run=dry_run)
+        except ImportFileError as e:
+            if wants_json:
+                return jsonify({'success': False, 'message': str(e)}), 400
+            flash(str(e), 'error')
+            return render_template('admin/imports/index.html', entity=entity, spec=spec)
+        except Exception as e:
+            if wants_json:
+                return jsonify({'success': False, 'message': f'导入失败: {str(e)}'}), 500
+            flash(f'导入失败: {str(e)}', 'error')
+            return render_template('admin/imports/index.html', entity=entity, spec=spec)
+
+        if wants_json:
+            return jsonify({'success': True, **result.to_dict()})
+
+        if dry_run:
+            flash(f'校验完成：{result.valid} 行有效，{len(result.error_rows)} 行有错误（未写入数据）', 'info')
+        else:
+            flash(f'成功导入 {result.inserted} 条{spec.title}记录，{len(result.error_rows)} 行有错误已跳过', 'success')
+
+    return render_template('admin/imports/index.html', entity=entity, spec=spec, result=result)
+
+@admin_bp.route('/import/<entity>/template')
+@login_required
+@admin_required
+def import_template(entity):
+    if entity not in IMPORTS:
+        abort(404)
+    headers = [field.label for field in IMPORTS[entity].fields]
+    return current_app.response_class(''.join(csv_chunks(headers, [])), mimetype='text/csv; charset=utf-8',
+                                      headers={'Content-Disposition': f'attachment; filename={entity}_template.csv'})
+
 # API endpoints for data
+@admin_bp.route('/api/search')
+@login_required
+@admin_required
+@read_replica
+def api_search():
+    """按相关度排序的全文搜索，type 为 user/student/course"""
+    text = request.args.get('q', '').strip()
+    entity_name = request.args.get('type', 'student')
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+
+    if entity_name not in SEARCH_ENTITIES:
+        return jsonify({'error': f'不支持的搜索类型: {entity_name}'}), 400
+    if not text:
+        return jsonify([])
+
+    return jsonify([
+        {'id': obj.id, 'score': score, 'item': obj.to_dict()}
+        for obj, score in search_entities(entity_name, text, limit=limit)
+    ])
+
 @admin_bp.route('/api/students')
 @login_required
 @admin_required
+@read_replica
 def api_students():
-    students = Student.query.all()
-    return jsonify([s.to_dict() for s in students])
+    return api_list('students', Student.query, 'students', lambda s: s.to_dict())
 
 @admin_bp.route('/api/courses')
 @login_required
 @admin_required
+@read_replica
 def api_courses():
-    courses = Course.query.all()
-    return jsonify([c.to_dict() for c in courses])
+    # 分页结果的选课人数取自课程汇总表（整页一条查询），不再逐门课程 COUNT
+    counts = functools.cache(course_enrollment_counts)
+    return api_list('courses', Course.query, 'courses', lambda c: c.to_dict(counts().get(c.id, 0)))
 
 @admin_bp.route('/api/enrollments')
 @login_required
 @admin_required
+@read_replica
 def api_enrollments():
-    enrollments = Enrollment.query.all()
-    return jsonify([e.to_dict() for e in enrollments])
\ No newline at end of file
+    # sort=updated 按最近更新排序（updated_at + id），否则按 id 排序
+    order_name = 'recent' if request.args.get('sort') == 'updated' else 'enrollments'
+    query = apply_loader_policy(Enrollment.query, 'admin.api_enrollments')
+    # 学生、课程取自 JOIN 的列，课程的选课人数取自课程汇总表（整页一条查询），不再逐行 COUNT
+    counts = functools.cache(course_enrollment_counts)
+    return api_list('enrollments', query, order_name,
+                    lambda e: e.to_dict(course_enrollment_count=counts().get(e.course_id, 0)))
\ No newline at end of file
@@ -4,7 +4,17 @@ from app import db
 from app.models.student import Student
 from app.models.course import Course
 from app.models.enrollment import Enrollment
-from datetime import date
+from app.services.statistics import get_student_stats, get_student_semesters
+from app.services.loading import apply_loader_policy
+from app.services.search import search_filter
+from app.services.filters import student_grade_query
+from app.services.exports import normalize_format, filters_from_args, export_response, ExportError
+from app.services.identity import get_current_student
+from app.services.enrollments import enroll_student, drop_enrollment, EnrollmentError
+from app.services.replicas import read_replica
+from app.services.admission import admission_control
+from app.services.course_browse import CourseFilters, browse_courses, list_courses, course_dict, etag_response
+from app.services.transcript import get_transcript, GPAScaleError
 from functools import wraps
 
 student_bp = Blueprint('student', __name__)
@@ -23,37 +33,38 @@ def student_only(f):
 @student_only
 def dashboard():
     # Get or create student record for current user
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
 
     if not student:
-        # Create student record automatically
-        student = Student(
-            student_id=f"STU{current_user.id:05d}",
-            first_name=current_user.full_name.split()[0] if current_user.full_name else '',
-            last_name=' '.join(current_user.full_name.split()[1:]) if len(current_user.full_name.split()) > 1 else '',
-            email=current_user.email,
-            phone=current_user.phone or ''
-        )
-        db.session.add(student)
+        # 管理员导入的学生记录还没有关联账户时，按邮箱关联一次；否则自动创建学生记录
+        student = Student.query.filter_by(email=current_user.email, user_id=None).first()
+        if student:
+            student.user_id = current_user.id
+        else:
+            student = Student(
+                student_id=f"STU{current_user.id:05d}",
+                first_name=current_user.full_name.split()[0] if current_user.full_name else '',
+                last_name=' '.join(current_user.full_name.split()[1:]) if len(current_user.full_name.split()) > 1 else '',
+                email=current_user.email,
+                phone=current_user.phone or '',
+                user_id=current_user.id
+            )
+            db.session.add(student)
         db.session.commit()
 
-    # Get student's enrollments
-    enrollments = Enrollment.query.filter_by(student_id=student.id).all()
-
-    # Calculate statistics
-    total_courses = len(enrollments)
-    completed_courses = len([e for e in enrollments if e.status == 'completed'])
-    current_courses = len([e for e in enrollments if e.status == 'enrolled'])
-
-    # Calculate average grade
-    completed_with_grades = [e for e in enrollments if e.status == 'completed' and e.grade is not None]
-    avg_grade = sum(e.grade for e in completed_with_grades) / len(completed_with_grades) if completed_with_grades else 0
+    # 仪表盘只展示前 5 条选课，课程随主查询一起加载
+    enrollments = apply_loader_policy(
+        Enrollment.query.filter_by(student_id=student.id).order_by(Enrollment.id).limit(5),
+        'student.dashboard'
+    ).all()
 
+    # 统计数据直接读取增量维护的学生汇总行
+    summary = get_student_stats(student.id)
     stats = {
-        'total_courses': total_courses,
-        'completed_courses': completed_courses,
-        'current_courses': current_courses,
-        'avg_grade': round(avg_grade, 2)
+        'total_courses': summary.total_count,
+        'completed_courses': summary.completed_count,
+        'current_courses': summary.enrolled_count,
+        'avg_grade': round(summary.completed_avg_grade, 2)
     }
 
     return render_template('student/dashboard.html', student=student, enrollments=enrollments, stats=stats)
@@ -62,39 +73,30 @@ def dashboard():
 @login_required
 @student_only
 def profile():
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         flash('未找到学生记录。请联系管理员。', 'error')
         return redirect(url_for('student.dashboard'))
 
-    # Get student's enrollments for statistics
-    enrollments = Enrollment.query.filter_by(student_id=student.id).all()
-
-    # Calculate statistics
-    total_courses = len(enrollments)
-    completed_courses = len([e for e in enrollments if e.status == 'completed'])
-    current_courses = len([e for e in enrollments if e.status == 'enrolled'])
-
-    # Calculate average grade and total credits
-    completed_with_grades = [e for e in enrollments if e.status == 'completed' and e.grade is not None]
-    avg_grade = sum(e.grade for e in completed_with_grades) / len(completed_with_grades) if completed_with_grades else 0
-    total_credits = sum(e.course.credits for e in enrollments if e.status == 'completed')
-
+    # 统计数据直接读取增量维护的学生汇总行
+    summary = get_student_stats(student.id)
     stats = {
-        'total_courses': total_courses,
-        'completed_courses': completed_courses,
-        'current_courses': current_courses,
-        'avg_grade': round(avg_grade, 1),
-        'total_credits': total_credits
+        'total_courses': summary.total_count,
+        'completed_courses': summary.completed_count,
+        'current_courses': summary.enrolled_count,
+        'avg_grade': round(summary.completed_avg_grade, 1),
+        'total_credits': summary.completed_credits
     }
+    # 学期 GPA 和累计 GPA（按学期缓存）
+    transcript = get_transcript(student.id).to_dict()
 
-    return render_template('student/profile.html', student=student, enrollments=enrollments, stats=stats)
+    return render_template('student/profile.html', student=student, stats=stats, transcript=transcript)
 
 @student_bp.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
 @student_only
 def edit_profile():
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
 
     if request.method == 'POST':
         data = request.get_json() if request.is_json else request.form
@@ -158,146 +160,92 @@ def edit_profile():
 @student_bp.route('/courses')
 @login_required
 @student_only
+@admission_control
+@read_replica
 def courses():
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         flash('未找到学生记录。请联系管理员。', 'error')
         return redirect(url_for('student.dashboard'))
 
-    # Get search parameter
-    search_term = request.args.get('search', '').strip()
-
-    # Build query for courses
-    query = Course.query
-
-    # Apply search filter if provided
-    if search_term:
-        # Search in course_code and course_name
-        query = query.filter(
-            db.or_(
-                Course.course_code.contains(search_term),
-                Course.course_name.contains(search_term)
-            )
-        )
-
-    # Get courses based on search
-    all_courses = query.all()
-
-    # Get courses the student is already enrolled in
-    enrolled_course_ids = [e.course_id for e in Enrollment.query.filter_by(student_id=student.id).all()]
-
-    # Separate available and enrolled courses
-    available_courses = [c for c in all_courses if c.id not in enrolled_course_ids]
-    enrolled_courses = [c for c in all_courses if c.id in enrolled_course_ids]
+    # 已选和可选课程由一条 LEFT JOIN 查询分页返回，另附院系、学分分面；内容未变时返回 304
+    filters = CourseFilters.from_args(request.args)
+    result = browse_courses(student.id, filters, page=request.args.get('page', 1, type=int),
+                            per_page=request.args.get('per_page', type=int))
 
-    return render_template('student/courses.html',
-                         available_courses=available_courses,
-                         enrolled_courses=enrolled_courses,
-                         search_term=search_term)
+    return etag_response(result.etag, lambda: render_template('student/courses.html',
+                         courses=result,
+                         available_courses=result.available,
+                         enrolled_courses=result.enrolled,
+                         filters=filters,
+                         search_term=filters.search))
 
 @student_bp.route('/courses/<int:course_id>/enroll', methods=['POST'])
 @login_required
 @student_only
+@admission_control
 def enroll_course(course_id):
     # 判断是否是AJAX请求
     is_ajax = request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
 
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         if is_ajax:
             return jsonify({'success': False, 'message': '未找到学生记录'}), 400
         flash('未找到学生记录。请联系管理员。', 'error')
         return redirect(url_for('student.dashboard'))
 
-    course = Course.query.get_or_404(course_id)
-
-    # Check if already enrolled
-    existing_enrollment = Enrollment.query.filter_by(
-        student_id=student.id,
-        course_id=course_id
-    ).first()
-
-    if existing_enrollment:
+    # 名额、候补和重复选课都由选课服务原子地判断，失败时返回确定的错误码而不是 500
+    try:
+        result = enroll_student(student.id, course_id)
+    except EnrollmentError as e:
         if is_ajax:
-            return jsonify({'success': False, 'message': '已经选修了这门课程'}), 400
-        flash('您已经选修了这门课程', 'error')
+            return jsonify({'success': False, 'code': e.code, 'message': e.message}), e.status_code
+        flash(e.message, 'error')
         return redirect(url_for('student.courses'))
 
-    # Create new enrollment
-    enrollment = Enrollment(
-        student_id=student.id,
-        course_id=course_id,
-        enrollment_date=date.today(),
-        status='enrolled'
-    )
-
-    try:
-        db.session.add(enrollment)
-        db.session.commit()
-
-        if is_ajax:
-            return jsonify({
-                'success': True,
-                'message': f'成功选修课程：{course.course_name}',
-                'enrollment': enrollment.to_dict()
-            })
-
-        flash(f'成功选修课程：{course.course_name}', 'success')
-    except Exception as e:
-        db.session.rollback()
-        error_msg = f'选课失败：{str(e)}' if str(e) else '选课失败'
-        if is_ajax:
-            return jsonify({'success': False, 'message': error_msg}), 500
-        flash(error_msg, 'error')
+    if is_ajax:
+        return jsonify({'success': True, 'message': result.message, **result.to_dict()})
 
+    flash(result.message, 'success' if result.status == 'enrolled' else 'info')
     return redirect(url_for('student.courses'))
 
 @student_bp.route('/courses/<int:course_id>/drop', methods=['POST'])
 @login_required
 @student_only
+@admission_control
 def drop_course(course_id):
     # 判断是否是AJAX请求
     is_ajax = request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
 
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         if is_ajax:
             return jsonify({'success': False, 'message': '未找到学生记录'}), 400
         flash('未找到学生记录。请联系管理员。', 'error')
         return redirect(url_for('student.dashboard'))
 
-    enrollment = Enrollment.query.filter_by(
-        student_id=student.id,
-        course_id=course_id
-    ).first_or_404()
-
-    course_name = enrollment.course.course_name
-
     try:
-        db.session.delete(enrollment)
-        db.session.commit()
-
-        if is_ajax:
-            return jsonify({
-                'success': True,
-                'message': f'成功退选课程：{course_name}'
-            })
-
-        flash(f'成功退选课程：{course_name}', 'success')
-    except Exception as e:
-        db.session.rollback()
-        error_msg = f'退选课程失败：{str(e)}' if str(e) else '退选课程失败'
+        result = drop_enrollment(student.id, course_id)
+    except EnrollmentError as e:
         if is_ajax:
-            return jsonify({'success': False, 'message': error_msg}), 500
-        flash(error_msg, 'error')
+            return jsonify({'success': False, 'code': e.code, 'message': e.message}), e.status_code
+        flash(e.message, 'error')
+        return redirect(url_for('student.courses'))
+
+    message = f'成功退选课程：{result.course.course_name}'
+    if is_ajax:
+        return jsonify({'success': True, 'message': message})
 
+    flash(message, 'success')
     return redirect(url_for('student.courses'))
 
 @student_bp.route('/enrollments')
 @login_required
 @student_only
+@read_replica
 def enrollments():
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         flash('未找到学生记录。请联系管理员。', 'error')
         return redirect(url_for('student.dashboard'))
@@ -315,34 +263,22 @@ def enrollments():
 
     # Apply search filter if provided
     if search_term:
-        query = query.filter(
-            db.or_(
-                Course.course_code.contains(search_term),
-                Course.course_name.contains(search_term),
-                Course.instructor.contains(search_term)
-            )
-        )
+        query = query.filter(search_filter('course', search_term, Enrollment.course_id))
 
-    enrollments = query.paginate(
+    enrollments = apply_loader_policy(query, 'student.enrollments').paginate(
         page=page,
         per_page=10,
         error_out=False
     )
 
-    # 计算统计数据（基于所有记录，不仅仅是当前页）
-    all_enrollments = query.all()
-    completed_count = len([e for e in all_enrollments if e.status == 'completed'])
-    enrolled_count = len([e for e in all_enrollments if e.status == 'enrolled'])
-
-    # 计算平均成绩
-    completed_grades = [e.grade for e in all_enrollments if e.status == 'completed' and e.grade is not None]
-    avg_grade = sum(completed_grades) / len(completed_grades) if completed_grades else 0
-
+    # 统计数据基于所有记录（不仅仅是当前页）：未筛选时读取学生汇总行，筛选时在数据库中聚合
+    filtered = bool(status_filter or search_term)
+    summary = get_student_stats(student.id, query if filtered else None)
     stats = {
-        'total': len(all_enrollments),
-        'completed': completed_count,
-        'enrolled': enrolled_count,
-        'avg_grade': round(avg_grade, 1)
+        'total': summary.total_count,
+        'completed': summary.completed_count,
+        'enrolled': summary.enrolled_count,
+        'avg_grade': round(summary.completed_avg_grade, 1)
     }
 
     return render_template('student/enrollments.html',
@@ -355,7 +291,7 @@ def enrollments():
 @login_required
 @student_only
 def view_enrollment(enrollment_id):
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         flash('未找到学生记录。请联系管理员。', 'error')
         return redirect(url_for('student.dashboard'))
@@ -370,8 +306,9 @@ def view_enrollment(enrollment_id):
 @student_bp.route('/grades')
 @login_required
 @student_only
+@read_replica
 def grades():
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         flash('未找到学生记录。请联系管理员。', 'error')
         return redirect(url_for('student.dashboard'))
@@ -381,65 +318,26 @@ def grades():
     semester_filter = request.args.get('semester', '')
     search_query = request.args.get('search', '').strip()
 
-    # 构建基础查询：只显示有成绩的记录
-    query = Enrollment.query.filter_by(student_id=student.id).filter(Enrollment.grade.isnot(None)).join(Course)
+    # 只显示有成绩的记录，按课程名称/代码搜索、状态、学期筛选
+    query = student_grade_query(student.id, search_query, status_filter, semester_filter)
 
-    # 应用搜索过滤器（按课程名称或课程代码）
-    if search_query:
-        query = query.filter(
-            db.or_(
-                Course.course_code.contains(search_query),
-                Course.course_name.contains(search_query)
-            )
-        )
-
-    # 应用状态过滤器
-    if status_filter:
-        query = query.filter(Enrollment.status == status_filter)
-
-    # 应用学期过滤器
-    if semester_filter:
-        if '春季' in semester_filter:
-            year = semester_filter.replace('春季', '')
-            query = query.filter(
-                db.extract('year', Enrollment.enrollment_date) == year,
-                db.extract('month', Enrollment.enrollment_date) <= 6
-            )
-        elif '秋季' in semester_filter:
-            year = semester_filter.replace('秋季', '')
-            query = query.filter(
-                db.extract('year', Enrollment.enrollment_date) == year,
-                db.extract('month', Enrollment.enrollment_date) > 6
-            )
-
-    enrollments = query.order_by(Enrollment.updated_at.desc()).paginate(
+    enrollments = apply_loader_policy(query, 'student.grades').order_by(Enrollment.updated_at.desc()).paginate(
         page=page,
         per_page=10,
         error_out=False
     )
 
-    # 获取所有可用学期（用于下拉菜单）
-    all_enrollments = Enrollment.query.filter_by(student_id=student.id).filter(Enrollment.grade.isnot(None)).all()
-    available_semesters = []
-    for enrollment in all_enrollments:
-        if enrollment.enrollment_date:
-            year = enrollment.enrollment_date.year
-            if enrollment.enrollment_date.month <= 6:
-                semester = f"{year}春季"
-            else:
-                semester = f"{year}秋季"
-            if semester not in available_semesters:
-                available_semesters.append(semester)
-    available_semesters.sort(reverse=True)  # 最新的学期在前
-
-    # 计算统计信息（基于搜索和过滤后的结果）
-    filtered_enrollments = query.all()
-    all_grades = [e.grade for e in filtered_enrollments if e.grade is not None]
+    # 可用学期（用于下拉菜单）由一条 GROUP BY 查询得到
+    available_semesters = get_student_semesters(student.id)
+
+    # 统计信息基于搜索和过滤后的全部结果：未筛选时读取学生汇总行，筛选时在数据库中聚合
+    filtered = bool(status_filter or semester_filter or search_query)
+    summary = get_student_stats(student.id, query if filtered else None)
     stats = {
-        'total_courses': len(all_grades),
-        'average_grade': sum(all_grades) / len(all_grades) if all_grades else 0,
-        'highest_grade': max(all_grades) if all_grades else 0,
-        'lowest_grade': min(all_grades) if all_grades else 0
+        'total_courses': summary.graded_count,
+        'average_grade': summary.avg_grade,
+        'highest_grade': summary.highest_grade,
+        'lowest_grade': summary.lowest_grade
     }
 
     return render_template('student/grades.html',
@@ -454,32 +352,83 @@ def grades():
 @student_bp.route('/api/courses/available')
 @login_required
 @student_only
+@admission_control
+@read_replica
 def api_available_courses():
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         return jsonify({'error': '未找到学生记录'}), 400
 
-    enrolled_course_ids = [e.course_id for e in Enrollment.query.filter_by(student_id=student.id).all()]
-    available_courses = Course.query.filter(~Course.id.in_(enrolled_course_ids)).all()
+    # 可选课程为反连接（没有有效选课记录的课程），不再拼接 NOT IN 参数列表
+    courses, etag = list_courses(student.id, CourseFilters.from_args(request.args, scope='available'))
+    return etag_response(etag, lambda: jsonify([course_dict(course) for course in courses]))
 
-    return jsonify([c.to_dict() for c in available_courses])
+@student_bp.route('/api/courses')
+@login_required
+@student_only
+@admission_control
+@read_replica
+def api_courses():
+    """课程浏览 API：scope=all|available|enrolled，search、department、credits 筛选，page/per_page 分页，附分面"""
+    student = get_current_student()
+    if not student:
+        return jsonify({'error': '未找到学生记录'}), 400
+
+    result = browse_courses(student.id, CourseFilters.from_args(request.args),
+                            page=request.args.get('page', 1, type=int), per_page=request.args.get('per_page', type=int))
+    return etag_response(result.etag, lambda: jsonify(result.to_dict()))
 
 @student_bp.route('/api/enrollments')
 @login_required
 @student_only
+@read_replica
 def api_enrollments():
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         return jsonify({'error': '未找到学生记录'}), 400
 
     enrollments = Enrollment.query.filter_by(student_id=student.id).all()
     return jsonify([e.to_dict() for e in enrollments])
 
+@student_bp.route('/api/transcript')
+@login_required
+@student_only
+def api_transcript():
+    """本人成绩单：各学期课程、学期 GPA、累计 GPA；scale 选择绩点刻度。
+    结果会被缓存，读主库，避免把副本上滞后的成绩存入缓存"""
+    student = get_current_student()
+    if not student:
+        return jsonify({'error': '未找到学生记录'}), 400
+
+    try:
+        return jsonify(get_transcript(student.id, request.args.get('scale')).to_dict())
+    except GPAScaleError as e:
+        return jsonify({'error': str(e)}), 400
+
+@student_bp.route('/api/grades/export')
+@login_required
+@student_only
+@read_replica
+def export_grades():
+    student = get_current_student()
+    if not student:
+        return jsonify({'error': '未找到学生记录'}), 400
+
+    # 本人成绩数据量很小，直接在请求中生成文件
+    filters = filters_from_args('student_grades', request.args)
+    filters['student_id'] = student.id
+    try:
+        return export_response('student_grades', normalize_format(request.args.get('format')), filters)
+    except ExportError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('student.grades'))
+
 @student_bp.route('/api/profile')
 @login_required
 @student_only
+@read_replica
 def api_profile():
-    student = Student.query.filter_by(email=current_user.email).first()
+    student = get_current_student()
     if not student:
         return jsonify({'error': '未找到学生记录'}), 400
 
@@ -1,11 +1,57 @@
 import os
 from datetime import timedelta
 
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes', 'on')
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///student_management.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Database connection pool（每个进程一个连接池，SQLite 以外的数据库生效）。
+    # 未设置 DB_POOL_SIZE 时，若给出 DB_MAX_CONNECTIONS（数据库允许本应用使用的连接总数），
+    # 按 WEB_CONCURRENCY 个进程平分，每个进程的池大小 + 溢出不超过分到的连接数
+    DB_POOL_SIZE = _env_int('DB_POOL_SIZE')
+    DB_MAX_OVERFLOW = _env_int('DB_MAX_OVERFLOW', 10)
+    DB_MAX_CONNECTIONS = _env_int('DB_MAX_CONNECTIONS')
+    WEB_CONCURRENCY = _env_int('WEB_CONCURRENCY', 1)
+    DB_POOL_TIMEOUT = _env_int('DB_POOL_TIMEOUT', 10)  # 池满时等待连接的秒数
+    DB_POOL_RECYCLE = _env_int('DB_POOL_RECYCLE', 1800)  # 连接使用超过该秒数后重建，需小于 MySQL wait_timeout
+    DB_POOL_PRE_PING = _env_bool('DB_POOL_PRE_PING', True)  # 取连接时先检查连接是否可用
+    DB_STATEMENT_TIMEOUT_MS = _env_int('DB_STATEMENT_TIMEOUT_MS', 0)  # 单条语句超时，0 为不限制
+    DB_POOL_SLOW_WAIT_MS = 100  # 取连接等待超过该毫秒数计入 slow_checkouts
+    # 只读副本：DATABASE_REPLICA_URLS 为逗号分隔的连接串。只读视图的查询发往延迟不超过
+    # REPLICA_MAX_LAG_SECONDS 的副本（每 REPLICA_CHECK_INTERVAL 秒检查一次）；
+    # 用户写入数据后 REPLICA_STICKY_SECONDS 秒内的请求都读主库
+    REPLICA_DATABASE_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+    REPLICA_MAX_LAG_SECONDS = _env_int('REPLICA_MAX_LAG_SECONDS', 5)
+    REPLICA_CHECK_INTERVAL = 5
+    REPLICA_STICKY_SECONDS = _env_int('REPLICA_STICKY_SECONDS', 10)
+    # SQLite 每个连接的 PRAGMA：WAL 让读写互不阻塞，busy_timeout 让写锁冲突时等待而不是立即报错
+    SQLITE_PRAGMAS = {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000}
+
+    # 选课接口准入控制：每个学生每秒 ADMISSION_RATE 次、最多连续 ADMISSION_BURST 次（超出返回 429）；
+    # 每个进程同时处理 ADMISSION_MAX_ACTIVE 个（默认等于连接池大小），最多 ADMISSION_MAX_QUEUE 个排队
+    # 等待 ADMISSION_QUEUE_TIMEOUT 秒（超出返回 503）。令牌桶存储：memory（进程内）或 'module:Class'
+    ADMISSION_CONTROL = _env_bool('ADMISSION_CONTROL', True)
+    ADMISSION_MAX_ACTIVE = _env_int('ADMISSION_MAX_ACTIVE')
+    ADMISSION_MAX_QUEUE = _env_int('ADMISSION_MAX_QUEUE', 50)
+    ADMISSION_QUEUE_TIMEOUT = 2
+    ADMISSION_RETRY_AFTER = 2
+    ADMISSION_RATE = 1
+    ADMISSION_BURST = 10
+    ADMISSION_STORE_BACKEND = os.environ.get('ADMISSION_STORE_BACKEND') or 'memory'
+    ADMISSION_BUCKETS_SIZE = 100000
+
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
     SESSION_COOKIE_SECURE = False
@@ -14,6 +60,50 @@ class Config:
 
     # Pagination
     ITEMS_PER_PAGE = 20
+    API_MAX_PAGE_SIZE = 500
+    STREAM_BATCH_SIZE = 1000  # 流式 API 每批从数据库读取的行数
+
+    # Search: auto（SQLite 用 FTS5，MySQL 用 FULLTEXT）或 like
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'
+
+    # Export: 超过该行数的导出转为后台任务，结果文件保存在 EXPORT_FOLDER（默认 instance/exports）
+    EXPORT_SYNC_MAX_ROWS = 5000
+    EXPORT_FOLDER = os.environ.get('EXPORT_FOLDER')
+
+    # Import: 每批插入的行数和单次导入的行数上限
+    IMPORT_BATCH_SIZE = 1000
+    IMPORT_MAX_ROWS = 50000
+
+    # 登录用户/学生记录的跨请求缓存：memory（进程内 LRU）、null 或 'module:Class'；TTL 为 0 时关闭
+    IDENTITY_CACHE_BACKEND = os.environ.get('IDENTITY_CACHE_BACKEND') or 'memory'
+    IDENTITY_CACHE_TTL = 60
+    IDENTITY_CACHE_SIZE = 10000
+
+    # 课程目录（课程的描述性列，不含名额计数和选课人数）的进程内缓存秒数，修改课程时立即失效；0 为不缓存
+    COURSE_CATALOG_TTL = 30
+
+    # 绩点刻度：{名称: [(最低分, 绩点), ...]}，低于最低分数线为 0；GPA_SCALE 为默认刻度。
+    # 成绩单按 (学生, 学期) 缓存 TRANSCRIPT_CACHE_TTL 秒，成绩写入时立即失效；0 为不缓存
+    GPA_SCALE = os.environ.get('GPA_SCALE') or 'standard'
+    GPA_SCALES = {
+        'standard': [(90, 4.0), (85, 3.7), (82, 3.3), (78, 3.0), (75, 2.7), (72, 2.3), (68, 2.0), (64, 1.5), (60, 1.0)],
+        'simple': [(90, 4.0), (80, 3.0), (70, 2.0), (60, 1.0)],
+    }
+    TRANSCRIPT_CACHE_TTL = 300
+    TRANSCRIPT_CACHE_SIZE = 10000
+
+    # 成绩分布：直方图分段边界（最后一段包含满分）和百分位数；结果缓存 GRADE_ANALYTICS_TTL 秒，成绩写入时立即失效，
+    # 最多缓存 GRADE_ANALYTICS_CACHE_SIZE 个课程/学期
+    GRADE_HISTOGRAM_EDGES = [0, 60, 70, 80, 90, 100]
+    GRADE_PERCENTILES = (10, 25, 50, 75, 90)
+    GRADE_ANALYTICS_TTL = 600
+    GRADE_ANALYTICS_CACHE_SIZE = 10000
+
+    # Background jobs
+    JOB_WORKERS = 2
+    JOB_RETENTION_HOURS = 24
+    JOBS_RUN_INLINE = False
+    PASSWORD_HASH_WORKERS = None  # 批量开通账户时计算密码哈希的进程数，默认等于 CPU 核数
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -25,7 +115,8 @@ class ProductionConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # 默认使用内存 SQLite；设置 TEST_DATABASE_URL 可以在 MySQL 上运行同一套测试
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///:memory:'
 
 config_by_name = {
     'development': DevelopmentConfig,
@@ -0,0 +1,42 @@
+"""link students to their login accounts with students.user_id
+
+Revision ID: 0002_student_user_link
+Revises: 0001_baseline
+Create Date: 2026-10-18 12:30:00
+
+学生与用户原来只靠邮箱字符串对应；新增 students.user_id 外键，并按邮箱回填已有的对应关系。
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_student_user_link'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_students_user_id', ['user_id'], unique=True)
+        batch_op.create_foreign_key('fk_students_user_id_users', 'users', ['user_id'], ['id'], ondelete='SET NULL')
+
+    # 回填：邮箱相同的学生角色用户即为该学生的账户（邮箱在两张表中都唯一，一个用户最多对应一个学生）
+    students = sa.table('students', sa.column('email'), sa.column('user_id'))
+    users = sa.table('users', sa.column('id'), sa.column('email'), sa.column('role'))
+    op.execute(
+        students.update()
+        .where(students.c.user_id.is_(None))
+        .values(user_id=sa.select(users.c.id).where(
+            users.c.email == students.c.email, users.c.role == 'student'
+        ).scalar_subquery())
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_students_user_id_users', type_='foreignkey')
+        batch_op.drop_index('ix_students_user_id')
+        batch_op.drop_column('user_id')
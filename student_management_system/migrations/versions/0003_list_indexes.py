@@ -0,0 +1,40 @@
+"""indexes for list page filters and sorts
+
+Revision ID: 0003_list_indexes
+Revises: 0002_student_user_link
+Create Date: 2026-10-18 14:00:00
+
+选课列表按状态筛选、成绩列表按状态/课程筛选并按成绩排序、最近选课按更新/创建时间倒序、
+用户按角色/激活状态筛选、课程按名称排序。tests/test_indexes.py 用 EXPLAIN 检查这些查询走索引。
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_list_indexes'
+down_revision = '0002_student_user_link'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_enrollments_status', 'enrollments', ['status']),
+    ('ix_enrollments_status_grade', 'enrollments', ['status', 'grade']),
+    ('ix_enrollments_course_status_grade', 'enrollments', ['course_id', 'status', 'grade']),
+    ('ix_enrollments_grade', 'enrollments', ['grade']),
+    ('ix_enrollments_updated_at', 'enrollments', ['updated_at']),
+    ('ix_enrollments_created_at', 'enrollments', ['created_at']),
+    ('ix_users_role', 'users', ['role']),
+    ('ix_users_is_active', 'users', ['is_active']),
+    ('ix_courses_course_name', 'courses', ['course_name']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,55 @@
+"""course capacity, waitlist and seat counters
+
+Revision ID: 0004_course_capacity
+Revises: 0003_list_indexes
+Create Date: 2026-10-18 16:00:00
+
+课程增加容量（max_students）、候补名单长度（waitlist_size）以及由选课服务原子维护的
+已占名额/候补人数计数；选课状态增加 waitlisted。已有课程的计数按 enrollments 回填。
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_course_capacity'
+down_revision = '0003_list_indexes'
+branch_labels = None
+depends_on = None
+
+OLD_STATUSES = sa.Enum('enrolled', 'completed', 'dropped', 'withdrawn', name='enrollment_status')
+NEW_STATUSES = sa.Enum('enrolled', 'completed', 'dropped', 'withdrawn', 'waitlisted', name='enrollment_status')
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('max_students', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('waitlist_size', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('seats_taken', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('waitlist_count', sa.Integer(), nullable=False, server_default='0'))
+
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.alter_column('status', existing_type=OLD_STATUSES, type_=NEW_STATUSES,
+                              existing_nullable=True)
+
+    # 回填：已选（含已完成）的记录占名额
+    courses = sa.table('courses', sa.column('id'), sa.column('seats_taken'))
+    enrollments = sa.table('enrollments', sa.column('course_id'), sa.column('status'))
+    op.execute(courses.update().values(seats_taken=sa.select(sa.func.count()).select_from(enrollments).where(
+        enrollments.c.course_id == courses.c.id,
+        enrollments.c.status.in_(['enrolled', 'completed'])
+    ).scalar_subquery()))
+
+
+def downgrade():
+    # 候补记录在旧版本中没有对应状态，降级前删除
+    op.execute("DELETE FROM enrollments WHERE status = 'waitlisted'")
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.alter_column('status', existing_type=NEW_STATUSES, type_=OLD_STATUSES,
+                              existing_nullable=True)
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_column('waitlist_count')
+        batch_op.drop_column('seats_taken')
+        batch_op.drop_column('waitlist_size')
+        batch_op.drop_column('max_students')
@@ -0,0 +1,82 @@
+"""terms table and enrollments.term_id
+
+Revision ID: 0005_terms
+Revises: 0004_course_capacity
+Create Date: 2026-10-18 19:00:00
+
+新增学期表（1-6 月为春季，7-12 月为秋季），选课记录增加 term_id 及按学生/学期、学期/状态/成绩的索引。
+已有选课记录按 enrollment_date 创建对应学期并回填 term_id。
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_terms'
+down_revision = '0004_course_capacity'
+branch_labels = None
+depends_on = None
+
+
+def _term_values(day):
+    if day.month <= 6:
+        return {'name': f'{day.year}春季', 'year': day.year, 'season': 'spring',
+                'start_date': date(day.year, 1, 1), 'end_date': date(day.year, 6, 30)}
+    return {'name': f'{day.year}秋季', 'year': day.year, 'season': 'fall',
+            'start_date': date(day.year, 7, 1), 'end_date': date(day.year, 12, 31)}
+
+
+def upgrade():
+    terms = op.create_table(
+        'terms',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=20), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('season', sa.Enum('spring', 'fall', name='term_season'), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+        sa.UniqueConstraint('year', 'season', name='unique_term'),
+    )
+    op.create_index('ix_terms_start_date', 'terms', ['start_date'], unique=False)
+
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('term_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_enrollments_student_term', ['student_id', 'term_id'], unique=False)
+        batch_op.create_index('ix_enrollments_term_status_grade', ['term_id', 'status', 'grade'], unique=False)
+        batch_op.create_foreign_key('fk_enrollments_term_id_terms', 'terms', ['term_id'], ['id'])
+
+    # 回填：按已有选课日期创建学期，再按日期区间写入 term_id
+    bind = op.get_bind()
+    days = [row[0] for row in bind.execute(sa.text(
+        'SELECT DISTINCT enrollment_date FROM enrollments WHERE enrollment_date IS NOT NULL'))]
+    values = {}
+    for day in days:
+        if isinstance(day, str):
+            day = date.fromisoformat(day[:10])
+        term = _term_values(day)
+        values[term['name']] = term
+    if values:
+        op.bulk_insert(terms, sorted(values.values(), key=lambda term: term['start_date']))
+
+    enrollments = sa.table('enrollments', sa.column('enrollment_date'), sa.column('term_id'))
+    term_table = sa.table('terms', sa.column('id'), sa.column('start_date'), sa.column('end_date'))
+    op.execute(enrollments.update().values(term_id=sa.select(term_table.c.id).where(
+        term_table.c.start_date <= enrollments.c.enrollment_date,
+        term_table.c.end_date >= enrollments.c.enrollment_date
+    ).scalar_subquery()))
+
+
+def downgrade():
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_enrollments_term_id_terms', type_='foreignkey')
+        batch_op.drop_index('ix_enrollments_term_status_grade')
+        batch_op.drop_index('ix_enrollments_student_term')
+        batch_op.drop_column('term_id')
+
+    op.drop_index('ix_terms_start_date', table_name='terms')
+    op.drop_table('terms')
+    sa.Enum(name='term_season').drop(op.get_bind(), checkfirst=True)
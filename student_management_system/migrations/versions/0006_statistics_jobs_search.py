@@ -0,0 +1,140 @@
+"""statistics, background job and search index tables
+
+Revision ID: 0006_statistics_jobs_search
+Revises: 0005_terms
+Create Date: 2026-10-18 21:00:00
+
+汇总表（student_statistics、course_statistics）、后台任务表 background_jobs
+和全文搜索索引表。由 db.create_all() 建表、stamp 到 0001_baseline 的旧数据库没有这些表。
+汇总表在这里用 INSERT ... SELECT ... GROUP BY 从 enrollments 回填（只依赖本迁移时的表结构，不引用应用代码）。
+搜索索引的分词在应用中完成，这里只建空的索引表，升级后执行 `flask --app run rebuild-search` 为已有数据建立索引。
+"""
+from datetime import datetime
+import sqlite3
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_statistics_jobs_search'
+down_revision = '0005_terms'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['student_statistics', 'course_statistics', 'background_jobs']
+SEARCH_TABLES = ['users_fts', 'students_fts', 'courses_fts']
+
+enrollments = sa.table('enrollments', sa.column('id'), sa.column('student_id'), sa.column('course_id'),
+                       sa.column('status'), sa.column('grade'))
+courses = sa.table('courses', sa.column('id'), sa.column('credits'))
+
+
+def _count_if(condition):
+    return sa.func.coalesce(sa.func.sum(sa.case((condition, 1), else_=0)), 0)
+
+
+def _sum_if(condition, value):
+    return sa.func.coalesce(sa.func.sum(sa.case((condition, value), else_=None)), 0)
+
+
+def _backfill_statistics(student_statistics, course_statistics):
+    now = sa.literal(datetime.utcnow(), sa.DateTime())
+    e = enrollments.c
+    completed = e.status == 'completed'
+    completed_graded = sa.and_(completed, e.grade.isnot(None))
+    op.execute(student_statistics.insert().from_select([c.name for c in student_statistics.c], sa.select(
+        e.student_id, sa.func.count(e.id), _count_if(e.status == 'enrolled'), _count_if(completed),
+        sa.func.count(e.grade), sa.func.coalesce(sa.func.sum(e.grade), 0), sa.func.min(e.grade), sa.func.max(e.grade),
+        _count_if(completed_graded), _sum_if(completed_graded, e.grade), _sum_if(completed, courses.c.credits), now
+    ).select_from(enrollments.join(courses, courses.c.id == e.course_id)).group_by(e.student_id)))
+    op.execute(course_statistics.insert().from_select([c.name for c in course_statistics.c], sa.select(
+        e.course_id, sa.func.count(e.id), _count_if(e.status == 'enrolled'), _count_if(completed),
+        sa.func.count(e.grade), sa.func.coalesce(sa.func.sum(e.grade), 0), sa.func.min(e.grade), sa.func.max(e.grade),
+        now
+    ).group_by(e.course_id)))
+
+
+def _fts5_available():
+    try:
+        connection = sqlite3.connect(':memory:')
+        connection.execute('CREATE VIRTUAL TABLE t USING fts5(content)')
+        connection.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _create_search_tables(bind):
+    """SQLite 用 FTS5 虚拟表，MySQL 用带 ngram 解析器的 FULLTEXT 索引，其他数据库不建索引表（搜索退回 LIKE）"""
+    for table in SEARCH_TABLES:
+        if bind.dialect.name == 'sqlite' and _fts5_available():
+            op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(content)")
+        elif bind.dialect.name == 'mysql':
+            op.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "id INT NOT NULL PRIMARY KEY, content TEXT NOT NULL, "
+                "FULLTEXT KEY ft_content (content) WITH PARSER ngram"
+                ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+            )
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    student_statistics = op.create_table('student_statistics',
+    sa.Column('student_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total_count', sa.Integer(), nullable=False),
+    sa.Column('enrolled_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('graded_count', sa.Integer(), nullable=False),
+    sa.Column('grade_sum', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('grade_min', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('grade_max', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('completed_graded_count', sa.Integer(), nullable=False),
+    sa.Column('completed_grade_sum', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('completed_credits', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('student_id')
+    )
+    course_statistics = op.create_table('course_statistics',
+    sa.Column('course_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total_count', sa.Integer(), nullable=False),
+    sa.Column('enrolled_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('graded_count', sa.Integer(), nullable=False),
+    sa.Column('grade_sum', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('grade_min', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('grade_max', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+    op.create_table('background_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'running', 'completed', 'failed', name='job_status'), nullable=False),
+    sa.Column('progress', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('message', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('result_path', sa.String(length=500), nullable=True),
+    sa.Column('result_name', sa.String(length=255), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    _backfill_statistics(student_statistics, course_statistics)
+    _create_search_tables(bind)
+
+
+def downgrade():
+    for table in SEARCH_TABLES:
+        op.execute(f"DROP TABLE IF EXISTS {table}")
+
+    for table in reversed(TABLES):
+        op.drop_table(table)
+    sa.Enum(name='job_status').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,34 @@
+"""enrollments.updated_at NOT NULL
+
+Revision ID: 0007_enrollment_updated_at
+Revises: 0006_statistics_jobs_search
+Create Date: 2026-10-18 21:30:00
+
+最近更新列表按 (updated_at, id) 做键集分页，updated_at 为 NULL 的行不满足游标的比较条件，翻页时会被跳过。
+先用 created_at（也为空时用当前时间）回填，再加 NOT NULL 约束。
+当前时间作为 DateTime 参数绑定，SQLite 中存储格式与 ORM 写入的值一致，游标比较不会错位。
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_enrollment_updated_at'
+down_revision = '0006_statistics_jobs_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    enrollments = sa.table('enrollments', sa.column('created_at', sa.DateTime()), sa.column('updated_at', sa.DateTime()))
+    op.execute(enrollments.update().where(enrollments.c.updated_at.is_(None)).values(
+        updated_at=sa.func.coalesce(enrollments.c.created_at, sa.literal(datetime.utcnow(), sa.DateTime()))))
+
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=True)
@@ -17,40 +17,19 @@ def install_requirements():
     return True
 
 def create_initial_data():
-    """Create initial database with default admin"""
+    """Apply migrations and create the default admin"""
+    from flask_migrate import upgrade
     from app import create_app
-    from app.models.user import User
-    from app.models.admin import Administrator
-    from app import db
+    from app.services.bootstrap import seed_admin
 
     app = create_app('development')
     with app.app_context():
-        # Create tables
-        db.create_all()
+        # Create or upgrade tables
+        upgrade()
 
-        # Check if admin exists
-        admin_user = User.query.filter_by(username='admin').first()
-        if not admin_user:
-            # Create default admin
-            admin_user = User(
-                username='admin',
-                email='admin@example.com',
-                full_name='System Administrator',
-                role='admin',
-                is_active=True
-            )
-            admin_user.set_password('admin123')
-            db.session.add(admin_user)
-            db.session.commit()
-
-            # Create admin record
-            admin = Administrator(
-                user_id=admin_user.id,
-                admin_code='ADMIN001',
-                department='System Administration'
-            )
-            db.session.add(admin)
-            db.session.commit()
+        # Create default admin if not exists
+        admin_user, created = seed_admin()
+        if created:
             print("✓ Default admin account created (admin/admin123)")
         else:
             print("✓ Database already initialized")
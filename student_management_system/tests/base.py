@@ -0,0 +1,117 @@
+import unittest
+from contextlib import contextmanager
+from datetime import date
+from app import create_app, db
+from app.services.bootstrap import seed_admin
+from app.models.user import User
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+
+
+class QueryCounter:
+    """记录执行过的 SQL 语句"""
+
+    def __init__(self):
+        self.statements = []
+        self.parameters = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """在 with 块内统计发往数据库的 SQL 语句条数"""
+    engine = engine or db.engine
+    counter = QueryCounter()
+    db.event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        db.event.remove(engine, 'before_cursor_execute', counter)
+
+
+class AppTestCase(unittest.TestCase):
+    """基于内存数据库和 Flask 测试客户端的测试基类"""
+
+    config_name = 'testing'
+
+    def setUp(self):
+        self.app = create_app(self.config_name)
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.client = self.app.test_client()
+        # 内存数据库每次新建：直接按模型建表（迁移本身由 test_migrations 检查），再写入默认管理员
+        db.create_all()
+        seed_admin()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    @contextmanager
+    def outside_context(self):
+        """暂时退出测试的应用上下文，让请求像线上一样使用独立的上下文和会话"""
+        db.session.remove()
+        self.ctx.pop()
+        try:
+            yield
+        finally:
+            self.ctx.push()
+
+    def login(self, username='admin', password='admin123'):
+        return self.client.post('/auth/login', data={'username': username, 'password': password})
+
+    def create_student(self, index, with_user=False, password='student123'):
+        student = Student(
+            student_id=f'S{index:05d}',
+            first_name=f'First{index}',
+            last_name=f'Last{index}',
+            email=f'student{index}@example.com',
+            major='Computer Science',
+            enrollment_year=2024
+        )
+        db.session.add(student)
+        if with_user:
+            user = User(
+                username=f'student{index}',
+                email=student.email,
+                full_name=student.full_name,
+                role='student'
+            )
+            user.set_password(password)
+            student.user = user
+        db.session.commit()
+        return student
+
+    def create_course(self, index, credits=3):
+        course = Course(
+            course_code=f'C{index:04d}',
+            course_name=f'Course {index}',
+            credits=credits,
+            department='Computer Science',
+            instructor=f'Instructor {index}'
+        )
+        db.session.add(course)
+        db.session.commit()
+        return course
+
+    def enroll(self, student, course, grade=None, status='enrolled', enrollment_date=None):
+        enrollment = Enrollment(
+            student_id=student.id,
+            course_id=course.id,
+            status=status,
+            grade=grade,
+            enrollment_date=enrollment_date or date(2024, 3, 1)
+        )
+        db.session.add(enrollment)
+        db.session.commit()
+        return enrollment
@@ -0,0 +1,114 @@
+import unittest
+from collections import namedtuple
+from flask_bcrypt import check_password_hash
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.user import User
+from app.models.student import Student
+from app.models.job import BackgroundJob
+from app.services.accounts import plan_accounts, hash_passwords
+from app.services.search import search
+
+StudentRow = namedtuple('StudentRow', 'id student_id email first_name last_name phone')
+
+
+class PlanAccountsTest(unittest.TestCase):
+
+    def test_usernames_are_allocated_without_collisions(self):
+        students = [
+            StudentRow(1, 'S1', 'a@example.com', 'Li', 'Lei', None),      # 学号可用
+            StudentRow(2, 'S2', 'b@example.com', 'Han', 'Mei', '123'),    # 学号被占用 -> 邮箱前缀
+            StudentRow(3, 'S3', 'taken@example.com', 'Li', 'Lei', None),  # 学号、前缀都被占用 -> 姓名
+            StudentRow(4, 'S4', 'old@example.com', 'X', 'Y', None),       # 邮箱已被占用，跳过
+            StudentRow(5, 'S5', 'taken@x.org', 'Li', 'Lei', None),        # 姓名也已分配 -> 加后缀
+            StudentRow(6, 'S6', 'taken@y.org', 'Li', 'Lei', None),
+        ]
+        existing_usernames = {'S2', 'S3', 'S5', 'S6', 'taken', 'lilei1'}
+        accounts, skipped = plan_accounts(students, existing_usernames, {'old@example.com'})
+
+        self.assertEqual(skipped, 1)
+        self.assertEqual([a['username'] for a in accounts], ['S1', 'b', 'lilei', 'lilei2', 'lilei3'])
+        self.assertEqual(accounts[1]['phone'], '123')
+        self.assertEqual(accounts[0]['password'], 'S1')
+        self.assertEqual(accounts[0]['full_name'], 'Li Lei')
+        self.assertEqual(accounts[4]['student_pk'], 6)
+
+    def test_hash_passwords_in_process_pool(self):
+        hashes = hash_passwords(['alpha1', 'beta22', 'gamma3'], workers=2)
+        self.assertEqual(len(hashes), 3)
+        self.assertTrue(check_password_hash(hashes[1], 'beta22'))
+        self.assertFalse(check_password_hash(hashes[1], 'alpha1'))
+
+
+class ProvisionAccountsTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app.config['JOBS_RUN_INLINE'] = True
+        self.app.config['PASSWORD_HASH_WORKERS'] = 0
+        self.create_student(0, with_user=True)
+
+    def provision(self):
+        return self.client.post('/admin/students/create-user-accounts', json={})
+
+    def add_user(self, username, email, role='student'):
+        user = User(username=username, email=email, full_name=username, role=role)
+        user.password_hash = User.query.filter_by(username='admin').one().password_hash
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+    def test_provisioning_runs_as_job(self):
+        students = [self.create_student(i) for i in range(1, 6)]
+        student_pks = [student.id for student in students]
+        # 学生 4 已有同邮箱的学生账户但未关联；学生 5 的邮箱被管理员账户占用
+        existing_id = self.add_user('existing4', 'student4@example.com')
+        self.add_user('admin5', 'student5@example.com', role='admin')
+        self.login()
+
+        response = self.provision()
+        self.assertEqual(response.status_code, 202)
+        status = self.client.get(response.get_json()['status_url']).get_json()
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual(status['total'], 3)
+        self.assertIn('成功为 3 个学生创建用户账户，关联 1 个已有账户，1 个学生的邮箱已被其他用户使用', status['message'])
+
+        user = User.query.filter_by(email='student2@example.com').one()
+        self.assertEqual(user.username, 'S00002')
+        self.assertEqual(user.role, 'student')
+        self.assertTrue(user.check_password('S00002'))
+        self.assertEqual(user.student.id, student_pks[1])
+        self.assertEqual(db.session.get(Student, student_pks[3]).user_id, existing_id)
+        self.assertIsNone(db.session.get(Student, student_pks[4]).user_id)
+        self.assertEqual([u.username for u, _ in search('user', 'S00003')], ['S00003'])
+
+        # 再次执行时只剩无法创建的学生
+        response = self.provision()
+        status = self.client.get(response.get_json()['status_url']).get_json()
+        self.assertIn('成功为 0 个学生创建用户账户，关联 0 个已有账户，1 个学生', status['message'])
+
+    def test_query_count_does_not_grow_with_students(self):
+        self.login()
+        counts = []
+        for start, count in ((1, 2), (3, 6)):
+            for i in range(start, start + count):
+                self.create_student(i)
+            with count_queries() as counter:
+                self.provision()
+            # 进度写入按时间节流，条数取决于哈希耗时，不计入
+            counts.append(len([s for s in counter.statements if 'background_jobs' not in s]))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(User.query.filter_by(role='student').count(), 9)
+        self.assertEqual(Student.query.filter(Student.user_id.is_(None)).count(), 0)
+
+    def test_form_submission_redirects_to_job_page(self):
+        self.login()
+        response = self.client.post('/admin/students/create-user-accounts')
+        self.assertEqual(response.status_code, 302)
+        job = BackgroundJob.query.one()
+        self.assertIn(f'/admin/jobs/{job.id}', response.headers['Location'])
+        self.assertEqual(self.client.get(f'/admin/jobs/{job.id}').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
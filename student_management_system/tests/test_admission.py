@@ -0,0 +1,120 @@
+import threading
+import time
+import unittest
+from app.services.admission import MemoryTokenBucketStore, AdmissionQueue, Admission, get_admission
+from tests.base import AppTestCase
+
+
+class FakeApp:
+    config = {'ADMISSION_BUCKETS_SIZE': 2}
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.store = MemoryTokenBucketStore(FakeApp(), clock=lambda: self.now)
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.store.take('a', 1, 2) for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(self.store.take('a', 1, 2), 1.0)
+        self.now = 0.5
+        self.assertAlmostEqual(self.store.take('a', 1, 2), 0.5)
+        self.now = 1.0
+        self.assertEqual(self.store.take('a', 1, 2), 0)
+        # 其他学生的桶互不影响
+        self.assertEqual(self.store.take('b', 1, 2), 0)
+
+    def test_least_recently_used_buckets_are_dropped(self):
+        for key in ('a', 'b', 'c'):
+            self.store.take(key, 1, 1)
+        self.assertEqual(len(self.store), 2)
+        # 被丢弃的桶重新从满桶开始
+        self.assertEqual(self.store.take('a', 1, 1), 0)
+
+
+class AdmissionQueueTest(unittest.TestCase):
+
+    def test_rejects_when_queue_is_full(self):
+        queue = AdmissionQueue(max_active=1, max_queue=0, timeout=1)
+        self.assertIsNone(queue.acquire())
+        self.assertEqual(queue.acquire(), 'queue_full')
+        queue.release()
+        self.assertIsNone(queue.acquire())
+
+    def test_waiting_request_times_out(self):
+        queue = AdmissionQueue(max_active=1, max_queue=1, timeout=0.05)
+        queue.acquire()
+        self.assertEqual(queue.acquire(), 'timeout')
+        self.assertEqual(queue.to_dict()['rejected_timeout'], 1)
+
+    def test_waiting_request_is_admitted_on_release(self):
+        queue = AdmissionQueue(max_active=1, max_queue=5, timeout=5)
+        queue.acquire()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(queue.acquire()))
+        waiter.start()
+        while queue.queued == 0:
+            time.sleep(0.001)
+        queue.release()
+        waiter.join()
+        self.assertEqual(results, [None])
+        status = queue.to_dict()
+        self.assertEqual((status['active'], status['queued'], status['peak_queued'], status['admitted']), (1, 0, 1, 2))
+
+
+class AdmissionConfigTest(AppTestCase):
+
+    def test_rate_and_burst_must_be_positive(self):
+        for key, value in (('ADMISSION_RATE', 0), ('ADMISSION_RATE', -1), ('ADMISSION_BURST', 0)):
+            with self.subTest(key=key, value=value):
+                self.app.config[key] = value
+                with self.assertRaises(ValueError):
+                    Admission(self.app)
+                self.app.config[key] = 1
+
+
+class AdmissionControlViewTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.course = self.create_course(1)
+        self.create_student(1, with_user=True)
+        self.admission = get_admission()
+        self.admission.burst = 2
+        self.login('student1', 'student123')
+
+    def test_student_is_rate_limited(self):
+        url = f'/student/courses/{self.course.id}/enroll'
+        self.assertEqual(self.client.post(url, json={}).status_code, 200)
+        self.assertEqual(self.client.post(url, json={}).status_code, 409)
+        response = self.client.post(url, json={})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(response.get_json()['code'], 'rate_limited')
+
+    def test_overload_is_shed_with_503(self):
+        self.admission.burst = 10
+        queue = self.admission.queue
+        queue.max_queue = 0
+        queue.active = queue.max_active
+        response = self.client.get('/student/courses')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertIn('当前选课人数较多', response.get_data(as_text=True))
+        response = self.client.post(f'/student/courses/{self.course.id}/enroll', json={})
+        self.assertEqual((response.status_code, response.get_json()['code']), (503, 'overloaded'))
+
+        queue.active = 0
+        self.assertEqual(self.client.get('/student/courses').status_code, 200)
+        self.assertEqual(queue.active, 0)
+
+        self.client.get('/auth/logout')
+        self.login()
+        metrics = self.client.get('/admin/api/metrics/admission').get_json()
+        self.assertTrue(metrics['enabled'])
+        self.assertEqual((metrics['rejected_queue_full'], metrics['admitted']), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
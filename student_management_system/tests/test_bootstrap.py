@@ -0,0 +1,39 @@
+import unittest
+from sqlalchemy.engine import Engine
+from app import create_app, db
+from app.models.user import User
+from app.models.admin import Administrator
+from tests.base import count_queries
+
+
+class BootstrapTest(unittest.TestCase):
+    """create_app 不访问数据库；表结构和默认管理员由命令行创建"""
+
+    def test_create_app_does_not_touch_database(self):
+        with count_queries(Engine) as counter:
+            app = create_app('testing')
+            with app.app_context():
+                db.engine
+        self.assertEqual(counter.statements, [])
+
+    def test_seed_admin_command_is_idempotent(self):
+        app = create_app('testing')
+        with app.app_context():
+            db.create_all()
+            runner = app.test_cli_runner()
+
+            result = runner.invoke(args=['seed-admin', '--password', 'secret99'])
+            self.assertIn('已创建管理员账户：admin', result.output)
+            result = runner.invoke(args=['seed-admin'])
+            self.assertIn('管理员账户已存在：admin', result.output)
+
+            admin = User.query.filter_by(username='admin').one()
+            self.assertEqual(admin.role, 'admin')
+            self.assertTrue(admin.check_password('secret99'))
+            self.assertEqual(Administrator.query.filter_by(user_id=admin.id).count(), 1)
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
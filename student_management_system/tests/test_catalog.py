@@ -0,0 +1,73 @@
+import unittest
+from app import db
+from app.models.course import Course
+from app.services.catalog import get_catalog, invalidate_catalog
+from app.services.enrollments import enroll_student
+from tests.base import AppTestCase, count_queries
+
+
+class CourseCatalogTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.courses = [self.create_course(i) for i in range(3)]
+        self.students = [self.create_student(i) for i in range(2)]
+        self.enroll(self.students[0], self.courses[0])
+        self.enroll(self.students[1], self.courses[0], status='completed', grade=90)
+        self.cache = self.app.extensions['course_catalog']
+
+    def test_loaded_once_without_counts(self):
+        with count_queries() as counter:
+            catalog = get_catalog()
+            self.assertIs(get_catalog(), catalog)
+        self.assertEqual(counter.count, 1)
+        self.assertEqual([c.course_code for c in catalog.courses], ['C0000', 'C0001', 'C0002'])
+        self.assertEqual(catalog.get(self.courses[1].id).course_name, 'Course 1')
+        # 名额计数每次选课都会变化，不放进缓存
+        self.assertFalse(hasattr(catalog.get(self.courses[0].id), 'seats_taken'))
+
+    def test_only_course_writes_invalidate(self):
+        catalog = get_catalog()
+        self.enroll(self.students[0], self.courses[1])
+        enroll_student(self.students[1].id, self.courses[2].id)
+        self.assertIs(get_catalog(), catalog)
+        self.assertEqual(self.cache.version, catalog.version)
+
+        course = db.session.get(Course, self.courses[2].id)
+        course.course_name = 'Renamed'
+        db.session.commit()
+        self.assertEqual(get_catalog().get(course.id).course_name, 'Renamed')
+
+    def test_explicit_invalidate(self):
+        catalog = get_catalog()
+        invalidate_catalog()
+        db.session.rollback()
+        self.assertIsNot(get_catalog(), catalog)
+
+    def test_zero_ttl_disables_cache(self):
+        self.cache.ttl = 0
+        loads = self.cache.loads
+        get_catalog()
+        get_catalog()
+        self.assertEqual(self.cache.loads, loads + 2)
+
+    def test_views_do_not_count_per_course(self):
+        self.login()
+        self.client.get('/admin/api/courses?limit=50')
+        counts = []
+        for i in range(3, 8):
+            self.create_course(i)
+            get_catalog()
+            with count_queries() as counter:
+                response = self.client.get('/admin/api/courses?limit=50')
+            counts.append(counter.count)
+            with count_queries() as counter:
+                self.assertEqual(self.client.get('/admin/enrollments/create').status_code, 200)
+            # 目录已缓存，表单不再查询课程表
+            self.assertFalse([s for s in counter.statements if 'FROM courses' in s])
+        self.assertEqual(len(response.get_json()['items']), 8)
+        self.assertEqual(response.get_json()['items'][0]['enrollment_count'], 2)
+        self.assertEqual(len(set(counts)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from app import db
+from app.services.course_browse import CourseFilters, browse_courses, list_courses
+from tests.base import AppTestCase, count_queries
+
+
+class CourseBrowseTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.courses = []
+        for i, (department, credits) in enumerate([('Math', 3), ('Math', 4), ('Physics', 3), ('Physics', 3),
+                                                    ('History', 2)]):
+            course = self.create_course(i, credits=credits)
+            course.department = department
+            self.courses.append(course)
+        db.session.commit()
+        self.student = self.create_student(1, with_user=True)
+        self.enroll(self.student, self.courses[2])
+        self.enroll(self.student, self.courses[4], status='completed', grade=80)
+        # 退过课的课程仍然可选
+        self.enroll(self.student, self.courses[0], status='dropped')
+        self.student_id = self.student.id
+
+    def browse(self, page=1, per_page=None, **filters):
+        return browse_courses(self.student_id, CourseFilters(**filters), page=page, per_page=per_page)
+
+    def test_enrolled_and_available_in_one_query(self):
+        with count_queries() as counter:
+            result = self.browse()
+        # 一条查询取课程（含已选标记、人数、总数），一条查询取分面
+        self.assertEqual(counter.count, 2)
+        self.assertEqual([c.course_code for c in result.enrolled], ['C0002', 'C0004'])
+        self.assertEqual([c.course_code for c in result.available], ['C0000', 'C0001', 'C0003'])
+        self.assertEqual(result.total, 5)
+        self.assertEqual(result.items[0].enrollment_count, 1)
+        self.assertEqual(result.items[0].enrollment_status, 'enrolled')
+
+    def test_scope_facets_and_pagination(self):
+        result = self.browse(scope='available', department='Physics')
+        self.assertEqual([c.course_code for c in result.items], ['C0003'])
+        self.assertEqual(result.facets['department'],
+                         [{'value': 'Math', 'count': 2}, {'value': 'Physics', 'count': 1}])
+        self.assertEqual(result.facets['credits'], [{'value': 3, 'count': 1}])
+
+        result = self.browse(credits=3)
+        self.assertEqual(result.facets['department'],
+                         [{'value': 'Math', 'count': 1}, {'value': 'Physics', 'count': 2}])
+
+        result = self.browse(page=2, per_page=2)
+        self.assertEqual((result.total, result.pages), (5, 3))
+        self.assertEqual((result.prev_num, result.next_num, list(result.iter_pages())), (1, 3, [1, 2, 3]))
+        self.assertEqual([c.course_code for c in result.items], ['C0000', 'C0001'])
+        self.assertEqual(self.browse(page=9, per_page=2).total, 5)
+        self.assertEqual((self.browse(page=0, per_page=-1).page, self.browse(per_page=-1).per_page), (1, 20))
+
+        courses, _ = list_courses(self.student_id, CourseFilters(scope='enrolled'))
+        self.assertEqual(len(courses), 2)
+
+    def test_api_and_page_support_etag(self):
+        self.login('student1', 'student123')
+        response = self.client.get('/student/api/courses?per_page=2')
+        data = response.get_json()
+        self.assertEqual((data['total'], data['pages'], len(data['items'])), (5, 3, 2))
+        self.assertEqual(data['items'][0]['enrollment_status'], 'enrolled')
+        etag = response.headers['ETag']
+        self.assertIn('private', response.headers['Cache-Control'])
+
+        response = self.client.get('/student/api/courses?per_page=2', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        available = self.client.get('/student/api/courses/available').get_json()
+        self.assertEqual([c['course_code'] for c in available], ['C0000', 'C0001', 'C0003'])
+
+        page = self.client.get('/student/courses?per_page=2&page=2')
+        self.assertIn('page=3', page.get_data(as_text=True))
+        page = self.client.get('/student/courses')
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(self.client.get('/student/courses', headers={'If-None-Match': page.headers['ETag']})
+                         .status_code, 304)
+
+        # 选课后内容变化，ETag 随之变化
+        self.client.post(f'/student/courses/{self.courses[1].id}/enroll', json={})
+        response = self.client.get('/student/api/courses?per_page=2', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_search(self):
+        self.courses[3].course_name = 'Quantum Physics'
+        db.session.commit()
+        self.login('student1', 'student123')
+        text = self.client.get('/student/courses?search=Quantum').get_data(as_text=True)
+        self.assertIn('C0003', text)
+        self.assertNotIn('C0001', text)
+        self.assertEqual([c.course_code for c in self.browse(search='Quantum').items], ['C0003'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from datetime import date
+from tests.base import AppTestCase
+from app import db
+from app.models.user import User
+from app.models.enrollment import Enrollment
+from app.services.filters import student_grade_query
+from app.services.statistics import get_dashboard_stats, get_student_stats, get_student_semesters
+
+
+class DashboardStatsTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        students = [self.create_student(i) for i in range(3)]
+        courses = [self.create_course(i) for i in range(2)]
+        self.enroll(students[0], courses[0], grade=90, status='completed')
+        self.enroll(students[1], courses[0], grade=70, status='completed')
+        self.enroll(students[2], courses[1])
+        User.query.filter_by(username='admin').first().is_active = False
+        db.session.commit()
+
+    def test_aggregates(self):
+        stats = get_dashboard_stats()
+        self.assertEqual(stats.total_users, 1)
+        self.assertEqual(stats.active_users, 0)
+        self.assertEqual(stats.inactive_users, 1)
+        self.assertEqual(stats.total_students, 3)
+        self.assertEqual(stats.total_courses, 2)
+        self.assertEqual(stats.total_enrollments, 3)
+        self.assertEqual(stats.completed_courses, 2)
+        self.assertEqual(stats.total_grades, 2)
+        self.assertAlmostEqual(stats.avg_grade, 80.0)
+        self.assertEqual(stats.highest_grade, 90.0)
+        self.assertEqual(stats.lowest_grade, 70.0)
+
+    def test_empty_database(self):
+        for enrollment in Enrollment.query.all():
+            db.session.delete(enrollment)
+        db.session.commit()
+        stats = get_dashboard_stats()
+        self.assertEqual(stats.total_enrollments, 0)
+        self.assertEqual(stats.avg_grade, 0.0)
+        self.assertEqual(stats.highest_grade, 0.0)
+
+    def test_dashboard_and_json_endpoint(self):
+        User.query.filter_by(username='admin').first().is_active = True
+        db.session.commit()
+        self.login()
+        self.assertEqual(self.client.get('/admin/dashboard').status_code, 200)
+        data = self.client.get('/admin/api/dashboard/stats').get_json()
+        self.assertEqual(data['total_enrollments'], 3)
+        self.assertAlmostEqual(data['avg_grade'], 80.0)
+
+
+class StudentStatsTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = self.create_student(0, with_user=True)
+        courses = [self.create_course(i, credits=i + 1) for i in range(4)]
+        self.enroll(self.student, courses[0], grade=90, status='completed', enrollment_date=date(2023, 9, 1))
+        self.enroll(self.student, courses[1], grade=60, status='completed', enrollment_date=date(2024, 3, 1))
+        self.enroll(self.student, courses[2], grade=75, enrollment_date=date(2024, 10, 1))
+        self.enroll(self.student, courses[3], enrollment_date=date(2024, 10, 1))
+        self.student_id = self.student.id
+
+    def test_summary_and_aggregate_agree(self):
+        query = Enrollment.query.filter_by(student_id=self.student_id).join(Enrollment.course)
+        for stats in (get_student_stats(self.student_id), get_student_stats(self.student_id, query)):
+            self.assertEqual(stats.total_count, 4)
+            self.assertEqual(stats.enrolled_count, 2)
+            self.assertEqual(stats.completed_count, 2)
+            self.assertEqual(stats.graded_count, 3)
+            self.assertAlmostEqual(stats.avg_grade, 75.0)
+            self.assertEqual(stats.highest_grade, 90.0)
+            self.assertEqual(stats.lowest_grade, 60.0)
+            self.assertAlmostEqual(stats.completed_avg_grade, 75.0)
+            self.assertEqual(stats.completed_credits, 3)
+
+    def test_filtered_aggregate(self):
+        stats = get_student_stats(self.student_id, student_grade_query(self.student_id, semester='2024秋季'))
+        self.assertEqual(stats.to_dict()['graded_count'], 1)
+        self.assertEqual(stats.highest_grade, 75.0)
+        self.assertEqual(stats.completed_count, 0)
+        self.assertEqual(stats.completed_avg_grade, 0.0)
+
+        empty = get_student_stats(self.student_id, student_grade_query(self.student_id, status='dropped'))
+        self.assertEqual(empty.total_count, 0)
+        self.assertEqual(empty.avg_grade, 0.0)
+
+    def test_semesters(self):
+        self.assertEqual(get_student_semesters(self.student_id), ['2024秋季', '2024春季', '2023秋季'])
+
+    def test_filtered_pages(self):
+        self.login('student0', 'student123')
+        response = self.client.get('/student/grades?status=completed')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('2023秋季', response.get_data(as_text=True))
+        response = self.client.get('/student/enrollments?status=completed')
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
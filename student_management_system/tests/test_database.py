@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import create_engine, exc
+from app import create_app, db
+from app.services.database import (InstrumentedQueuePool, engine_options, pool_size_for_worker,
+                                   pool_status, configure_engine, _session_settings)
+from config.config import TestingConfig, config_by_name
+from tests.base import AppTestCase
+
+MYSQL_URI = 'mysql+pymysql://user:password@db/student_management'
+
+
+class EngineOptionsTest(unittest.TestCase):
+
+    def test_pool_size_split_between_workers(self):
+        self.assertEqual(pool_size_for_worker({'DB_POOL_SIZE': 8, 'DB_MAX_OVERFLOW': 4}), (8, 4))
+        self.assertEqual(pool_size_for_worker({'DB_MAX_OVERFLOW': 10}), (5, 10))
+        # 100 个连接分给 8 个进程，每个进程 12 个：池 2 + 溢出 10
+        self.assertEqual(pool_size_for_worker({'DB_MAX_CONNECTIONS': 100, 'WEB_CONCURRENCY': 8,
+                                               'DB_MAX_OVERFLOW': 10}), (2, 10))
+        self.assertEqual(pool_size_for_worker({'DB_MAX_CONNECTIONS': 10, 'WEB_CONCURRENCY': 4,
+                                               'DB_MAX_OVERFLOW': 10}), (1, 1))
+
+    def test_server_database_gets_pool_options(self):
+        options = engine_options({'DB_POOL_RECYCLE': 600, 'SQLALCHEMY_ENGINE_OPTIONS': {'pool_timeout': 3}},
+                                 MYSQL_URI)
+        self.assertIs(options['poolclass'], InstrumentedQueuePool)
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(options['pool_recycle'], 600)
+        self.assertEqual(options['pool_timeout'], 3)
+
+    def test_sqlite_memory_keeps_default_pool(self):
+        self.assertEqual(engine_options({}, 'sqlite:///:memory:'), {})
+        self.assertIs(engine_options({}, 'sqlite:///app.db')['poolclass'], InstrumentedQueuePool)
+
+    def test_statement_timeout_per_dialect(self):
+        config = {'DB_STATEMENT_TIMEOUT_MS': 5000}
+        self.assertEqual(_session_settings('mysql', config), ['SET SESSION max_execution_time = 5000'])
+        self.assertEqual(_session_settings('postgresql', config), ['SET statement_timeout = 5000'])
+        self.assertEqual(_session_settings('mysql', {}), [])
+
+
+class PoolMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'pool.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_waits_and_timeouts_are_recorded(self):
+        engine = create_engine('sqlite:///' + self.path, poolclass=InstrumentedQueuePool,
+                               pool_size=1, max_overflow=0, pool_timeout=0.05)
+        configure_engine(engine, {'SQLITE_PRAGMAS': {'journal_mode': 'WAL'}})
+        with engine.connect() as connection:
+            self.assertEqual(connection.exec_driver_sql('PRAGMA journal_mode').scalar(), 'wal')
+            self.assertEqual(pool_status(engine)['checked_out'], 1)
+            with self.assertRaises(exc.TimeoutError):
+                engine.connect()
+
+        status = pool_status(engine)
+        self.assertEqual(status['checked_out'], 0)
+        self.assertEqual(status['checkouts'], 1)
+        self.assertEqual(status['timeouts'], 1)
+        self.assertGreaterEqual(status['wait_max_ms'], 50)
+        # dispose 重建连接池后统计保留
+        engine.dispose()
+        self.assertEqual(pool_status(engine)['timeouts'], 1)
+        engine.dispose()
+
+    def test_app_applies_sqlite_pragmas(self):
+        config_by_name['pool_test'] = type('PoolTestConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + self.path
+        })
+        try:
+            app = create_app('pool_test')
+            with app.app_context():
+                with db.engine.connect() as connection:
+                    self.assertEqual(connection.exec_driver_sql('PRAGMA journal_mode').scalar(), 'wal')
+                    self.assertEqual(connection.exec_driver_sql('PRAGMA busy_timeout').scalar(), 5000)
+                self.assertIsInstance(db.engine.pool, InstrumentedQueuePool)
+                db.engine.dispose()
+        finally:
+            config_by_name.pop('pool_test')
+
+
+class PoolMetricsEndpointTest(AppTestCase):
+
+    def test_admin_can_read_pool_metrics(self):
+        self.login()
+        data = self.client.get('/admin/api/metrics/pool').get_json()
+        self.assertEqual(data['default']['dialect'], db.engine.dialect.name)
+        self.assertIn('pool', data['default'])
+
+    def test_requires_admin(self):
+        self.create_student(1, with_user=True)
+        self.login('student1', 'student123')
+        self.assertNotEqual(self.client.get('/admin/api/metrics/pool').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,274 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from app import db
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.services.enrollments import enroll_student, drop_enrollment, fill_from_waitlist, EnrollmentError
+from app.services.grades import apply_grade_batch
+from app.services.summary import get_course_statistics, get_student_statistics
+from config.config import TestingConfig, config_by_name
+from tests.base import AppTestCase, count_queries
+
+
+class EnrollmentServiceTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.course = self.create_course(1)
+        self.course.max_students = 2
+        self.course.waitlist_size = 1
+        db.session.commit()
+        self.students = [self.create_student(i).id for i in range(5)]
+
+    def enroll(self, index):
+        return enroll_student(self.students[index], self.course.id)
+
+    def counters(self):
+        course = db.session.get(Course, self.course.id)
+        db.session.refresh(course)
+        return course.seats_taken, course.waitlist_count
+
+    def test_capacity_then_waitlist_then_full(self):
+        self.assertEqual(self.enroll(0).status, 'enrolled')
+        self.assertEqual(self.enroll(1).status, 'enrolled')
+        result = self.enroll(2)
+        self.assertEqual((result.status, result.waitlist_position), ('waitlisted', 1))
+        with self.assertRaises(EnrollmentError) as caught:
+            self.enroll(3)
+        self.assertEqual((caught.exception.code, caught.exception.status_code), ('course_full', 409))
+        self.assertEqual(self.counters(), (2, 1))
+        self.assertEqual(get_course_statistics(self.course.id).enrolled_count, 2)
+
+    def test_duplicate_and_reenroll(self):
+        self.enroll(0)
+        with self.assertRaises(EnrollmentError) as caught:
+            self.enroll(0)
+        self.assertEqual(caught.exception.code, 'already_enrolled')
+
+        enrollment = Enrollment.query.filter_by(student_id=self.students[0]).one()
+        enrollment.status = 'dropped'
+        db.session.commit()
+        self.assertEqual(self.counters(), (0, 0))
+        self.assertEqual(self.enroll(0).enrollment.id, enrollment.id)
+        self.assertEqual(self.counters(), (1, 0))
+
+    def test_drop_promotes_first_waitlisted(self):
+        for i in range(3):
+            self.enroll(i)
+        result = drop_enrollment(self.students[0], self.course.id)
+        self.assertEqual(result.promoted, [self.students[2]])
+        promoted = Enrollment.query.filter_by(student_id=self.students[2]).one()
+        self.assertEqual(promoted.status, 'enrolled')
+        self.assertEqual(self.counters(), (2, 0))
+
+        with self.assertRaises(EnrollmentError) as caught:
+            drop_enrollment(self.students[0], self.course.id)
+        self.assertEqual((caught.exception.code, caught.exception.status_code), ('not_enrolled', 404))
+
+    def test_capacity_increase_fills_from_waitlist(self):
+        for i in range(3):
+            self.enroll(i)
+        course = db.session.get(Course, self.course.id)
+        course.max_students = 5
+        db.session.commit()
+        self.assertEqual(fill_from_waitlist(self.course.id), [self.students[2]])
+        self.assertEqual(self.counters(), (3, 0))
+
+    def status_of(self, index):
+        return Enrollment.query.filter_by(student_id=self.students[index]).one().status
+
+    def test_grading_waitlisted_and_freeing_seats(self):
+        for i in range(3):
+            self.enroll(i)
+        waiting = Enrollment.query.filter_by(student_id=self.students[2]).one().id
+        seated = Enrollment.query.filter_by(student_id=self.students[0]).one().id
+
+        # 候补记录不能通过录入成绩占用名额
+        results, updated = apply_grade_batch([{'enrollment_id': waiting, 'grade': 90}])
+        self.assertEqual((results[0]['success'], updated), (False, 0))
+        with self.outside_context():
+            self.login()
+            data = self.client.post('/admin/grades/record', json={
+                'student_id': self.students[2], 'course_id': self.course.id, 'grade': 90}).get_json()
+        self.assertIn('enrollment', data['errors'])
+        self.assertEqual(self.status_of(2), 'waitlisted')
+
+        # 批量改为退课空出名额，候补第一位转正
+        apply_grade_batch([{'enrollment_id': seated, 'status': 'dropped'}])
+        db.session.expire_all()
+        self.assertEqual(self.status_of(2), 'enrolled')
+        self.assertEqual(self.counters(), (2, 0))
+
+        # 删除成绩记录同样让候补学生补位
+        self.enroll(3)
+        enrollment_id = Enrollment.query.filter_by(student_id=self.students[1]).one().id
+        with self.outside_context():
+            self.login()
+            self.client.post(f'/admin/grades/{enrollment_id}/delete', json={})
+        db.session.expire_all()
+        self.assertEqual(self.status_of(3), 'enrolled')
+        self.assertEqual(self.counters(), (2, 0))
+
+    def test_admin_create_and_edit_respect_capacity(self):
+        for i in range(3):
+            self.enroll(i)
+        ids = [Enrollment.query.filter_by(student_id=self.students[i]).one().id for i in range(3)]
+
+        def edit(index, **data):
+            return self.client.post(f'/admin/enrollments/{ids[index]}/edit', json=data)
+
+        with self.outside_context():
+            self.login()
+            response = self.client.post('/admin/enrollments/create', json={
+                'student_id': self.students[3], 'course_id': self.course.id, 'status': 'enrolled'})
+            self.assertEqual((response.status_code, response.get_json()['code']), (409, 'course_full'))
+            self.assertEqual(edit(2, status='enrolled').get_json()['code'], 'waitlisted')
+            self.assertEqual(edit(2, status='waitlisted', grade='90').status_code, 409)
+
+            # 改为退课空出名额，候补第一位转正；再改回已选时名额已满
+            self.assertTrue(edit(0, status='dropped').get_json()['success'])
+            self.assertEqual(edit(0, status='enrolled').get_json()['code'], 'course_full')
+            # 未提交状态时保持原状态，录入成绩后改为已完成
+            self.assertEqual(edit(1, grade='88').get_json()['enrollment']['status'], 'completed')
+            # 不占名额的状态可以直接添加
+            data = self.client.post('/admin/enrollments/create', json={
+                'student_id': self.students[4], 'course_id': self.course.id, 'status': 'dropped'}).get_json()
+            self.assertEqual((data['success'], data['enrollment']['status']), (True, 'dropped'))
+
+        db.session.expire_all()
+        self.assertEqual([self.status_of(i) for i in range(3)], ['dropped', 'completed', 'enrolled'])
+        self.assertEqual(self.counters(), (2, 0))
+        self.assertIsNone(Enrollment.query.filter_by(student_id=self.students[3]).first())
+
+    def test_enroll_view_returns_error_codes(self):
+        user_student = self.create_student(10, with_user=True)
+        for i in range(3):
+            self.enroll(i)
+        self.login('student10', 'student123')
+        response = self.client.post(f'/student/courses/{self.course.id}/enroll', json={})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['code'], 'course_full')
+        response = self.client.post('/student/courses/9999/enroll', json={})
+        self.assertEqual(response.status_code, 404)
+
+        drop_enrollment(self.students[2], self.course.id)
+        with count_queries() as counter:
+            data = self.client.post(f'/student/courses/{self.course.id}/enroll', json={}).get_json()
+        self.assertEqual((data['success'], data['status'], data['waitlist_position']), (True, 'waitlisted', 1))
+        # 响应里的选课人数来自课程汇总表，不再对 enrollments 做 COUNT
+        self.assertEqual(data['enrollment']['course']['enrollment_count'], 3)
+        self.assertFalse([s for s in counter.statements if 'count(*)' in s])
+        self.assertEqual(self.client.post(f'/student/courses/{self.course.id}/drop', json={}).status_code, 200)
+        self.assertIsNone(Enrollment.query.filter_by(student_id=user_student.id).first())
+
+
+class ConcurrentEnrollmentTest(AppTestCase):
+    """文件数据库 + 多线程：大量学生同时抢同一门课，不超卖、不出现未处理的异常"""
+
+    STUDENTS = 200
+    CAPACITY = 50
+    WAITLIST = 20
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        config_by_name['concurrent_test'] = type('ConcurrentTestConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(cls.tmpdir, 'enroll.db'),
+            'DB_POOL_SIZE': 20,
+            'DB_MAX_OVERFLOW': 0,
+        })
+        cls.config_name = 'concurrent_test'
+
+    @classmethod
+    def tearDownClass(cls):
+        config_by_name.pop('concurrent_test')
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        course = self.create_course(1)
+        course.max_students, course.waitlist_size = self.CAPACITY, self.WAITLIST
+        db.session.commit()
+        self.course_id = course.id
+        db.session.execute(db.insert(Student), [
+            {'student_id': f'S{i:05d}', 'first_name': 'F', 'last_name': str(i), 'email': f's{i}@example.com'}
+            for i in range(self.STUDENTS)
+        ])
+        db.session.commit()
+        self.student_ids = [row.id for row in db.session.execute(db.select(Student.id)).all()]
+
+    def tearDown(self):
+        db.engine.dispose()
+        super().tearDown()
+
+    def _enroll(self, student_id):
+        with self.app.app_context():
+            try:
+                return enroll_student(student_id, self.course_id).status
+            except EnrollmentError as e:
+                return e.code
+
+    def test_many_students_one_course(self):
+        # 每个学生还重复提交一次，模拟连点
+        requests = self.student_ids + self.student_ids[:40]
+        started = time.perf_counter()
+        with self.outside_context(), ThreadPoolExecutor(max_workers=50) as executor:
+            outcomes = list(executor.map(self._enroll, requests))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(outcomes.count('enrolled'), self.CAPACITY)
+        self.assertEqual(outcomes.count('waitlisted'), self.WAITLIST)
+        self.assertEqual(outcomes.count('course_full') + outcomes.count('already_enrolled')
+                         + outcomes.count('already_waitlisted'), len(requests) - self.CAPACITY - self.WAITLIST)
+        self.assertNotIn('busy', outcomes)
+        course = db.session.get(Course, self.course_id)
+        self.assertEqual((course.seats_taken, course.waitlist_count), (self.CAPACITY, self.WAITLIST))
+        self.assertEqual(Enrollment.query.count(), self.CAPACITY + self.WAITLIST)
+        self.assertLess(elapsed, 60)
+
+    def test_concurrent_claims_keep_statistics_consistent(self):
+        # 每个学生同时抢两门课：汇总在占名额的事务内刷新，结果必须与按 enrollments 重算的一致。
+        # SQLite 的写事务是串行的，这里只能验证并发下结果正确，
+        # 不同课程的事务在服务器数据库上互不阻塞这一点无法在这里测出。
+        course_ids = [self.course_id]
+        for i in range(2, 5):
+            course = self.create_course(i)
+            course.max_students, course.waitlist_size = 20, 5
+            course_ids.append(course.id)
+        db.session.commit()
+        requests = [(student_id, course_ids[(i + offset) % len(course_ids)])
+                    for i, student_id in enumerate(self.student_ids[:80]) for offset in (0, 1)]
+
+        def claim(request):
+            with self.app.app_context():
+                try:
+                    return enroll_student(*request).status
+                except EnrollmentError as e:
+                    return e.code
+
+        with self.outside_context(), ThreadPoolExecutor(max_workers=40) as executor:
+            outcomes = list(executor.map(claim, requests))
+        self.assertNotIn('busy', outcomes)
+
+        db.session.expire_all()
+        for course_id in course_ids:
+            course = db.session.get(Course, course_id)
+            seated = Enrollment.query.filter(Enrollment.course_id == course_id,
+                                             Enrollment.status.in_(('enrolled', 'completed'))).count()
+            waiting = Enrollment.query.filter_by(course_id=course_id, status='waitlisted').count()
+            self.assertEqual((course.seats_taken, course.waitlist_count), (seated, waiting))
+            self.assertLessEqual(seated, course.max_students)
+            stats = get_course_statistics(course_id)
+            self.assertEqual((stats.total_count, stats.enrolled_count), (seated + waiting, seated))
+        for student_id in self.student_ids[:80]:
+            self.assertEqual(get_student_statistics(student_id).total_count,
+                             Enrollment.query.filter_by(student_id=student_id).count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from tests.base import AppTestCase
+from app import db
+from app.models.job import BackgroundJob
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+class ExportTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.export_dir = tempfile.mkdtemp()
+        self.app.config['EXPORT_FOLDER'] = self.export_dir
+        self.app.config['JOBS_RUN_INLINE'] = True
+
+        self.students = [self.create_student(i, with_user=(i == 0)) for i in range(25)]
+        self.courses = [self.create_course(i) for i in range(2)]
+        # 25 条成绩（超过列表页每页 20 条），课程 0 上 13 条，其中 1 条为“进行中”
+        for i, student in enumerate(self.students):
+            self.enroll(student, self.courses[i % 2], grade=60 + i,
+                        status='enrolled' if i == 24 else 'completed')
+
+    def tearDown(self):
+        shutil.rmtree(self.export_dir, ignore_errors=True)
+        super().tearDown()
+
+    def get(self, url):
+        response = self.client.get(url)
+        data = response.get_data()
+        response.close()
+        return response, data
+
+    def read_csv(self, data):
+        self.assertTrue(data.startswith(b'\xef\xbb\xbf'))
+        return list(csv.reader(io.StringIO(data.decode('utf-8-sig'))))
+
+    def test_csv_grades_export_covers_all_pages_and_honours_filters(self):
+        self.login()
+        response, data = self.get('/admin/api/grades/export?format=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        rows = self.read_csv(data)
+        self.assertEqual(rows[0][:2], ['学号', '学生姓名'])
+        # 默认只导出已完成的记录，按成绩降序
+        self.assertEqual(len(rows) - 1, 24)
+        self.assertEqual(rows[1][0], 'S00023')
+        self.assertEqual(rows[1][6], '83')
+        self.assertEqual(rows[1][7], '已完成')
+
+        course_id = self.courses[0].id
+        _, data = self.get(f'/admin/api/grades/export?format=csv&course={course_id}&status=')
+        self.assertEqual(len(self.read_csv(data)) - 1, 13)
+
+        _, data = self.get('/admin/export/enrollments?format=csv&search=S00003')
+        rows = self.read_csv(data)
+        self.assertEqual([row[0] for row in rows[1:]], ['S00003'])
+
+    def test_xlsx_export(self):
+        if openpyxl is None:
+            self.skipTest('openpyxl 未安装')
+        self.login()
+        response, data = self.get('/admin/export/students?format=excel')
+        self.assertEqual(response.status_code, 200)
+        workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True)
+        rows = list(workbook.active.values)
+        self.assertEqual(rows[0][0], '学号')
+        self.assertEqual(len(rows) - 1, 25)
+        self.assertEqual(rows[1][1], 'First0 Last0')
+
+    def test_large_export_runs_as_background_job(self):
+        self.app.config['EXPORT_SYNC_MAX_ROWS'] = 10
+        self.login()
+
+        response = self.client.get('/admin/export/courses?format=csv',
+                                   headers={'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 200)  # 只有 2 门课程，仍然同步导出
+
+        response = self.client.get('/admin/export/enrollments?format=csv',
+                                   headers={'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 202)
+        payload = response.get_json()
+
+        status = self.client.get(payload['status_url']).get_json()
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual(status['progress'], 25)
+        self.assertEqual(status['percent'], 100)
+
+        response, data = self.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.read_csv(data)) - 1, 25)
+
+        response = self.client.get('/admin/export/grades?format=csv')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/admin/jobs/', response.headers['Location'])
+        self.assertEqual(BackgroundJob.query.count(), 2)
+
+        # 超过保留期的任务由下一个导出任务清理，连同结果文件
+        expired = db.session.get(BackgroundJob, payload['job']['id'])
+        expired_path = expired.result_path
+        expired.finished_at = datetime.utcnow() - timedelta(days=2)
+        db.session.commit()
+        self.client.get('/admin/export/enrollments?format=csv', headers={'Accept': 'application/json'})
+        self.assertIsNone(db.session.get(BackgroundJob, payload['job']['id']))
+        self.assertFalse(os.path.exists(expired_path))
+        self.assertEqual(BackgroundJob.query.count(), 2)
+
+    def test_invalid_format_and_unknown_entity(self):
+        self.login()
+        response = self.client.get('/admin/export/grades?format=pdf', headers={'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/admin/export/users?format=csv').status_code, 404)
+
+    def test_student_exports_only_own_grades(self):
+        self.login('student0', 'student123')
+        _, data = self.get('/student/api/grades/export?format=csv&status=&search=&semester=2024春季')
+        rows = self.read_csv(data)
+        self.assertEqual(len(rows) - 1, 1)
+        self.assertEqual(rows[1][0], 'C0000')
+        self.assertEqual(rows[1][6], '60')
+
+        # 学生不能访问管理员导出
+        response = self.client.get('/admin/export/grades?format=csv')
+        self.assertNotEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
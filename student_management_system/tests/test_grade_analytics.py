@@ -0,0 +1,123 @@
+import statistics
+import unittest
+from datetime import date
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.enrollment import Enrollment
+from app.services.grades import apply_grade_batch
+from app.services.enrollments import enroll_student, drop_enrollment
+from app.services.grade_analytics import (describe, grade_distribution, grade_distributions,
+                                          get_grade_analytics_cache, AnalyticsError)
+
+
+class GradeAnalyticsTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.courses = [self.create_course(i) for i in range(3)]
+        self.course_ids = [course.id for course in self.courses]
+        self.grades = [55, 61.5, 70, 78, 83, 88, 91, 100]
+        students = [self.create_student(i) for i in range(len(self.grades))]
+        for student, grade in zip(students, self.grades):
+            self.enroll(student, self.courses[0], grade=grade, status='completed')
+        self.first = self.enroll(students[0], self.courses[1], grade=80, status='completed',
+                                 enrollment_date=date(2024, 9, 1))
+        # 进行中的成绩只在 status 为空时统计
+        self.enroll(students[1], self.courses[1], grade=40)
+        self.first_id = self.first.id
+
+    def test_matches_reference_statistics(self):
+        result = grade_distribution('course', self.course_ids[0])
+        self.assertEqual(result['count'], len(self.grades))
+        self.assertEqual(result['mean'], round(statistics.fmean(self.grades), 2))
+        self.assertEqual(result['median'], round(statistics.median(self.grades), 2))
+        self.assertEqual(result['stddev'], round(statistics.pstdev(self.grades), 2))
+        self.assertEqual((result['min'], result['max']), (55, 100))
+        quartiles = statistics.quantiles(self.grades, n=4, method='inclusive')
+        self.assertEqual(result['percentiles']['p25'], round(quartiles[0], 2))
+        self.assertEqual(result['percentiles']['p75'], round(quartiles[2], 2))
+        # 60 以下 1 个，60-70 1 个，70-80 2 个，80-90 2 个，90-100（含满分）2 个
+        self.assertEqual([bucket['count'] for bucket in result['histogram']], [1, 1, 2, 2, 2])
+
+        self.assertEqual(describe([]).count, 0)
+        self.assertEqual(grade_distribution('course', self.course_ids[2])['count'], 0)
+        self.assertEqual(grade_distribution('course', self.course_ids[1], status='')['count'], 2)
+        self.assertEqual(grade_distribution('all')['count'], len(self.grades) + 1)
+        with self.assertRaises(AnalyticsError):
+            grade_distribution('student', 1)
+
+    def test_many_courses_in_one_query_and_cached(self):
+        with count_queries(db.engine) as counter:
+            results = grade_distributions('course')
+        # 一条查询取键，一条查询取全部成绩
+        self.assertEqual(counter.count, 2)
+        self.assertEqual(sorted(results), self.course_ids[:2])
+
+        with count_queries(db.engine) as counter:
+            grade_distributions('course', self.course_ids)
+        self.assertEqual(counter.count, 1)
+        with count_queries(db.engine) as counter:
+            grade_distributions('course', self.course_ids)
+        self.assertEqual(counter.count, 0)
+
+    def test_invalidated_on_grade_write(self):
+        term_id = self.first.term_id
+        self.assertEqual(grade_distribution('course', self.course_ids[1])['max'], 80)
+        self.assertEqual(grade_distribution('term', term_id)['count'], 1)
+        cached_other = grade_distribution('course', self.course_ids[0])
+
+        enrollment = db.session.get(Enrollment, self.first_id)
+        enrollment.grade = 95
+        db.session.commit()
+        self.assertEqual(grade_distribution('course', self.course_ids[1])['max'], 95)
+        self.assertEqual(grade_distribution('term', term_id)['max'], 95)
+        # 其他课程的缓存不受影响
+        with count_queries(db.engine) as counter:
+            self.assertEqual(grade_distribution('course', self.course_ids[0]), cached_other)
+        self.assertEqual(counter.count, 0)
+
+        # 批量录入成绩（Core 写入）显式失效
+        apply_grade_batch([{'enrollment_id': self.first_id, 'grade': 42}])
+        self.assertEqual(grade_distribution('course', self.course_ids[1])['max'], 42)
+        self.assertEqual(grade_distribution('all')['min'], 42)
+
+        get_grade_analytics_cache().clear()
+        self.assertEqual(len(get_grade_analytics_cache()), 0)
+
+    def test_ungraded_rows_keep_cache_warm(self):
+        overall = grade_distribution('all')
+        student = self.create_student(20)
+        self.enroll(student, self.courses[2])
+        enroll_student(student.id, self.course_ids[1])
+        drop_enrollment(student.id, self.course_ids[1])
+        # 没有成绩的选课、退课不影响分布，全部成绩的缓存仍然有效
+        with count_queries(db.engine) as counter:
+            self.assertEqual(grade_distribution('all'), overall)
+        self.assertEqual(counter.count, 0)
+
+        cache = get_grade_analytics_cache()
+        cache.maxsize = 2
+        grade_distributions('course', self.course_ids)
+        self.assertEqual(len(cache), 2)
+
+    def test_grades_page_and_api(self):
+        self.login()
+        html = self.client.get(f'/admin/grades?course={self.course_ids[0]}').get_data(as_text=True)
+        self.assertIn('成绩分布', html)
+        self.assertIn('90-100', html)
+        # 带搜索条件时按筛选结果统计
+        self.assertEqual(self.client.get('/admin/grades?search=S00000').status_code, 200)
+
+        data = self.client.get(f'/admin/api/analytics/grades?ids={self.course_ids[0]},{self.course_ids[1]}').get_json()
+        self.assertEqual([item['key'] for item in data['items']], self.course_ids[:2])
+        self.assertEqual(data['items'][0]['name'], 'C0000 Course 0')
+        self.assertEqual(data['items'][0]['count'], len(self.grades))
+
+        data = self.client.get('/admin/api/analytics/grades?scope=term').get_json()
+        self.assertEqual(sorted(item['name'] for item in data['items']), ['2024春季', '2024秋季'])
+        self.assertEqual(self.client.get('/admin/api/analytics/grades?scope=bad').status_code, 400)
+        self.assertEqual(self.client.get('/admin/api/analytics/grades?ids=x').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.enrollment import Enrollment
+from app.services.summary import get_course_statistics, get_student_statistics
+
+
+class GradeBatchTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.course = self.create_course(1)
+        self.other_course = self.create_course(2)
+        self.students = [self.create_student(i) for i in range(30)]
+        self.enrollments = [self.enroll(student, self.course) for student in self.students]
+        self.other = self.enroll(self.students[0], self.other_course)
+        self.ids = [enrollment.id for enrollment in self.enrollments]
+        self.student_ids = [student.id for student in self.students]
+        self.course_id = self.course.id
+        self.other_id = self.other.id
+
+    def post(self, payload):
+        with self.outside_context():
+            self.login()
+            return self.client.post('/admin/api/grades/batch', json=payload)
+
+    def test_whole_roster_in_one_request(self):
+        items = [{'enrollment_id': enrollment_id, 'grade': 60 + i} for i, enrollment_id in enumerate(self.ids)]
+        engine = db.engine
+        with self.outside_context():
+            self.login()
+            with count_queries(engine) as counter:
+                response = self.client.post('/admin/api/grades/batch',
+                                            json={'course_id': self.course_id, 'items': items})
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['updated'], 30)
+        # 查询条数与名单人数无关：登录用户、选课定位、批量 UPDATE、汇总刷新
+        self.assertLess(counter.count, 15)
+
+        grades = dict(db.session.query(Enrollment.id, Enrollment.grade).all())
+        self.assertEqual(float(grades[self.ids[29]]), 89)
+        self.assertEqual(Enrollment.query.filter_by(status='completed').count(), 30)
+        stats = get_course_statistics(self.course_id)
+        self.assertEqual(stats.graded_count, 30)
+        self.assertEqual(stats.completed_count, 30)
+        self.assertAlmostEqual(stats.avg_grade, 74.5)
+
+    def test_per_item_results(self):
+        data = self.post({'course_id': self.course_id, 'items': [
+            {'enrollment_id': self.ids[0], 'grade': 95},
+            {'student_id': self.student_ids[1], 'grade': '88.5', 'status': 'enrolled'},
+            {'enrollment_id': self.ids[0], 'grade': 70},     # 重复
+            {'enrollment_id': self.ids[2], 'grade': 101},
+            {'enrollment_id': 999999, 'grade': 80},
+            {'enrollment_id': self.other_id, 'grade': 80},   # 不属于该课程
+            {'enrollment_id': self.ids[3]},
+            {'enrollment_id': self.ids[4], 'status': 'dropped'},
+            'bad',
+        ]}).get_json()
+
+        self.assertFalse(data['success'])
+        self.assertEqual((data['updated'], data['failed']), (3, 6))
+        results = data['results']
+        self.assertEqual((results[0]['grade'], results[0]['status']), (95.0, 'completed'))
+        self.assertEqual((results[1]['grade'], results[1]['status']), (88.5, 'enrolled'))
+        self.assertEqual(results[2]['error'], '与第 1 项重复')
+        self.assertEqual(results[3]['error'], '成绩必须在0到100之间')
+        self.assertEqual(results[4]['error'], '选课记录不存在')
+        self.assertEqual(results[5]['error'], '选课记录不属于该课程')
+        self.assertEqual(results[6]['error'], '需要 grade 或 status')
+        self.assertEqual(results[7]['status'], 'dropped')
+        self.assertFalse(results[8]['success'])
+
+        self.assertEqual(float(db.session.get(Enrollment, self.ids[0]).grade), 95)
+        self.assertIsNone(db.session.get(Enrollment, self.other_id).grade)
+        self.assertEqual(get_student_statistics(self.student_ids[1]).graded_count, 1)
+
+    def test_atomic_batch_writes_nothing_on_error(self):
+        data = self.post({'atomic': True, 'items': [
+            {'enrollment_id': self.ids[0], 'grade': 90},
+            {'enrollment_id': self.ids[1], 'grade': 'abc'},
+        ]}).get_json()
+        self.assertEqual(data['updated'], 0)
+        self.assertEqual(data['failed'], 2)
+        self.assertIsNone(db.session.get(Enrollment, self.ids[0]).grade)
+
+    def test_dropped_rows_cannot_take_seats(self):
+        self.post({'items': [{'enrollment_id': self.ids[0], 'status': 'dropped'},
+                             {'enrollment_id': self.ids[1], 'status': 'withdrawn'}]})
+        data = self.post({'items': [
+            {'enrollment_id': self.ids[0], 'status': 'enrolled'},
+            {'enrollment_id': self.ids[1], 'grade': 80},
+        ]}).get_json()
+        self.assertEqual([result['success'] for result in data['results']], [False, False])
+        # 保持不占名额的状态时可以记录成绩
+        data = self.post({'items': [{'enrollment_id': self.ids[1], 'grade': 80, 'status': 'withdrawn'}]}).get_json()
+        self.assertEqual(data['updated'], 1)
+        db.session.expire_all()
+        self.assertEqual([db.session.get(Enrollment, i).status for i in self.ids[:2]], ['dropped', 'withdrawn'])
+
+    def test_invalid_body(self):
+        response = self.post({'items': []})
+        self.assertEqual(response.status_code, 400)
+
+    def test_grade_grid_page(self):
+        engine = db.engine
+        with self.outside_context():
+            self.login()
+            with count_queries(engine) as counter:
+                response = self.client.get(f'/admin/courses/{self.course_id}/grades')
+            body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('S00029', body)
+        self.assertLess(counter.count, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import time
+import unittest
+from flask import Flask
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.user import User
+from app.models.student import Student
+from app.services.identity import MemoryIdentityCache, NullIdentityCache, init_identity_cache
+from app.services.transcript import get_transcript
+
+
+class MemoryIdentityCacheTest(unittest.TestCase):
+
+    def make_cache(self, **config):
+        app = Flask(__name__)
+        app.config.update(config)
+        return MemoryIdentityCache(app)
+
+    def test_lru_eviction_and_ttl(self):
+        cache = self.make_cache(IDENTITY_CACHE_SIZE=2, IDENTITY_CACHE_TTL=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+        cache = self.make_cache(IDENTITY_CACHE_TTL=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+
+    def test_backend_selection(self):
+        app = Flask(__name__)
+        app.config.update(IDENTITY_CACHE_BACKEND='memory', IDENTITY_CACHE_TTL=0)
+        init_identity_cache(app)
+        self.assertIsInstance(app.extensions['identity_cache'], NullIdentityCache)
+
+        app.config.update(IDENTITY_CACHE_BACKEND='app.services.identity:MemoryIdentityCache',
+                          IDENTITY_CACHE_TTL=30)
+        init_identity_cache(app)
+        self.assertIsInstance(app.extensions['identity_cache'], MemoryIdentityCache)
+
+
+class IdentityCacheTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_student(0, with_user=True)
+        self.student_id = Student.query.one().id
+        self.engine = db.engine
+        with self.outside_context():
+            self.login('student0', 'student123')
+        # 个人资料页的成绩单有自己的缓存，先加载好，下面只统计身份缓存带来的差别
+        get_transcript(self.student_id)
+
+    def get(self, url):
+        with self.outside_context(), count_queries(self.engine) as counter:
+            response = self.client.get(url)
+            body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200, url)
+        return counter.count, body
+
+    def test_user_and_student_loaded_once_across_requests(self):
+        self.app.extensions['identity_cache'].clear()
+        cold, _ = self.get('/student/profile')
+        warm, _ = self.get('/student/profile')
+        self.assertEqual(cold - warm, 2)
+
+    def test_edits_invalidate_cache(self):
+        self.get('/student/profile')
+
+        student = db.session.get(Student, self.student_id)
+        student.first_name = '张'
+        user = User.query.filter_by(username='student0').one()
+        user.full_name = '张 三'
+        db.session.commit()
+        db.session.remove()
+
+        _, body = self.get('/student/profile')
+        self.assertIn('张Last0', body)
+        self.assertIn('张 三', body)
+
+    def test_bulk_sync_invalidates_cache(self):
+        from app.services.sync import sync_student_data
+        self.get('/student/profile')
+        user = User.query.filter_by(username='student0').one()
+        user.full_name = 'Wang Wu'
+        db.session.commit()
+        sync_student_data()
+        db.session.remove()
+        _, body = self.get('/student/profile')
+        self.assertIn('WangWu', body)
+
+    def test_password_hash_not_cached(self):
+        self.get('/student/profile')
+        user_id = User.query.filter_by(username='student0').one().id
+        cached = self.app.extensions['identity_cache'].get(f'user:{user_id}')
+        self.assertNotIn('password_hash', cached)
+        self.assertEqual(cached['username'], 'student0')
+
+        # 校验密码时按需加载密码哈希
+        with self.outside_context():
+            response = self.client.post('/auth/change_password', data={
+                'current_password': 'student123', 'new_password': 'secret99', 'confirm_password': 'secret99'
+            }, follow_redirects=True)
+        self.assertIn('密码修改成功', response.get_data(as_text=True))
+        db.session.remove()
+        self.assertTrue(User.query.filter_by(username='student0').one().check_password('secret99'))
+
+    def test_disabled_cache_queries_every_request(self):
+        self.app.extensions['identity_cache'] = NullIdentityCache(self.app)
+        first, _ = self.get('/student/profile')
+        second, _ = self.get('/student/profile')
+        self.assertEqual(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import io
+import unittest
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.student import Student
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.services.imports import import_file
+from app.services.search import search
+from app.services.summary import get_student_statistics, get_course_statistics
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+def csv_file(lines):
+    return io.BytesIO(('\ufeff' + '\n'.join(lines) + '\n').encode('utf-8'))
+
+
+def student_lines(start, count):
+    return [f'S9{i:04d},名{i},姓{i},new{i}@example.com,2024' for i in range(start, start + count)]
+
+
+class ImportTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.existing = self.create_student(1)
+        self.course = self.create_course(1)
+
+    def upload(self, entity, data, filename='data.csv', **form):
+        return self.client.post(f'/admin/import/{entity}', data={'file': (data, filename), **form},
+                                headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+
+    def test_student_import_reports_row_errors_and_inserts_valid_rows(self):
+        self.login()
+        response = self.upload('students', csv_file([
+            '学号,名,姓,邮箱,性别,入学年份,备注',
+            'S90001,一,张,zhang@example.com,男,2024,x',
+            'S90002,二,王,not-an-email,Female,2024,',
+            'S90001,三,李,li@example.com,,2024,',           # 文件内学号重复
+            'S00001,四,赵,zhao@example.com,,2024,',         # 数据库中已存在
+            'S90003,,孙,sun@example.com,,abc,',              # 缺少名字、入学年份格式错误
+            ',,,,,,',                                        # 空行忽略
+            'S90004,五,周,student1@example.com,Other,,',    # 邮箱已存在
+            'S90005,六,吴,wu@example.com,,,',
+        ]))
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        self.assertEqual(result['total'], 7)
+        self.assertEqual(result['inserted'], 2)
+        self.assertEqual(result['ignored_columns'], ['备注'])
+        errors = {(error['row'], error['field']): error['message'] for error in result['errors']}
+        self.assertEqual(errors[(3, '邮箱')], '请输入有效的邮箱地址')
+        self.assertEqual(errors[(4, '学号')], '与第 2 行重复')
+        self.assertEqual(errors[(5, '学号')], '学号已存在')
+        self.assertIn((6, '名'), errors)
+        self.assertIn((6, '入学年份'), errors)
+        self.assertEqual(errors[(8, '邮箱')], '邮箱已存在')
+
+        student = Student.query.filter_by(student_id='S90001').one()
+        self.assertEqual(student.gender, 'Male')
+        self.assertEqual(student.enrollment_year, 2024)
+        self.assertIsNotNone(student.created_at)
+        # 批量写入的记录也进入了搜索索引
+        self.assertEqual([s.student_id for s, _ in search('student', 'S90005')], ['S90005'])
+
+    def test_validation_queries_do_not_grow_with_row_count(self):
+        self.app.config['IMPORT_BATCH_SIZE'] = 1000
+        counts = []
+        for start, count in ((0, 20), (100, 400)):
+            lines = ['student_id,first_name,last_name,email,enrollment_year'] + student_lines(start, count)
+            with count_queries() as counter:
+                result = import_file('students', csv_file(lines), 'students.csv')
+            self.assertEqual(result.inserted, count)
+            counts.append(counter.count)
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Student.query.count(), 421)
+
+    def test_dry_run_writes_nothing(self):
+        self.login()
+        lines = ['student_id,first_name,last_name,email'] + [line.rsplit(',', 1)[0] for line in student_lines(0, 5)]
+        result = self.upload('students', csv_file(lines), dry_run='1').get_json()
+        self.assertEqual((result['valid'], result['inserted']), (5, 0))
+        self.assertEqual(Student.query.count(), 1)
+
+    def test_missing_required_column(self):
+        self.login()
+        response = self.upload('courses', csv_file(['课程代码,学分', 'C9000,3']))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('课程名称', response.get_json()['message'])
+
+    def test_enrollment_import_resolves_keys_and_refreshes_statistics(self):
+        other = self.create_course(2)
+        self.enroll(self.existing, other)
+        result = import_file('enrollments', csv_file([
+            '学号,课程代码,选课日期,状态,成绩',
+            'S00001,C0001,2024-09-01,,88.5',
+            'S00001,C0001,2024-09-01,,90',     # 文件内重复
+            'S00001,C0002,,,',                  # 数据库中已选
+            'S99999,C0001,,,',                  # 学生不存在
+            'S00001,C0404,,进行中,',            # 课程不存在
+            'S00001,C0001,2024-13-01,unknown,101',
+        ]), 'enrollments.csv')
+        self.assertEqual(result.inserted, 1)
+        messages = sorted((error['row'], error['message']) for error in result.errors)
+        self.assertIn((3, '与第 2 行的选课重复'), messages)
+        self.assertIn((4, '该学生已选过这门课程'), messages)
+        self.assertIn((5, '学生不存在'), messages)
+        self.assertIn((6, '课程不存在'), messages)
+        self.assertEqual(len([m for row, m in messages if row == 7]), 3)
+
+        enrollment = Enrollment.query.filter_by(course_id=self.course.id).one()
+        self.assertEqual(enrollment.status, 'completed')
+        self.assertEqual(float(enrollment.grade), 88.5)
+        self.assertEqual(get_student_statistics(self.existing.id).total_count, 2)
+        self.assertEqual(get_course_statistics(self.course.id).graded_count, 1)
+
+    def test_xlsx_course_import(self):
+        if openpyxl is None:
+            self.skipTest('openpyxl 未安装')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['课程代码', '课程名称', '学分', '授课教师'])
+        sheet.append(['C9001', '数据库系统', 4, '王老师'])
+        sheet.append(['C9002', '操作系统', None, None])
+        sheet.append(['C0001', '重复课程', 2, None])
+        data = io.BytesIO()
+        workbook.save(data)
+        data.seek(0)
+
+        result = import_file('courses', data, 'courses.xlsx')
+        self.assertEqual(result.inserted, 2)
+        self.assertEqual(result.errors[0]['message'], '课程代码已存在')
+        self.assertEqual(db.session.execute(
+            db.select(Course.credits).where(Course.course_code == 'C9002')).scalar(), 3)
+        self.assertEqual([c.course_code for c, _ in search('course', '数据库')], ['C9001'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from tests.base import AppTestCase
+from app import db
+from app.models.user import User
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.services.filters import enrollment_list_query, grade_list_query, student_grade_query
+
+# 列表页常用查询的执行计划回归测试：筛选/排序列必须走索引。
+# SQLite 下检查 EXPLAIN QUERY PLAN；设置 TEST_DATABASE_URL 指向 MySQL 时检查 EXPLAIN 的 key 列。
+
+GRADE_ORDER = (Enrollment.grade.desc(), Enrollment.id.desc())
+
+
+def list_queries():
+    """(名称, 查询, 表名, SQLite 下期望的索引, 是否要求不再额外排序)"""
+    return [
+        ('选课按状态筛选', enrollment_list_query(status='enrolled').order_by(Enrollment.id).limit(20),
+         'enrollments', 'ix_enrollments_status', False),
+        ('成绩列表默认', grade_list_query().order_by(*GRADE_ORDER).limit(20),
+         'enrollments', 'ix_enrollments_status_grade', True),
+        ('成绩列表按课程', grade_list_query(course='1').order_by(*GRADE_ORDER).limit(20),
+         'enrollments', 'ix_enrollments_course_status_grade', True),
+        ('成绩列表不限状态', grade_list_query(status='').order_by(*GRADE_ORDER).limit(20),
+         'enrollments', 'ix_enrollments_grade', True),
+        ('最近更新的选课', Enrollment.query.order_by(Enrollment.updated_at.desc(), Enrollment.id.desc()).limit(20),
+         'enrollments', 'ix_enrollments_updated_at', False),
+        ('最近创建的选课', Enrollment.query.order_by(Enrollment.created_at.desc()).limit(5),
+         'enrollments', 'ix_enrollments_created_at', True),
+        ('课程名单', Enrollment.query.filter(Enrollment.course_id == 1),
+         'enrollments', 'ix_enrollments_course_status_grade', False),
+        ('学生按学期筛选成绩', student_grade_query(1, semester='2024春季'),
+         'enrollments', 'ix_enrollments_student_term', False),
+        ('学期成绩统计', Enrollment.query.filter(Enrollment.term_id == 1, Enrollment.status == 'completed')
+         .with_entities(db.func.avg(Enrollment.grade)),
+         'enrollments', 'ix_enrollments_term_status_grade', False),
+        ('用户按角色筛选', User.query.filter(User.role == 'student'), 'users', 'ix_users_role', False),
+        ('未激活用户', User.query.filter(User.is_active.is_(False)), 'users', 'ix_users_is_active', False),
+        ('课程按名称排序', Course.query.order_by(Course.course_name).limit(20),
+         'courses', 'ix_courses_course_name', True),
+    ]
+
+
+class IndexPlanTest(AppTestCase):
+
+    def compile(self, query):
+        return str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+    def explain(self, query):
+        with db.engine.connect() as connection:
+            if db.engine.dialect.name == 'sqlite':
+                return [row[3] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + self.compile(query))]
+            return [dict(row._mapping) for row in connection.exec_driver_sql('EXPLAIN ' + self.compile(query))]
+
+    def test_list_queries_use_indexes(self):
+        for name, query, table, index, sorted_by_index in list_queries():
+            with self.subTest(name):
+                plan = self.explain(query)
+                if db.engine.dialect.name == 'sqlite':
+                    self.assertTrue(any(f' {table} USING INDEX {index}' in step or
+                                        f' {table} USING COVERING INDEX {index}' in step for step in plan), plan)
+                    if sorted_by_index:
+                        self.assertFalse(any('TEMP B-TREE FOR ORDER BY' in step for step in plan), plan)
+                else:
+                    row = next(row for row in plan if row['table'] == table)
+                    self.assertIsNotNone(row['key'], plan)
+                    if sorted_by_index:
+                        self.assertNotIn('Using filesort', row.get('Extra') or '', plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from tests.base import AppTestCase, count_queries
+from app.models.enrollment import Enrollment
+from app.services.pagination import keyset_paginate, InvalidCursor
+
+GRADE_ORDER = [(Enrollment.grade, True), (Enrollment.id, True)]
+
+
+class KeysetPaginationTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        courses = [self.create_course(i) for i in range(3)]
+        # 成绩有大量重复值，用来检查 (grade, id) 组合键不会漏行或重复
+        for i in range(12):
+            student = self.create_student(i)
+            for j, course in enumerate(courses):
+                self.enroll(student, course, grade=60 + (i * 3 + j) % 5 * 10, status='completed')
+
+    def walk(self, query, order, per_page):
+        pages = []
+        page = keyset_paginate(query, order, per_page=per_page)
+        pages.append(page)
+        while page.has_next:
+            page = keyset_paginate(query, order, cursor=page.next_cursor, per_page=per_page)
+            pages.append(page)
+        return pages
+
+    def test_forward_walk_matches_full_ordering(self):
+        query = Enrollment.query.filter(Enrollment.grade.isnot(None))
+        expected = [e.id for e in query.order_by(Enrollment.grade.desc(), Enrollment.id.desc()).all()]
+
+        pages = self.walk(query, GRADE_ORDER, per_page=7)
+        walked = [e.id for page in pages for e in page.items]
+        self.assertEqual(walked, expected)
+        self.assertFalse(pages[0].has_prev)
+        self.assertTrue(all(len(p.items) == 7 for p in pages[:-1]))
+        # 带筛选条件时不统计总数
+        self.assertIsNone(pages[0].total)
+
+    def test_backward_walk_returns_same_pages(self):
+        query = Enrollment.query
+        order = [(Enrollment.id, False)]
+        pages = self.walk(query, order, per_page=5)
+
+        page = pages[-1]
+        for previous in reversed(pages[:-1]):
+            page = keyset_paginate(query, order, cursor=page.prev_cursor, per_page=5)
+            self.assertEqual([e.id for e in page.items], [e.id for e in previous.items])
+        self.assertFalse(page.has_prev)
+
+    def test_unfiltered_total_is_estimated_without_count(self):
+        with count_queries() as counter:
+            page = keyset_paginate(Enrollment.query, [(Enrollment.id, False)], per_page=5)
+        self.assertEqual(page.total, Enrollment.query.count())
+        self.assertFalse(any('count(' in statement.lower() for statement in counter.statements))
+
+    def test_rejects_tampered_or_foreign_cursor(self):
+        page = keyset_paginate(Enrollment.query, [(Enrollment.id, False)], per_page=5)
+        with self.assertRaises(InvalidCursor):
+            keyset_paginate(Enrollment.query, [(Enrollment.id, False)], cursor=page.next_cursor + 'x')
+        with self.assertRaises(InvalidCursor):
+            keyset_paginate(Enrollment.query, GRADE_ORDER, cursor=page.next_cursor)
+
+    def test_deep_page_does_not_use_offset(self):
+        query = Enrollment.query
+        order = [(Enrollment.id, False)]
+        pages = self.walk(query, order, per_page=5)
+        with count_queries() as counter:
+            keyset_paginate(query, order, cursor=pages[-2].next_cursor, per_page=5)
+        # 取一页数据一条查询，近似总数一条；定位靠 WHERE id > ?，SQLite 方言的 OFFSET 恒为 0
+        self.assertEqual(counter.count, 2)
+        self.assertIn('enrollments.id > ?', counter.statements[0])
+        self.assertEqual(counter.parameters[0][-1], 0)
+
+    def test_admin_pages_and_api(self):
+        self.login()
+        for url in ['/admin/users', '/admin/students', '/admin/courses', '/admin/enrollments', '/admin/grades']:
+            response = self.client.get(url + '?pagination=keyset')
+            self.assertEqual(response.status_code, 200, url)
+
+        response = self.client.get('/admin/grades?pagination=keyset')
+        self.assertIn('cursor='.encode(), response.data)
+
+        data = self.client.get('/admin/api/enrollments?limit=10').get_json()
+        self.assertEqual(len(data['items']), 10)
+        second = self.client.get(f"/admin/api/enrollments?limit=10&cursor={data['next_cursor']}").get_json()
+        self.assertGreater(second['items'][0]['id'], data['items'][-1]['id'])
+        self.assertIsNotNone(second['prev_cursor'])
+
+        self.assertEqual(self.client.get('/admin/api/students?cursor=bogus').status_code, 400)
+        self.assertIsInstance(self.client.get('/admin/api/courses').get_json(), list)
+
+
+if __name__ == '__main__':
+    unittest.main()
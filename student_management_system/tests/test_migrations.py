@@ -0,0 +1,180 @@
+import os
+import shutil
+import tempfile
+import unittest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, upgrade
+from app import create_app, db
+from config.config import TestingConfig, config_by_name
+
+
+class MigrationTest(unittest.TestCase):
+    """迁移脚本在文件数据库上从零升级，结果必须与模型定义一致"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        config_by_name['migration_test'] = type('MigrationTestConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(self.tmpdir, 'test.db')
+        })
+        self.app = create_app('migration_test')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.ctx.pop()
+        config_by_name.pop('migration_test')
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_upgrade_matches_models(self):
+        # create_app 不再建表，空数据库完全由迁移创建
+        self.assertEqual(db.inspect(db.engine).get_table_names(), [])
+        upgrade()
+        with db.engine.connect() as connection:
+            context = MigrationContext.configure(connection, opts={
+                'include_name': self.app.extensions['migrate'].configure_args['include_name']
+            })
+            self.assertEqual(compare_metadata(context, db.metadata), [])
+        tables = db.inspect(db.engine).get_table_names()
+        self.assertIn('students_fts', tables)
+
+    def test_student_user_link_backfill(self):
+        upgrade(revision='0001_baseline')
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO users (id, username, email, password_hash, full_name, role) VALUES "
+                "(10, 'stu', 'stu@example.com', 'x', 'Stu', 'student'), "
+                "(11, 'boss', 'boss@example.com', 'x', 'Boss', 'admin')"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO students (id, student_id, first_name, last_name, email) VALUES "
+                "(1, 'S1', 'A', 'B', 'stu@example.com'), (2, 'S2', 'C', 'D', 'boss@example.com'), "
+                "(3, 'S3', 'E', 'F', 'none@example.com')"
+            )
+        upgrade()
+        with db.engine.connect() as connection:
+            rows = connection.exec_driver_sql('SELECT id, user_id FROM students ORDER BY id').all()
+        self.assertEqual([tuple(row) for row in rows], [(1, 10), (2, None), (3, None)])
+
+        downgrade(revision='0001_baseline')
+        columns = [column['name'] for column in db.inspect(db.engine).get_columns('students')]
+        self.assertNotIn('user_id', columns)
+
+    def test_term_backfill(self):
+        upgrade(revision='0004_course_capacity')
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO students (id, student_id, first_name, last_name, email) VALUES "
+                "(1, 'S1', 'A', 'B', 'a@example.com')"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO courses (id, course_code, course_name, credits) VALUES "
+                "(1, 'C1', 'One', 3), (2, 'C2', 'Two', 3), (3, 'C3', 'Three', 3)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO enrollments (id, student_id, course_id, enrollment_date, status) VALUES "
+                "(1, 1, 1, '2024-02-01', 'enrolled'), (2, 1, 2, '2024-06-30', 'enrolled'), "
+                "(3, 1, 3, '2024-07-01', 'enrolled')"
+            )
+        upgrade()
+        with db.engine.connect() as connection:
+            rows = connection.exec_driver_sql(
+                'SELECT e.id, t.name FROM enrollments e JOIN terms t ON t.id = e.term_id ORDER BY e.id').all()
+        self.assertEqual([tuple(row) for row in rows], [(1, '2024春季'), (2, '2024春季'), (3, '2024秋季')])
+
+        downgrade(revision='0004_course_capacity')
+        self.assertNotIn('terms', db.inspect(db.engine).get_table_names())
+
+    def test_stamped_database_gets_statistics_and_search(self):
+        # 0001 只有引入迁移前的五张表（旧数据库 stamp 到这里）
+        upgrade(revision='0001_baseline')
+        self.assertEqual(sorted(db.inspect(db.engine).get_table_names()),
+                         ['administrators', 'alembic_version', 'courses', 'enrollments', 'students', 'users'])
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO students (id, student_id, first_name, last_name, email) VALUES "
+                "(1, 'S1', '三', '张', 'a@example.com'), (2, 'S2', 'Li', 'Si', 'b@example.com')"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO courses (id, course_code, course_name, credits) VALUES (1, 'C1', 'Databases', 3)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO enrollments (id, student_id, course_id, enrollment_date, status, grade) VALUES "
+                "(1, 1, 1, '2024-03-01', 'completed', 90), (2, 2, 1, '2024-03-01', 'enrolled', NULL)"
+            )
+        upgrade()
+
+        from app.models.statistics import StudentStatistics, CourseStatistics
+        from app.services.search import search
+        from app.services.summary import get_student_statistics, get_enrollment_summary, rebuild_statistics
+        self.assertEqual(get_student_statistics(1).completed_credits, 3)
+        self.assertEqual(get_enrollment_summary().total_count, 2)
+
+        # 迁移中的回填 SQL 与应用的全量重建结果一致
+        def rows():
+            return [(s.student_id, s.total_count, s.completed_count, s.graded_count, float(s.grade_sum),
+                     s.completed_credits) for s in StudentStatistics.query.order_by(StudentStatistics.student_id)] + \
+                [(c.course_id, c.total_count, c.enrolled_count, c.graded_count, float(c.grade_sum), c.grade_max)
+                 for c in CourseStatistics.query.order_by(CourseStatistics.course_id)]
+        migrated = rows()
+        rebuild_statistics()
+        db.session.expire_all()
+        self.assertEqual(rows(), migrated)
+
+        # 迁移只建空的索引表，按升级说明执行 rebuild-search 后才能搜索到已有数据
+        self.assertEqual(search('course', 'Databases'), [])
+        self.assertEqual(self.app.test_cli_runner().invoke(args=['rebuild-search']).exit_code, 0)
+        self.assertEqual([student.student_id for student, _ in search('student', '张三')], ['S1'])
+        self.assertEqual([course.course_code for course, _ in search('course', 'Databases')], ['C1'])
+
+        downgrade(revision='0005_terms')
+        tables = db.inspect(db.engine).get_table_names()
+        self.assertNotIn('student_statistics', tables)
+        self.assertNotIn('enrollment_summary', tables)
+        self.assertNotIn('students_fts', tables)
+
+
+    def test_enrollment_updated_at_backfill(self):
+        upgrade(revision='0006_statistics_jobs_search')
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO students (id, student_id, first_name, last_name, email) VALUES "
+                + ', '.join(f"({i}, 'S{i}', 'A', 'B', 's{i}@example.com')" for i in range(1, 6))
+            )
+            connection.exec_driver_sql("INSERT INTO courses (id, course_code, course_name, credits) VALUES (1, 'C1', 'One', 3)")
+            # 旧数据（与 ORM 写入的格式相同）：部分行 updated_at 为 NULL，其中一行 created_at 也为 NULL
+            connection.exec_driver_sql(
+                "INSERT INTO enrollments (id, student_id, course_id, enrollment_date, status, created_at, updated_at) VALUES "
+                "(1, 1, 1, '2024-03-01', 'enrolled', '2024-03-01 08:00:00.000000', '2024-03-05 08:00:00.000000'), "
+                "(2, 2, 1, '2024-03-01', 'enrolled', '2024-03-02 08:00:00.000000', NULL), "
+                "(3, 3, 1, '2024-03-01', 'enrolled', NULL, NULL), "
+                "(4, 4, 1, '2024-03-01', 'enrolled', '2024-03-03 08:00:00.000000', '2024-03-03 08:00:00.000000'), "
+                "(5, 5, 1, '2024-03-01', 'enrolled', '2024-03-04 08:00:00.000000', NULL)"
+            )
+        upgrade()
+
+        from app.models.enrollment import Enrollment
+        from app.services.pagination import keyset_paginate
+        from app.views.admin import KEYSET_ORDERS
+        self.assertEqual(Enrollment.query.filter(Enrollment.updated_at.is_(None)).count(), 0)
+        enrollment = db.session.get(Enrollment, 2)
+        self.assertEqual(enrollment.updated_at, enrollment.created_at)
+
+        # 按最近更新逐页翻完，原来 updated_at 为 NULL 的行不会丢失
+        order = KEYSET_ORDERS['recent']
+        page = keyset_paginate(Enrollment.query, order, per_page=2, count=False)
+        walked = [e.id for e in page.items]
+        while page.has_next:
+            page = keyset_paginate(Enrollment.query, order, cursor=page.next_cursor, per_page=2, count=False)
+            walked += [e.id for e in page.items]
+        self.assertEqual(walked, [3, 1, 5, 4, 2])
+
+        downgrade(revision='0006_statistics_jobs_search')
+        column = next(c for c in db.inspect(db.engine).get_columns('enrollments') if c['name'] == 'updated_at')
+        self.assertTrue(column['nullable'])
+
+
+if __name__ == '__main__':
+    unittest.main()
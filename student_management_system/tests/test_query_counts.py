@@ -0,0 +1,83 @@
+import unittest
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.student import Student
+
+# 每个列表页允许的最大 SQL 条数（包括 user_loader 查询当前用户的那一条）。
+# 这里的上限与每页行数无关：任何逐行懒加载都会让行数多的那次请求超出上限。
+ADMIN_PAGES = {
+    '/admin/dashboard': 6,
+    '/admin/users': 4,
+    '/admin/students': 5,
+    '/admin/courses': 4,
+    '/admin/enrollments': 4,
+    '/admin/grades': 5,
+}
+
+STUDENT_PAGES = {
+    '/student/dashboard': 4,
+    '/student/enrollments': 6,
+    '/student/grades': 6,
+    '/student/profile': 4,
+    '/student/enrollments?status=completed': 6,
+    '/student/grades?status=completed': 6,
+}
+
+
+class QueryCountTest(AppTestCase):
+
+    def seed(self, rows):
+        students = [self.create_student(i, with_user=(i == 0)) for i in range(rows)]
+        courses = [self.create_course(i) for i in range(rows)]
+        for i, student in enumerate(students):
+            self.enroll(student, courses[i], grade=60 + i, status='completed')
+        for course in courses[1:]:
+            self.enroll(students[0], course, grade=70, status='completed')
+        db.session.remove()
+
+    def measure(self, pages):
+        counts = {}
+        engine = db.engine
+        with self.outside_context():
+            for url in pages:
+                # 在身份缓存未命中的情况下计数，保证两次测量可比
+                self.app.extensions['identity_cache'].clear()
+                with count_queries(engine) as counter:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200, url)
+                counts[url] = counter.count
+        return counts
+
+    def assert_constant(self, pages, login):
+        self.seed(2)
+        with self.outside_context():
+            login()
+        small = self.measure(pages)
+
+        self.seed_more(15)
+        large = self.measure(pages)
+
+        for url, limit in pages.items():
+            self.assertLessEqual(large[url], limit, f'{url} issued {large[url]} queries')
+            self.assertEqual(small[url], large[url], f'{url} query count grows with page size')
+
+    def seed_more(self, rows):
+        first = Student.query.filter_by(student_id='S00000').first()
+        for i in range(rows):
+            student = self.create_student(2000 + i)
+            course = self.create_course(2000 + i)
+            self.enroll(student, course, grade=80, status='completed')
+            self.enroll(first, course, grade=75, status='completed')
+        db.session.remove()
+
+    def test_admin_list_pages(self):
+        self.assert_constant(ADMIN_PAGES, self.login)
+
+    def test_student_list_pages(self):
+        def student_login():
+            self.login('student0', 'student123')
+        self.assert_constant(STUDENT_PAGES, student_login)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest import mock
+from flask import g
+from app import db
+from app.models.course import Course
+from app.services import replicas
+from config.config import TestingConfig, config_by_name
+from tests.base import AppTestCase
+
+
+class ReplicaTestConfig(TestingConfig):
+    # 副本用另一个内存数据库，写入主库的数据不会出现在副本中，便于判断查询发往哪里
+    REPLICA_DATABASE_URIS = ['sqlite://']
+    REPLICA_STICKY_SECONDS = 60
+
+
+class ReplicaRoutingTest(AppTestCase):
+
+    config_name = 'replica_test'
+
+    @classmethod
+    def setUpClass(cls):
+        config_by_name['replica_test'] = ReplicaTestConfig
+
+    @classmethod
+    def tearDownClass(cls):
+        config_by_name.pop('replica_test')
+
+    def setUp(self):
+        super().setUp()
+        self.replica = self.app.extensions['replicas'].engines['replica_1']
+        db.metadata.create_all(self.replica)
+        # 主库和副本各有一门只属于自己的课程
+        self.create_course(1)
+        with self.replica.begin() as connection:
+            connection.execute(db.insert(Course), {'course_code': 'R0001', 'course_name': 'Replica Only',
+                                                   'credits': 3})
+
+    def course_codes(self):
+        return sorted(course['course_code'] for course in self.client.get('/admin/api/courses').get_json())
+
+    def login_fresh(self):
+        """登录本身会写入数据，清掉登录后的读主库标记"""
+        self.login()
+        with self.client.session_transaction() as session:
+            session.pop('primary_until', None)
+
+    def test_read_only_views_use_replica(self):
+        with self.outside_context():
+            self.login_fresh()
+            self.assertEqual(self.course_codes(), ['R0001'])
+            # 未标记为只读的视图读主库
+            response = self.client.get('/admin/courses/1/edit')
+            self.assertIn('Course 1', response.get_data(as_text=True))
+
+    def test_reads_stick_to_primary_after_write(self):
+        with self.outside_context():
+            self.login_fresh()
+            self.assertEqual(self.course_codes(), ['R0001'])
+            self.client.post('/admin/courses/create', data={
+                'course_code': 'C0002', 'course_name': 'Course 2', 'credits': 3,
+                'department': 'CS', 'instructor': 'Someone', 'max_students': 30
+            })
+            self.assertEqual(self.course_codes(), ['C0001', 'C0002'])
+
+    def test_only_real_writes_pin_to_primary(self):
+        with self.outside_context(), self.app.test_request_context():
+            replicas.use_replica()
+            # 取连接、非 SELECT 的只读语句都发往主库，但不算写入
+            db.session.connection()
+            db.session.execute(db.text('PRAGMA user_version'))
+            self.assertFalse(g.get('db_wrote'))
+            self.assertEqual(db.session.scalars(db.select(Course.course_code)).all(), ['R0001'])
+
+            # 直接在连接上执行的写入语句
+            db.session.connection().execute(db.update(Course).values(credits=4))
+            self.assertTrue(g.get('db_wrote'))
+            self.assertEqual(db.session.scalars(db.select(Course.course_code)).all(), ['C0001'])
+            db.session.rollback()
+
+        with self.outside_context(), self.app.test_request_context():
+            replicas.use_replica()
+            db.session.add(Course(course_code='C0009', course_name='Course 9', credits=3))
+            db.session.flush()
+            self.assertTrue(g.get('db_wrote'))
+            db.session.rollback()
+
+    def test_lagging_replica_is_skipped(self):
+        self.app.extensions['replicas'].check_interval = 0
+        with self.outside_context():
+            self.login_fresh()
+            with mock.patch.object(replicas, '_measure_lag', return_value=30):
+                self.assertEqual(self.course_codes(), ['C0001'])
+            with mock.patch.object(replicas, '_measure_lag', side_effect=OSError('connection refused')):
+                self.assertEqual(self.course_codes(), ['C0001'])
+                status = self.client.get('/admin/api/metrics/pool').get_json()
+            self.assertFalse(status['replica_1']['replication']['healthy'])
+            self.assertEqual(self.course_codes(), ['R0001'])
+
+
+class NoReplicaTest(AppTestCase):
+
+    def test_without_replicas_everything_reads_primary(self):
+        self.create_course(1)
+        self.login()
+        self.assertNotIn('replicas', self.app.extensions)
+        codes = [course['course_code'] for course in self.client.get('/admin/api/courses').get_json()]
+        self.assertEqual(codes, ['C0001'])
+
+
+if __name__ == '__main__':
+    unittest.main()
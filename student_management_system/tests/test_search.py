@@ -0,0 +1,99 @@
+import unittest
+from tests.base import AppTestCase
+from app import db
+from app.models.student import Student
+from app.models.course import Course
+from app.services.search import search, apply_search, get_backend, rebuild_search_index
+from app.services.search.tokenizer import index_tokens, query_runs, short_runs, RUN_BREAK
+
+
+class TokenizerTest(unittest.TestCase):
+
+    def test_chinese_and_latin_ngrams(self):
+        self.assertEqual(index_tokens('数据结构'), '数据 据结 结构')
+        self.assertEqual(index_tokens('CS-101', 'Dr. Wang'), f'cs {RUN_BREAK} 10 01 {RUN_BREAK} dr {RUN_BREAK} wa an ng')
+
+    def test_full_width_and_short_runs(self):
+        self.assertEqual(query_runs('ＣＳ１０１ a'), ['cs101'])
+        self.assertEqual(query_runs('张'), [])
+        self.assertEqual(short_runs('王 小明'), ['王'])
+
+
+class SearchIndexTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.assertEqual(get_backend().name, 'sqlite-fts5')
+        self.student = Student(student_id='2024001', first_name='三', last_name='张',
+                               email='zhangsan@example.com')
+        self.other = Student(student_id='2024002', first_name='丰', last_name='三',
+                             email='sanfeng@example.com')
+        db.session.add_all([self.student, self.other])
+        db.session.add(Course(course_code='CS201', course_name='数据结构与算法', instructor='王老师'))
+        db.session.add(Course(course_code='MA101', course_name='高等数学', instructor='李老师'))
+        db.session.commit()
+
+    def ids(self, entity, text):
+        return [obj.id for obj, _ in search(entity, text)]
+
+    def test_chinese_substring_search(self):
+        self.assertEqual(len(self.ids('course', '结构')), 1)
+        self.assertEqual(len(self.ids('course', '数学')), 1)
+        self.assertEqual(self.ids('student', '张三'), [self.student.id])
+
+    def test_phrase_does_not_cross_fields(self):
+        # “三丰”只出现在第二个学生的 名+姓 里，不会因为“张三”和“丰”相邻而误中第一个学生
+        self.assertEqual(self.ids('student', '三丰'), [self.other.id])
+        self.assertEqual(self.ids('course', 'cs2'), self.ids('course', 'CS201'))
+
+    def test_index_follows_writes(self):
+        self.student.first_name = '四'
+        db.session.commit()
+        self.assertEqual(self.ids('student', '张三'), [])
+        self.assertEqual(self.ids('student', '张四'), [self.student.id])
+
+        db.session.delete(self.student)
+        db.session.commit()
+        self.assertEqual(self.ids('student', '张四'), [])
+
+    def test_short_query_falls_back_to_like(self):
+        self.assertEqual(len(self.ids('course', '李')), 1)
+
+    def test_short_runs_still_narrow_results(self):
+        # 单字的段不走索引，但仍作为 LIKE 条件，不会被忽略
+        self.assertEqual(len(self.ids('course', '王 数据')), 1)
+        self.assertEqual(self.ids('course', '李 数据'), [])
+        self.assertEqual(self.ids('student', '三丰 张'), [])
+        self.assertEqual(self.ids('student', '张 三丰'), [])
+        self.assertEqual(self.ids('student', '张三 z'), [self.student.id])
+
+    def test_rebuild_and_ranking(self):
+        db.session.execute(db.text('DELETE FROM courses_fts'))
+        db.session.commit()
+        self.assertEqual(self.ids('course', '数据'), [])
+
+        counts = rebuild_search_index(batch_size=1)
+        self.assertEqual(counts['course'], 2)
+        results = search('course', '数据')
+        self.assertEqual(len(results), 1)
+        self.assertGreater(results[0][1], 0)
+
+        query = apply_search(Course.query, 'course', 'CS201')
+        self.assertEqual([c.course_code for c in query.all()], ['CS201'])
+
+    def test_views_use_search(self):
+        self.enroll(self.student, Course.query.filter_by(course_code='CS201').first())
+        self.login()
+        response = self.client.get('/admin/enrollments?search=张三')
+        self.assertIn('数据结构与算法'.encode(), response.data)
+        response = self.client.get('/admin/courses?search=高等')
+        self.assertIn(b'MA101', response.data)
+        self.assertNotIn(b'CS201', response.data)
+
+        data = self.client.get('/admin/api/search?type=course&q=数据结构').get_json()
+        self.assertEqual([item['item']['course_code'] for item in data], ['CS201'])
+        self.assertEqual(self.client.get('/admin/api/search?type=bogus&q=x').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
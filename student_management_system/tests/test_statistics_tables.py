@@ -0,0 +1,110 @@
+import unittest
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.enrollment import Enrollment
+from app.models.statistics import StudentStatistics, CourseStatistics
+from app.services.summary import (get_student_statistics, get_course_statistics,
+                                  get_enrollment_summary, rebuild_statistics)
+
+
+def snapshot():
+    """汇总表的当前内容，用于比较增量维护与全量重建的结果"""
+    def rows(model, key):
+        return {getattr(r, key): (r.total_count, r.enrolled_count, r.completed_count, r.graded_count,
+                                  float(r.grade_sum), r.grade_min, r.grade_max)
+                for r in model.query.all()}
+    credits = {r.student_id: r.completed_credits for r in StudentStatistics.query.all()}
+    return rows(StudentStatistics, 'student_id'), rows(CourseStatistics, 'course_id'), \
+        get_enrollment_summary(), credits
+
+
+class StatisticsTablesTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.students = [self.create_student(i) for i in range(2)]
+        self.courses = [self.create_course(0, credits=3), self.create_course(1, credits=4)]
+
+    def test_insert_updates_summaries(self):
+        self.enroll(self.students[0], self.courses[0], grade=80, status='completed')
+        self.enroll(self.students[0], self.courses[1])
+
+        stats = get_student_statistics(self.students[0].id)
+        self.assertEqual(stats.total_count, 2)
+        self.assertEqual(stats.enrolled_count, 1)
+        self.assertEqual(stats.completed_count, 1)
+        self.assertEqual(stats.completed_credits, 3)
+        self.assertAlmostEqual(stats.completed_avg_grade, 80.0)
+
+        self.assertEqual(get_course_statistics(self.courses[1].id).enrolled_count, 1)
+        self.assertEqual(get_enrollment_summary().total_count, 2)
+
+    def test_grade_update_on_expired_object(self):
+        enrollment = self.enroll(self.students[0], self.courses[0])
+        enrollment_id = enrollment.id
+        db.session.expire_all()
+
+        enrollment = db.session.get(Enrollment, enrollment_id)
+        db.session.expire(enrollment)
+        enrollment.grade = 95
+        enrollment.status = 'completed'
+        db.session.commit()
+
+        stats = get_student_statistics(self.students[0].id)
+        self.assertEqual(stats.completed_count, 1)
+        self.assertEqual(float(stats.grade_max), 95.0)
+        self.assertEqual(float(get_enrollment_summary().grade_max), 95.0)
+
+    def test_delete_recomputes_min_max(self):
+        self.enroll(self.students[0], self.courses[0], grade=60, status='completed')
+        high = self.enroll(self.students[1], self.courses[0], grade=99, status='completed')
+
+        db.session.delete(high)
+        db.session.commit()
+
+        self.assertEqual(float(get_course_statistics(self.courses[0].id).grade_max), 60.0)
+        self.assertEqual(get_student_statistics(self.students[1].id).total_count, 0)
+        self.assertEqual(get_enrollment_summary().graded_count, 1)
+
+    def test_enrollment_writes_only_touch_affected_rows(self):
+        self.enroll(self.students[0], self.courses[0], grade=80, status='completed')
+        with count_queries() as counter:
+            self.enroll(self.students[1], self.courses[1], grade=60, status='completed')
+        # 汇总表的写入都限定在受影响的学生/课程上，没有所有事务共用的全局行
+        for statement in counter.statements:
+            if 'statistics' in statement and not statement.lstrip().upper().startswith('SELECT'):
+                self.assertIn('IN (', statement)
+
+        summary = get_enrollment_summary()
+        self.assertEqual((summary.total_count, summary.graded_count), (2, 2))
+        self.assertAlmostEqual(summary.avg_grade, 70.0)
+        self.assertEqual((float(summary.grade_min), float(summary.grade_max)), (60.0, 80.0))
+
+    def test_course_credit_change_updates_students(self):
+        self.enroll(self.students[0], self.courses[1], grade=70, status='completed')
+        self.courses[1].credits = 5
+        db.session.commit()
+        self.assertEqual(get_student_statistics(self.students[0].id).completed_credits, 5)
+
+    def test_rebuild_matches_incremental(self):
+        self.enroll(self.students[0], self.courses[0], grade=60, status='completed')
+        self.enroll(self.students[0], self.courses[1], grade=90)
+        self.enroll(self.students[1], self.courses[1], status='dropped')
+        incremental = snapshot()
+
+        rebuild_statistics()
+        db.session.expire_all()
+        self.assertEqual(snapshot(), incremental)
+
+    def test_rebuild_command(self):
+        self.enroll(self.students[0], self.courses[0], grade=60, status='completed')
+        db.session.execute(db.delete(StudentStatistics.__table__))
+        db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(args=['rebuild-stats'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(get_student_statistics(self.students[0].id).total_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import unittest
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.course import Course
+
+
+class StreamingApiTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.students = [self.create_student(i) for i in range(4)]
+        self.courses = [self.create_course(i) for i in range(2)]
+        for i, student in enumerate(self.students):
+            self.enroll(student, self.courses[i % 2], grade=70 + i if i % 2 else None,
+                        status='completed' if i % 2 else 'enrolled')
+        self.login()
+
+    def get(self, url):
+        response = self.client.get(url)
+        data = response.get_data(as_text=True)
+        response.close()
+        return response, data
+
+    def test_default_is_json_array_with_nested_objects(self):
+        response, body = self.get('/admin/api/enrollments')
+        self.assertEqual(response.mimetype, 'application/json')
+        rows = json.loads(body)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['student']['student_id'], 'S00000')
+        self.assertEqual(rows[1]['course']['course_code'], 'C0001')
+        self.assertEqual(rows[1]['grade'], 71.0)
+
+    def test_ndjson_and_field_projection(self):
+        response, body = self.get('/admin/api/students?format=ndjson&fields=id,full_name')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(set(lines[0]), {'id', 'full_name'})
+        self.assertEqual(lines[0]['full_name'], 'First0 Last0')
+
+        _, body = self.get('/admin/api/enrollments?fields=id,course')
+        row = json.loads(body)[0]
+        self.assertEqual(set(row), {'id', 'course'})
+        self.assertIn('course_name', row['course'])
+
+    def test_filters_and_unknown_field(self):
+        _, body = self.get('/admin/api/enrollments?status=completed&has_grade=1')
+        self.assertEqual([r['grade'] for r in json.loads(body)], [71.0, 73.0])
+
+        _, body = self.get('/admin/api/courses')
+        self.assertEqual([c['enrollment_count'] for c in json.loads(body)], [2, 2])
+
+        response, _ = self.get('/admin/api/students?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_streamed_rows_match_paged_rows(self):
+        _, body = self.get('/admin/api/enrollments')
+        streamed = json.loads(body)
+        paged = self.client.get('/admin/api/enrollments?limit=10').get_json()['items']
+        self.assertEqual(streamed, paged)
+        self.assertIn('seats_available', streamed[0]['course'])
+        self.assertIn('term_id', streamed[0])
+        self.assertEqual(streamed[0]['course']['enrollment_count'], 2)
+
+    def test_query_count_independent_of_row_count(self):
+        def measure():
+            engine = db.engine
+            self.app.extensions['identity_cache'].clear()
+            with self.outside_context(), count_queries(engine) as counter:
+                self.get('/admin/api/enrollments')
+                self.get('/admin/api/enrollments?limit=100')
+                self.get('/admin/api/courses')
+            return counter.count
+
+        course_id = self.courses[0].id
+        before = measure()
+        course = db.session.get(Course, course_id)
+        for i in range(10, 30):
+            self.enroll(self.create_student(i), course)
+        self.assertEqual(measure(), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from tests.base import AppTestCase
+from app import db
+from app.models.user import User
+from app.models.student import Student
+
+
+class StudentUserLinkTest(AppTestCase):
+    """学生与登录账户通过 students.user_id 关联，而不是邮箱"""
+
+    def setUp(self):
+        super().setUp()
+        self.student_pk = self.create_student(0, with_user=True).id
+        self.user_id = User.query.filter_by(username='student0').one().id
+        self.login()
+
+    def test_edit_student_updates_linked_user_when_email_changes(self):
+        response = self.client.post(f'/admin/students/{self.student_pk}/edit', json={
+            'first_name': 'New', 'last_name': 'Name', 'email': 'changed@example.com', 'username': 'student0'
+        })
+        self.assertTrue(response.get_json()['success'])
+        user = db.session.get(User, self.user_id)
+        self.assertEqual((user.email, user.full_name), ('changed@example.com', 'New Name'))
+
+    def test_edit_user_updates_linked_student(self):
+        response = self.client.post(f'/admin/users/{self.user_id}/edit', json={
+            'username': 'student0', 'email': 'other@example.com', 'full_name': 'Zhang San', 'role': 'student'
+        })
+        self.assertTrue(response.get_json()['success'])
+        student = db.session.get(Student, self.student_pk)
+        self.assertEqual((student.email, student.first_name), ('other@example.com', 'Zhang'))
+
+    def test_delete_user_keeps_student_and_clears_link(self):
+        self.client.post(f'/admin/users/{self.user_id}/delete', json={})
+        self.assertIsNone(db.session.get(Student, self.student_pk).user_id)
+
+    def test_delete_student_deletes_linked_user(self):
+        self.client.post(f'/admin/students/{self.student_pk}/delete', json={})
+        self.assertIsNone(db.session.get(User, self.user_id))
+
+    def test_student_list_shows_account_status(self):
+        self.create_student(1)
+        body = self.client.get('/admin/students').get_data(as_text=True)
+        self.assertEqual(body.count('已创建'), 1)
+        self.assertEqual(body.count('未创建'), 1)
+
+    def test_dashboard_links_imported_student_by_email(self):
+        student = Student(student_id='S9', first_name='Imp', last_name='Orted', email='imported@example.com')
+        user = User(username='imported', email='imported@example.com', full_name='Imp Orted', role='student')
+        user.set_password('student123')
+        db.session.add_all([student, user])
+        db.session.commit()
+        student_pk, user_id = student.id, user.id
+
+        self.client.get('/auth/logout')
+        self.login('imported', 'student123')
+        self.assertEqual(self.client.get('/student/dashboard').status_code, 200)
+        self.assertEqual(db.session.get(Student, student_pk).user_id, user_id)
+        self.assertEqual(Student.query.count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.user import User
+from app.models.student import Student
+from app.services.search import search
+from app.services.sync import sync_student_data
+
+
+class SyncStudentDataTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.password_hash = User.query.filter_by(username='admin').one().password_hash
+        for i in range(4):
+            self.create_student(i)
+
+    def add_users(self, *users):
+        db.session.execute(db.insert(User), [
+            dict(role='student', password_hash=self.password_hash, is_active=True, **user) for user in users
+        ])
+        db.session.commit()
+
+    def test_match_by_email_then_name(self):
+        self.add_users(
+            # 邮箱匹配，姓名和电话有变化
+            {'username': 'u0', 'email': 'student0@example.com', 'full_name': 'Zhang San', 'phone': '138'},
+            # 邮箱匹配，信息一致，只需写入关联
+            {'username': 'u1', 'email': 'student1@example.com', 'full_name': 'First1 Last1', 'phone': None},
+            # 邮箱未匹配，按全名匹配到学生 2，同步邮箱
+            {'username': 'u2', 'email': 'new2@example.com', 'full_name': 'First2 Last2', 'phone': None},
+            # 同名但学生 2 已被占用，只能按名字匹配，没有其他学生
+            {'username': 'u3', 'email': 'other@example.com', 'full_name': 'First2 Someone', 'phone': None},
+            {'username': 'u4', 'email': 'nobody@example.com', 'full_name': 'Nobody', 'phone': None},
+        )
+
+        preview = sync_student_data(dry_run=True)
+        self.assertEqual((preview.users, preview.matched, len(preview.changes)), (5, 3, 3))
+        self.assertEqual(preview.updated, 0)
+        self.assertEqual([u['username'] for u in preview.unmatched], ['u3', 'u4'])
+        by_user = {change['username']: change for change in preview.changes}
+        self.assertEqual(by_user['u0']['matched_by'], 'email')
+        self.assertEqual(by_user['u0']['changes']['first_name'], {'old': 'First0', 'new': 'Zhang'})
+        self.assertEqual(by_user['u2']['matched_by'], 'name')
+        self.assertEqual(set(by_user['u1']['changes']), {'user_id'})
+        self.assertEqual(set(by_user['u2']['changes']), {'user_id', 'email'})
+        self.assertEqual(set(preview.timings), {'load', 'match', 'diff', 'apply'})
+        self.assertEqual(Student.query.filter_by(first_name='Zhang').count(), 0)
+
+        result = sync_student_data()
+        self.assertEqual(result.updated, 3)
+        student = Student.query.filter_by(student_id='S00000').one()
+        self.assertEqual((student.first_name, student.last_name, student.phone), ('Zhang', 'San', '138'))
+        self.assertEqual(Student.query.filter_by(student_id='S00002').one().email, 'new2@example.com')
+        self.assertEqual([s.student_id for s, _ in search('student', 'Zhang')], ['S00000'])
+
+        self.assertEqual(Student.query.filter_by(student_id='S00002').one().user.username, 'u2')
+
+        # 再次同步没有变化，全部按关联配对
+        result = sync_student_data(dry_run=True)
+        self.assertEqual((result.matched, len(result.changes)), (3, 0))
+
+    def test_email_conflict_on_linked_student(self):
+        self.add_users({'username': 'u0', 'email': 'student0@example.com', 'full_name': 'First0 Last0'})
+        sync_student_data()
+        # 已关联学生 0 的用户把邮箱改成了学生 1 的邮箱
+        user = User.query.filter_by(username='u0').one()
+        user.email = 'student1@example.com'
+        db.session.commit()
+
+        result = sync_student_data()
+        self.assertEqual(result.conflicts[0]['student_number'], 'S00000')
+        self.assertEqual(result.updated, 0)
+        self.assertEqual(Student.query.filter_by(student_id='S00000').one().email, 'student0@example.com')
+
+    def test_query_count_does_not_grow_with_users(self):
+        counts = []
+        for start in (0, 4):
+            self.add_users(*[{'username': f'u{i}', 'email': f'student{i}@example.com',
+                              'full_name': f'New{i} Name', 'phone': None} for i in range(start, start + 4)])
+            for i in range(start + 4, start + 8):
+                self.create_student(i)
+            with count_queries() as counter:
+                result = sync_student_data()
+            self.assertEqual(result.updated, 4)
+            counts.append(counter.count)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_view_dry_run_and_apply(self):
+        self.add_users({'username': 'u0', 'email': 'student0@example.com', 'full_name': 'Li Si', 'phone': None})
+        self.login()
+        data = self.client.post('/admin/users/sync-student-data', json={'dry_run': True}).get_json()
+        self.assertTrue(data['success'])
+        self.assertTrue(data['dry_run'])
+        self.assertEqual(data['changed'], 1)
+        self.assertEqual(Student.query.filter_by(first_name='Li').count(), 0)
+
+        response = self.client.post('/admin/users/sync-student-data')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Student.query.filter_by(first_name='Li').count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
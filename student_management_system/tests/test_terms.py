@@ -0,0 +1,77 @@
+import io
+import unittest
+from datetime import date
+from tests.base import AppTestCase
+from app import db
+from app.models.enrollment import Enrollment
+from app.models.term import Term
+from app.services.enrollments import enroll_student
+from app.services.imports import import_file
+from app.services.statistics import get_student_semesters
+from app.services.terms import rebuild_terms, term_id_for
+
+
+class TermTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = self.create_student(0, with_user=True)
+        self.courses = [self.create_course(i) for i in range(3)]
+
+    def term_name(self, enrollment_id):
+        return db.session.get(Enrollment, enrollment_id).term.name
+
+    def test_term_boundaries(self):
+        self.assertEqual(Term.values_for(date(2024, 6, 30))['name'], '2024春季')
+        self.assertEqual(Term.values_for(date(2024, 7, 1))['name'], '2024秋季')
+        self.assertEqual(Term.values_for(date(2024, 7, 1))['end_date'], date(2024, 12, 31))
+
+    def test_orm_writes_assign_term(self):
+        first = self.enroll(self.student, self.courses[0], enrollment_date=date(2024, 3, 1))
+        second = self.enroll(self.student, self.courses[1], enrollment_date=date(2024, 5, 20))
+        self.assertEqual(first.term_id, second.term_id)
+        self.assertEqual(self.term_name(first.id), '2024春季')
+        self.assertEqual(Term.query.count(), 1)
+
+        first.enrollment_date = date(2024, 9, 1)
+        db.session.commit()
+        self.assertEqual(self.term_name(first.id), '2024秋季')
+
+        # 未填写选课日期时按当天
+        enrollment = Enrollment(student_id=self.student.id, course_id=self.courses[2].id)
+        db.session.add(enrollment)
+        db.session.commit()
+        self.assertEqual(enrollment.term_id, term_id_for(date.today()))
+
+    def test_enrollment_service_and_import_assign_term(self):
+        enroll_student(self.student.id, self.courses[0].id)
+        enrollment = Enrollment.query.filter_by(course_id=self.courses[0].id).one()
+        self.assertEqual(enrollment.term_id, term_id_for(date.today()))
+
+        data = 'student_id,course_code,enrollment_date\nS00000,C0001,2023-10-08\nS00000,C0002,2023-03-01\n'
+        result = import_file('enrollments', io.BytesIO(data.encode('utf-8')), 'enrollments.csv')
+        self.assertEqual(result.inserted, 2)
+        names = {e.course_id: e.term.name for e in Enrollment.query.filter(Enrollment.course_id != self.courses[0].id)}
+        self.assertEqual(names, {self.courses[1].id: '2023秋季', self.courses[2].id: '2023春季'})
+
+    def test_rebuild_terms(self):
+        enrollment = self.enroll(self.student, self.courses[0], enrollment_date=date(2022, 11, 1))
+        db.session.execute(db.update(Enrollment).values(term_id=None, enrollment_date=date(2021, 2, 1)))
+        self.assertEqual(rebuild_terms(), 1)
+        db.session.commit()
+        self.assertEqual(self.term_name(enrollment.id), '2021春季')
+
+    def test_semester_filter_and_dropdown(self):
+        self.enroll(self.student, self.courses[0], grade=80, status='completed', enrollment_date=date(2023, 9, 1))
+        self.enroll(self.student, self.courses[1], grade=90, status='completed', enrollment_date=date(2024, 3, 1))
+        self.enroll(self.student, self.courses[2], enrollment_date=date(2024, 9, 1))
+        self.assertEqual(get_student_semesters(self.student.id), ['2024春季', '2023秋季'])
+
+        self.login('student0', 'student123')
+        html = self.client.get('/student/grades?semester=2023秋季').get_data(as_text=True)
+        self.assertIn('C0000', html)
+        self.assertNotIn('C0001', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from datetime import date
+from tests.base import AppTestCase, count_queries
+from app import db
+from app.models.enrollment import Enrollment
+from app.services.grades import apply_grade_batch
+from app.services.transcript import get_transcript, rank_students, GPAScaleError
+
+
+class TranscriptTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = self.create_student(0, with_user=True)
+        self.student_id = self.student.id
+        courses = [self.create_course(0, credits=4), self.create_course(1, credits=2),
+                   self.create_course(2, credits=3), self.create_course(3, credits=3)]
+        self.spring = self.enroll(self.student, courses[0], grade=92, status='completed',
+                                  enrollment_date=date(2024, 3, 1))
+        self.enroll(self.student, courses[1], grade=79, status='completed', enrollment_date=date(2024, 3, 1))
+        self.fall = self.enroll(self.student, courses[2], grade=65, status='completed',
+                                enrollment_date=date(2024, 9, 1))
+        # 进行中的课程不计入
+        self.enroll(self.student, courses[3], grade=50, enrollment_date=date(2024, 9, 1))
+        self.spring_id, self.fall_id = self.spring.id, self.fall.id
+
+    def test_credit_weighted_gpa(self):
+        transcript = get_transcript(self.student_id).to_dict()
+        self.assertEqual([term['term'] for term in transcript['terms']], ['2024春季', '2024秋季'])
+        spring, fall = transcript['terms']
+        # 标准刻度：92 -> 4.0，79 -> 3.0，65 -> 1.5
+        self.assertEqual(spring['gpa'], round((4 * 4.0 + 2 * 3.0) / 6, 2))
+        self.assertEqual(fall['gpa'], 1.5)
+        self.assertEqual(fall['cumulative_gpa'], round((16 + 6 + 4.5) / 9, 2))
+        self.assertEqual(transcript['credits'], 9)
+        self.assertEqual(transcript['gpa'], fall['cumulative_gpa'])
+
+        simple = get_transcript(self.student_id, 'simple')
+        self.assertEqual(simple.terms[1].gpa, 1.0)
+        with self.assertRaises(GPAScaleError):
+            get_transcript(self.student_id, 'unknown')
+
+    def test_cached_per_term_and_invalidated_on_grade_write(self):
+        get_transcript(self.student_id)
+        with count_queries(db.engine) as counter:
+            get_transcript(self.student_id)
+        self.assertEqual(counter.count, 0)
+
+        enrollment = db.session.get(Enrollment, self.fall_id)
+        enrollment.grade = 95
+        db.session.commit()
+        with count_queries(db.engine) as counter:
+            transcript = get_transcript(self.student_id)
+        # 只重新查询失效的学期
+        self.assertEqual(counter.count, 1)
+        self.assertEqual(transcript.terms[1].gpa, 4.0)
+        self.assertEqual(transcript.terms[0].credits, 6)
+
+        apply_grade_batch([{'enrollment_id': self.spring_id, 'grade': 50}])
+        self.assertEqual(get_transcript(self.student_id).terms[0].gpa, 1.0)
+
+    def test_cohort_ranking(self):
+        other = self.create_student(1)
+        self.enroll(other, self.create_course(9, credits=3), grade=95, status='completed',
+                    enrollment_date=date(2024, 3, 1))
+        ranking = rank_students()
+        self.assertEqual([row['student_number'] for row in ranking], ['S00001', 'S00000'])
+        self.assertEqual(ranking[0]['rank'], 1)
+        self.assertEqual(ranking[1]['gpa'], get_transcript(self.student_id).gpa)
+        self.assertEqual(ranking[1]['cohort_size'], 2)
+
+        fall = rank_students(semester='2024秋季')
+        self.assertEqual([row['student_number'] for row in fall], ['S00000'])
+
+    def test_profile_and_apis(self):
+        self.login('student0', 'student123')
+        self.assertIn('累计 GPA', self.client.get('/student/profile').get_data(as_text=True))
+        data = self.client.get('/student/api/transcript?scale=simple').get_json()
+        self.assertEqual(data['scale'], 'simple')
+        self.assertEqual(len(data['terms']), 2)
+        self.assertEqual(self.client.get('/student/api/transcript?scale=bad').status_code, 400)
+
+        self.client.get('/auth/logout')
+        self.login()
+        data = self.client.get('/admin/api/reports/gpa-ranking?per_page=1').get_json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['items'][0]['student_number'], 'S00000')
+        response = self.client.get('/admin/api/reports/gpa-ranking?format=csv')
+        self.assertIn('S00000', response.get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()